@@ -0,0 +1,50 @@
+"""
+Benchmark of Cache.get_cache_key, original pickle key vs xxh3 key builder.
+
+    python benchmarks/bench_cache_key.py
+"""
+
+import timeit
+
+import numpy as np
+
+from nlm_utils.cache import Cache
+
+
+def bench(name, args, kwargs, number=100):
+    print(name)
+    for key_builder in ["pickle", "xxh3"]:
+        cache = Cache("MemoryAgent", key_builder=key_builder)
+        run_time = (
+            timeit.timeit(
+                lambda: cache.get_cache_key("func", *args, **kwargs),
+                number=number,
+            )
+            / number
+        )
+        print(f"  {key_builder:<12} {run_time * 1e6:10.1f}µs")
+
+        if key_builder == "xxh3":
+            with cache.key_scope():
+                cache.get_cache_key("func", *args, **kwargs)
+                run_time = (
+                    timeit.timeit(
+                        lambda: cache.get_cache_key("func", *args, **kwargs),
+                        number=number,
+                    )
+                    / number
+                )
+            print(f"  {'xxh3 + memo':<12} {run_time * 1e6:10.1f}µs")
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    words = [f"word{i}" for i in rng.integers(0, 50000, 300000)]
+    document = " ".join(words)
+
+    bench("300k words document", (document,), {"option": "summary"})
+    bench("300k words as list", (words,), {})
+    bench("small arguments", ("what is the revenue?", 5), {"top_k": 10})
+    embeddings = rng.random((1000, 768), dtype=np.float32)
+    embeddings.flags.writeable = False
+    bench("1000x768 float32 array", (embeddings,), {})
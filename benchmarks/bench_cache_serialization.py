@@ -0,0 +1,51 @@
+"""
+Micro-benchmark of the Cache serialization protocols.
+
+    python benchmarks/bench_cache_serialization.py
+"""
+
+import timeit
+
+import numpy as np
+
+from nlm_utils.cache.serializers import SERIALIZERS
+
+
+def bench(name, data, number=20):
+    print(f"{name}")
+    for protocol, (dumps, loads) in SERIALIZERS.items():
+        try:
+            serilized_data = dumps(data)
+        except TypeError as e:
+            print(f"  {protocol:<8} unsupported: {e}")
+            continue
+        dumps_time = timeit.timeit(lambda: dumps(data), number=number) / number
+        loads_time = (
+            timeit.timeit(lambda: loads(serilized_data), number=number) / number
+        )
+        print(
+            f"  {protocol:<8} size: {len(serilized_data) / 1e6:8.2f}MB "
+            f"dumps: {dumps_time * 1000:8.3f}ms loads: {loads_time * 1000:8.3f}ms",
+        )
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    embeddings = rng.random((10000, 768), dtype=np.float32)
+
+    bench("embeddings 10000x768 float32", embeddings)
+    bench(
+        "encoder response",
+        {"embeddings": embeddings, "model": "sif", "n_sentences": 10000},
+    )
+    bench(
+        "1000 rows of 768 float32",
+        [row for row in embeddings[:1000]],
+    )
+    bench(
+        "search results",
+        [
+            {"text": f"sentence {i} " * 20, "score": float(i), "page": i}
+            for i in range(10000)
+        ],
+    )
@@ -0,0 +1,81 @@
+"""
+Benchmark of model client request bodies, serialization time and payload size
+of json vs msgpack, uncompressed and compressed, for the payload of each client.
+
+    python benchmarks/bench_model_client_requests.py [--n-texts 10000]
+"""
+
+import argparse
+import random
+import string
+import timeit
+
+from nlm_utils.model_client.bart_client import BartClient
+from nlm_utils.model_client.flan_t5_client import FlanT5Client
+from nlm_utils.model_client.request_body import encode_request
+from nlm_utils.model_client.request_body import zstandard
+
+
+def make_texts(n_texts, n_words, seed=0):
+    rng = random.Random(seed)
+    words = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10)))
+        for _ in range(5000)
+    ]
+    return [" ".join(rng.choices(words, k=n_words)) for _ in range(n_texts)]
+
+
+def bench(name, req_data, encoding, compression, number):
+    run_time = (
+        timeit.timeit(
+            lambda: encode_request(req_data, encoding, compression),
+            number=number,
+        )
+        / number
+    )
+    body, _ = encode_request(req_data, encoding, compression)
+    print(f"  {name:<24} {run_time * 1e3:10.1f}ms {len(body) / 1e6:10.2f}MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n-texts", type=int, default=10_000)
+    parser.add_argument("--number", type=int, default=5)
+    args = parser.parse_args()
+
+    passages = make_texts(args.n_texts, 200, seed=0)
+    questions = make_texts(args.n_texts, 10, seed=1)
+
+    payloads = {
+        "EncoderClient": {"sentences": passages, "use_msgpack": True},
+        "ClassificationClient": {
+            "questions": questions,
+            "sentences": passages,
+            "return_logits": False,
+            "return_probs": True,
+        },
+        "NlpClient": {"option": "get_entities", "texts": passages},
+        "FlanT5Client": {
+            "prompts": FlanT5Client.get_qa_prompts(questions, passages),
+            "max_length": 500,
+        },
+        "BartClient": {
+            "prompts": BartClient.get_qa_sum_prompts(questions, passages),
+            "max_length": 1024,
+        },
+    }
+
+    settings = [
+        ("json", None),
+        ("json", "gzip"),
+        ("msgpack", None),
+        ("msgpack", "gzip"),
+    ]
+    if zstandard is not None:
+        settings += [("json", "zstd"), ("msgpack", "zstd")]
+
+    for client, req_data in payloads.items():
+        print(f"{client} ({args.n_texts} texts)")
+        for encoding, compression in settings:
+            name = f"{encoding}+{compression}" if compression else encoding
+            bench(name, req_data, encoding, compression, args.number)
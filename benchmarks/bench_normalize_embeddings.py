@@ -0,0 +1,58 @@
+"""
+Benchmark of embedding normalization, list-returning normalize_embeddings vs
+the array-native normalize_embeddings_array.
+
+    python benchmarks/bench_normalize_embeddings.py [--dim 768]
+
+normalize_embeddings builds python lists, it is only run up to 100k rows.
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+
+from nlm_utils.utils import normalize_embeddings
+from nlm_utils.utils import normalize_embeddings_array
+
+
+def bench(name, func, number):
+    run_time = timeit.timeit(func, number=number) / number
+    print(f"  {name:<40} {run_time * 1e3:10.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for n_rows in [10_000, 100_000, 1_000_000]:
+        print(f"{n_rows}x{args.dim} float32")
+        X = rng.random((n_rows, args.dim), dtype=np.float32)
+        number = max(1, 100_000 // n_rows)
+
+        if n_rows <= 100_000:
+            bench(
+                "normalize_embeddings (lists)",
+                lambda: normalize_embeddings(X.copy()),
+                1,
+            )
+        bench(
+            "normalize_embeddings_array (in place)",
+            lambda: normalize_embeddings_array(X),
+            number,
+        )
+        out = np.empty_like(X)
+        bench(
+            "normalize_embeddings_array (out=)",
+            lambda: normalize_embeddings_array(X, out=out),
+            number,
+        )
+        out = np.empty(X.shape, dtype=np.float16)
+        bench(
+            "normalize_embeddings_array (float16 out=)",
+            lambda: normalize_embeddings_array(X, out=out),
+            number,
+        )
+        del X, out
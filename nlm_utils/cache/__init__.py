@@ -1,8 +1,24 @@
+from .async_file_agent import AsyncFileAgent
+from .async_mongodb_agent import AsyncMongodbAgent
+from .async_redis_agent import AsyncRedisAgent
 from .cache import Cache
 from .file_agent import FileAgent
 from .memory_agent import MemoryAgent
 from .mongodb_agent import MongodbAgent
 from .redis_agent import RedisAgent
+from .sqlite_agent import SqliteAgent
+from .tiered_agent import TieredAgent
 
 
-__all__ = ("Cache", "FileAgent", "MemoryAgent", "RedisAgent", "MongodbAgent")
+__all__ = (
+    "Cache",
+    "FileAgent",
+    "MemoryAgent",
+    "RedisAgent",
+    "MongodbAgent",
+    "TieredAgent",
+    "SqliteAgent",
+    "AsyncFileAgent",
+    "AsyncRedisAgent",
+    "AsyncMongodbAgent",
+)
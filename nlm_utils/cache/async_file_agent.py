@@ -0,0 +1,56 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .file_agent import FileAgent
+
+
+class AsyncFileAgent(FileAgent):
+    """
+    FileAgent whose `a*` methods run the file I/O in a thread pool,
+    so reads and writes never block the event loop.
+    """
+
+    __name__ = "AsyncFileAgent"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._max_workers,
+            thread_name_prefix="AsyncFileAgent",
+        )
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            func,
+            *args,
+        )
+
+    async def aread(self, cache_key):
+        return await self._run(self.read, cache_key)
+
+    async def awrite(self, serilized_data, cache_key):
+        await self._run(self.write, serilized_data, cache_key)
+
+    async def adelete(self, cache_key):
+        await self._run(self.delete, cache_key)
+
+    async def aread_many(self, cache_keys):
+        return list(
+            await asyncio.gather(
+                *[self._run(self.read, cache_key) for cache_key in cache_keys]
+            ),
+        )
+
+    async def awrite_many(self, serilized_datas, cache_keys):
+        await asyncio.gather(
+            *[
+                self._run(self.write, serilized_data, cache_key)
+                for serilized_data, cache_key in zip(serilized_datas, cache_keys)
+            ]
+        )
+
+    async def adelete_many(self, cache_keys):
+        await asyncio.gather(
+            *[self._run(self.delete, cache_key) for cache_key in cache_keys]
+        )
@@ -0,0 +1,84 @@
+from pymongo import UpdateOne
+
+from .mongodb_agent import _update
+from .mongodb_agent import MongodbAgent
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:
+    AsyncIOMotorClient = None
+
+
+class AsyncMongodbAgent(MongodbAgent):
+    """
+    MongodbAgent with a motor client for the `a*` methods.
+
+    The pymongo client is kept for the sync interface and to verify the
+    connection and create the index in `connect`.
+    """
+
+    __name__ = "AsyncMongodbAgent"
+
+    def __init__(self, *args, **kwargs):
+        if AsyncIOMotorClient is None:
+            raise ImportError("Please install `motor` to use AsyncMongodbAgent")
+        super().__init__(*args, **kwargs)
+
+    def connect(self):
+        super().connect()
+        if self.connected:
+            self.aclient = AsyncIOMotorClient(
+                self._host,
+                self._port,
+                maxPoolSize=self._max_pool_size,
+            )
+            self.acollection = self.aclient[self._db][self._collection]
+
+    async def aread(self, cache_key):
+        data = await self.acollection.find_one({"cache_key": cache_key})
+        if data:
+            return True, data["serilized_data"]
+        return False, None
+
+    async def awrite(self, serilized_data, cache_key):
+        await self.acollection.update_one(
+            {"cache_key": cache_key},
+            _update(serilized_data, cache_key),
+            upsert=True,
+        )
+
+    async def adelete(self, cache_key):
+        await self.acollection.delete_one({"cache_key": cache_key})
+
+    async def aread_many(self, cache_keys):
+        if not cache_keys:
+            return []
+        found = {
+            data["cache_key"]: data["serilized_data"]
+            async for data in self.acollection.find(
+                {"cache_key": {"$in": list(cache_keys)}},
+                {"_id": False, "cache_key": True, "serilized_data": True},
+            )
+        }
+        return [
+            (True, found[cache_key]) if cache_key in found else (False, None)
+            for cache_key in cache_keys
+        ]
+
+    async def awrite_many(self, serilized_datas, cache_keys):
+        requests = [
+            UpdateOne(
+                {"cache_key": cache_key},
+                _update(serilized_data, cache_key),
+                upsert=True,
+            )
+            for serilized_data, cache_key in zip(serilized_datas, cache_keys)
+        ]
+        if requests:
+            await self.acollection.bulk_write(requests, ordered=False)
+
+    async def adelete_many(self, cache_keys):
+        if cache_keys:
+            await self.acollection.delete_many(
+                {"cache_key": {"$in": list(cache_keys)}},
+            )
@@ -0,0 +1,157 @@
+from time import monotonic
+from uuid import uuid4
+
+from redis.asyncio import Redis as AsyncRedis
+from redis.asyncio import RedisCluster as AsyncRedisCluster
+from redis.exceptions import ResponseError
+
+from .redis_agent import RedisAgent
+
+
+class AsyncRedisAgent(RedisAgent):
+    """
+    RedisAgent with a redis.asyncio client for the `a*` methods.
+
+    The blocking client is kept for the sync interface (and for `connect`),
+    so the same agent can serve sync and async callers. The `a*` methods only
+    use the asyncio client, including for the generation of versioned keys.
+    """
+
+    __name__ = "AsyncRedisAgent"
+
+    def connect(self):
+        super().connect()
+        if self.connected and getattr(self, "aclient", None) is None:
+            # asyncio clients are bound to an event loop, they are not shared
+            if self._cluster:
+                self.aclient = AsyncRedisCluster(
+                    host=self._host,
+                    port=self._port,
+                    max_connections=self._max_connections or 2**31,
+                )
+            elif self._unix_socket_path:
+                self.aclient = AsyncRedis(
+                    unix_socket_path=self._unix_socket_path,
+                    db=self.db,
+                    max_connections=self._max_connections,
+                )
+            else:
+                self.aclient = AsyncRedis(
+                    host=self._host,
+                    port=self._port,
+                    db=self.db,
+                    max_connections=self._max_connections,
+                )
+
+    async def _acurrent_generation(self):
+        now = monotonic()
+        if self._generation_is_stale(now):
+            self._generation = int(await self.aclient.get(self._generation_key) or 0)
+            self._generation_read_at = now
+        return self._generation
+
+    async def _aget_keys(self, cache_keys):
+        generation = await self._acurrent_generation() if self._versioned else None
+        return [self._format_key(cache_key, generation) for cache_key in cache_keys]
+
+    async def _aget_key(self, cache_key):
+        return (await self._aget_keys([cache_key]))[0]
+
+    async def aacquire_lease(self, cache_key, ttl):
+        token = uuid4().hex
+        acquired = await self.aclient.set(
+            await self._aget_key(f"lease-{cache_key}"),
+            token,
+            nx=True,
+            px=int(ttl * 1000),
+        )
+        return token if acquired else None
+
+    async def arelease_lease(self, cache_key, token):
+        await self.aclient.eval(
+            self._release_lease_script,
+            1,
+            await self._aget_key(f"lease-{cache_key}"),
+            token,
+        )
+
+    async def aread(self, cache_key):
+        cache_key = await self._aget_key(cache_key)
+        serilized_data = None
+        if not self._ttl:
+            serilized_data = await self.aclient.get(cache_key)
+        elif self._getex:
+            try:
+                serilized_data = await self.aclient.getex(cache_key, ex=self._ttl)
+            except ResponseError:
+                # server older than 6.2, fall back to a pipeline
+                self._getex = False
+
+        if self._ttl and not self._getex:
+            async with self.aclient.pipeline(transaction=False) as pipeline:
+                pipeline.get(cache_key)
+                pipeline.expire(cache_key, self._ttl)
+                serilized_data = (await pipeline.execute())[0]
+        if serilized_data is not None:
+            return True, serilized_data
+        return False, None
+
+    async def awrite(self, serilized_data, cache_key):
+        cache_key = await self._aget_key(cache_key)
+        if self._ttl:
+            await self.aclient.setex(cache_key, self._ttl, serilized_data)
+        else:
+            await self.aclient.set(cache_key, serilized_data)
+
+    async def adelete(self, cache_key):
+        await self.aclient.delete(await self._aget_key(cache_key))
+
+    async def aread_many(self, cache_keys):
+        if not cache_keys:
+            return []
+        keys = await self._aget_keys(cache_keys)
+
+        if not self._ttl:
+            serilized_datas = await self._amget(keys)
+        elif self._getex:
+            # read and refresh TTL of all keys in one round trip
+            async with self.aclient.pipeline(transaction=False) as pipeline:
+                for key in keys:
+                    pipeline.getex(key, ex=self._ttl)
+                try:
+                    serilized_datas = await pipeline.execute()
+                except ResponseError:
+                    # server older than 6.2
+                    self._getex = False
+                    return await self.aread_many(cache_keys)
+        else:
+            serilized_datas = await self._amget(keys)
+            async with self.aclient.pipeline(transaction=False) as pipeline:
+                for key in keys:
+                    pipeline.expire(key, self._ttl)
+                await pipeline.execute()
+
+        return [
+            (True, serilized_data) if serilized_data is not None else (False, None)
+            for serilized_data in serilized_datas
+        ]
+
+    async def _amget(self, keys):
+        if self._cluster:
+            # keys are spread over slots, MGET is split by node
+            return await self.aclient.mget_nonatomic(keys)
+        return await self.aclient.mget(keys)
+
+    async def awrite_many(self, serilized_datas, cache_keys):
+        keys = await self._aget_keys(cache_keys)
+        async with self.aclient.pipeline(transaction=False) as pipeline:
+            for serilized_data, key in zip(serilized_datas, keys):
+                if self._ttl:
+                    pipeline.setex(key, self._ttl, serilized_data)
+                else:
+                    pipeline.set(key, serilized_data)
+            await pipeline.execute()
+
+    async def adelete_many(self, cache_keys):
+        if cache_keys:
+            await self.aclient.delete(*await self._aget_keys(cache_keys))
@@ -28,3 +28,38 @@ class BaseAgent(metaclass=ABCMeta):
     @abstractmethod
     def reset(self):
         NotImplementedError
+
+    def read_many(self, cache_keys):
+        # fallback for agents without a native multi-key read
+        # returns a list of (status, serilized_data) in the order of cache_keys
+        return [self.read(cache_key) for cache_key in cache_keys]
+
+    def write_many(self, serilized_datas, cache_keys):
+        # fallback for agents without a native multi-key write
+        for serilized_data, cache_key in zip(serilized_datas, cache_keys):
+            self.write(serilized_data, cache_key)
+
+    def delete_many(self, cache_keys):
+        # fallback for agents without a native multi-key delete
+        for cache_key in cache_keys:
+            self.delete(cache_key)
+
+    # asyncio interface, agents without a native async client run the
+    # blocking methods inline, async agents override these
+    async def aread(self, cache_key):
+        return self.read(cache_key)
+
+    async def awrite(self, serilized_data, cache_key):
+        self.write(serilized_data, cache_key)
+
+    async def adelete(self, cache_key):
+        self.delete(cache_key)
+
+    async def aread_many(self, cache_keys):
+        return self.read_many(cache_keys)
+
+    async def awrite_many(self, serilized_datas, cache_keys):
+        self.write_many(serilized_datas, cache_keys)
+
+    async def adelete_many(self, cache_keys):
+        self.delete_many(cache_keys)
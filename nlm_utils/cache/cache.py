@@ -1,14 +1,42 @@
+import asyncio
+import inspect
 import logging
 import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import is_dataclass  # noreorder
+from functools import partial
 from functools import wraps
+from time import sleep
+from time import time
 
 from xxhash import xxh64
 
+from .compression import check_codec
+from .compression import compress
+from .compression import decompress
+from .envelope import NEGATIVE_FLAG
+from .envelope import unwrap
+from .envelope import wrap
+from .async_file_agent import AsyncFileAgent
+from .async_mongodb_agent import AsyncMongodbAgent
+from .async_redis_agent import AsyncRedisAgent
 from .file_agent import FileAgent
+from .key_builder import build_cache_key
+from .key_builder import key_memo_scope
+from .key_builder import RESERVED_KWARGS
+from .metrics import CacheMetrics
+from .metrics import NULL_METRICS
 from .memory_agent import MemoryAgent
 from .mongodb_agent import MongodbAgent
 from .redis_agent import RedisAgent
+from .serializers import SERIALIZERS
+from .single_flight import AsyncSingleFlight
+from .single_flight import SingleFlight
+from .snapshot import read_snapshot
+from .snapshot import write_snapshot
+from .sqlite_agent import SqliteAgent
+from .tiered_agent import TieredAgent
 
 from timeit import default_timer
 
@@ -17,13 +45,34 @@ FS_AGENTS = {
     "MemoryAgent": MemoryAgent,
     "RedisAgent": RedisAgent,
     "MongodbAgent": MongodbAgent,
+    "TieredAgent": TieredAgent,
+    "SqliteAgent": SqliteAgent,
+    "AsyncFileAgent": AsyncFileAgent,
+    "AsyncRedisAgent": AsyncRedisAgent,
+    "AsyncMongodbAgent": AsyncMongodbAgent,
     "File": FileAgent,
     "Memory": MemoryAgent,
     "Redis": RedisAgent,
     "Mongodb": MongodbAgent,
+    "Tiered": TieredAgent,
+    "Sqlite": SqliteAgent,
+    "AsyncFile": AsyncFileAgent,
+    "AsyncRedis": AsyncRedisAgent,
+    "AsyncMongodb": AsyncMongodbAgent,
 }
 
 
+def _metrics_name(func):
+    # functions of the same name in other modules or classes get their own metrics
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def _nbytes(serilized_data):
+    if isinstance(serilized_data, memoryview):
+        return serilized_data.nbytes
+    return len(serilized_data)
+
+
 class Cache:
     __name__ = "Cache"
 
@@ -33,6 +82,21 @@ class Cache:
         protocol="pickle",
         grpc_object=None,
         *args,
+        single_flight: bool = False,
+        lease_ttl: float = None,
+        lease_poll_interval: float = 0.05,
+        compression: str = None,
+        compression_threshold: int = 1024,
+        compression_level: int = None,
+        key_builder: str = "pickle",
+        key_memo_threshold: int = 1 << 16,
+        soft_ttl: float = None,
+        refresh_workers: int = 4,
+        cache_none: bool = False,
+        negative_ttl: float = 60,
+        negative_empty: bool = False,
+        metrics: bool = True,
+        verbose: bool = True,
         **kwargs,
     ):
         self.logger = logging.getLogger(self.__class__.__name__)
@@ -42,6 +106,59 @@ class Cache:
         if self.protocol == "grpc" and self.grpc_object is None:
             raise ValueError("Please set grpc_object when using grpc protocol")
 
+        # compress serialized payloads larger than compression_threshold bytes
+        self.compression = compression.lower() if compression else None
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+        if self.compression:
+            check_codec(self.compression)
+
+        # "pickle" keeps the original keys, "xxh3" hashes arguments directly
+        # (opt-in, its keys differ from the ones of existing caches)
+        if key_builder not in ("xxh3", "pickle"):
+            raise ValueError(f"Unknown key_builder {key_builder}")
+        self.key_builder = key_builder
+        self.key_memo_threshold = key_memo_threshold
+
+        # single-flight: concurrent misses on the same cache_key run func only once
+        self.single_flight = single_flight
+        self._single_flight = SingleFlight()
+        self._async_single_flight = AsyncSingleFlight()
+        # lease: deduplicate across processes, needs an agent with acquire_lease
+        self.lease_ttl = lease_ttl
+        self.lease_poll_interval = lease_poll_interval
+        self._lease_coalesced = 0
+        self._lease_coalesced_lock = threading.Lock()
+
+        # stale-while-revalidate: entries older than soft_ttl seconds are returned
+        # and refreshed in the background, the hard TTL is kept by the agent
+        self.soft_ttl = soft_ttl
+        self._refresh_executor = None
+        if self.soft_ttl:
+            self._refresh_executor = ThreadPoolExecutor(
+                max_workers=refresh_workers,
+                thread_name_prefix="CacheRefresh",
+            )
+        self._refresh_lock = threading.Lock()
+        # cache_keys being refreshed, and the refresh tasks of coroutine functions
+        self._refreshing = set()
+        self._refresh_tasks = set()
+        self._stale = 0
+
+        # negative caching: with cache_none, None results are cached as negative
+        # entries for negative_ttl seconds, negative_empty does the same for empty
+        # results (e.g. [] returned on failure) instead of caching them for good
+        self.cache_none = cache_none
+        self.negative_ttl = negative_ttl
+        self.negative_empty = negative_empty
+        # entries carry a header with the write time and flags
+        self._envelope = bool(self.soft_ttl or cache_none or negative_empty)
+
+        # per-function counters and latency histograms, see CacheMetrics
+        self.metrics = CacheMetrics(enabled=metrics)
+        # verbose=False skips the INFO logs emitted on every call
+        self.verbose = verbose
+
         if isinstance(fs_agent, str):
             self.fs_agent = FS_AGENTS[fs_agent](*args, **kwargs)
         else:
@@ -62,12 +179,44 @@ class Cache:
     def connected(self):
         return self.fs_agent.connected
 
-    def __call__(self, func):
+    @property
+    def stores_objects(self):
+        # agent keeps deserialized objects, e.g. TieredAgent(l1_deserialized=True)
+        return getattr(self.fs_agent, "l1_deserialized", False)
+
+    @property
+    def stats(self):
+        return {
+            # calls which waited on a computation in the same process
+            "coalesced": self._single_flight.coalesced
+            + self._async_single_flight.coalesced,
+            # calls which waited on a computation in another process
+            "lease_coalesced": self._lease_coalesced,
+            # stale entries returned while being refreshed
+            "stale": self._stale,
+        }
+
+    def __call__(self, func=None, key_fields=None):
+        """
+        Decorate a function with cache, as `@cache` or `@cache(key_fields=...)`.
+        Coroutine functions are wrapped by a coroutine which uses the async
+        interface of the agent.
+
+        key_fields: names of the parameters used to build the cache_key,
+            all arguments are used by default.
+        """
+        if func is None:
+            return partial(self.__call__, key_fields=key_fields)
+
+        signature = inspect.signature(func) if key_fields else None
+        if inspect.iscoroutinefunction(func):
+            return self._wrap_coroutine(func, key_fields, signature)
+
         @wraps(func)
         def wrapped(*args, **kwargs):
             # remove reserved_kwarg before going into func
             f_kwargs = kwargs.copy()
-            for reserved_kwarg in ["overwrite", "cache_key", "no_cache"]:
+            for reserved_kwarg in RESERVED_KWARGS:
                 if reserved_kwarg in f_kwargs:
                     del f_kwargs[reserved_kwarg]
 
@@ -89,44 +238,374 @@ class Cache:
                     f"Can not apply cache to function {func} : both args and kwargs are empty",
                 )
 
+            # build cache_key from the selected parameters only
+            if key_fields and "cache_key" not in kwargs:
+                kwargs = self._bind_key_fields(
+                    func,
+                    key_fields,
+                    signature,
+                    args,
+                    f_kwargs,
+                    kwargs,
+                )
+
+            metrics = self.metrics.get(_metrics_name(func))
+
             # read cache and cache_key
             status, data, cache_key = self.read_cache(func, *args, **kwargs)
-            if status and data is not None:
+            if status and (data is not None or self.cache_none):
+                metrics.inc("hits")
+                metrics.observe("hit_latency", default_timer() - wall_time)
+                if self.verbose:
+                    self.logger.info(
+                        f"reading cache: key='{cache_key}' in {default_timer() - wall_time:.4f}s",
+                    )
+                return data
+
+            # cache not found
+            metrics.inc("misses")
+            if self.verbose:
+                self.logger.info(f"generating cache: key='{cache_key}'")
+
+            coalesced = False
+            if self.single_flight:
+                data, coalesced = self._single_flight.do(
+                    cache_key,
+                    partial(self._generate_cache, func, args, f_kwargs, cache_key),
+                )
+            else:
+                data = self._generate_cache(func, args, f_kwargs, cache_key)
+
+            metrics.observe("miss_latency", default_timer() - wall_time)
+            if coalesced:
+                metrics.inc("coalesced")
+                if self.verbose:
+                    self.logger.info(f"coalesced cache: key='{cache_key}'")
+            elif self.verbose:
                 self.logger.info(
-                    f"reading cache: key='{cache_key}' in {default_timer() - wall_time:.4f}s",
+                    f"saving cache: key='{cache_key}' in {default_timer() - wall_time:.4f}s",
                 )
+            return data
+
+        return wrapped
+
+    def _bind_key_fields(self, func, key_fields, signature, args, f_kwargs, kwargs):
+        bound_args = signature.bind(*args, **f_kwargs)
+        bound_args.apply_defaults()
+        return dict(
+            kwargs,
+            cache_key=self.get_cache_key(
+                func.__name__,
+                **{field: bound_args.arguments[field] for field in key_fields},
+            ),
+        )
+
+    def _wrap_coroutine(self, func, key_fields, signature):
+        @wraps(func)
+        async def wrapped(*args, **kwargs):
+            # remove reserved_kwarg before going into func
+            f_kwargs = kwargs.copy()
+            for reserved_kwarg in RESERVED_KWARGS:
+                if reserved_kwarg in f_kwargs:
+                    del f_kwargs[reserved_kwarg]
+
+            wall_time = default_timer()
+
+            # agent not connected
+            if not self.connected:
+                self.logger.error("Cache Agent is not connected. Skiping the cache.")
+                return await func(*args, **f_kwargs)
+
+            # no_cache passed, skiping
+            if kwargs.get("no_cache", False):
+                self.logger.error("`no_cache` is set to True. Skiping the cache.")
+                return await func(*args, **f_kwargs)
+
+            # build cache_key from the selected parameters only
+            if key_fields and "cache_key" not in kwargs:
+                kwargs = self._bind_key_fields(
+                    func,
+                    key_fields,
+                    signature,
+                    args,
+                    f_kwargs,
+                    kwargs,
+                )
+
+            metrics = self.metrics.get(_metrics_name(func))
+
+            # read cache and cache_key
+            status, data, cache_key = await self.aread_cache(func, *args, **kwargs)
+            if status and (data is not None or self.cache_none):
+                metrics.inc("hits")
+                metrics.observe("hit_latency", default_timer() - wall_time)
+                if self.verbose:
+                    self.logger.info(
+                        f"reading cache: key='{cache_key}' in {default_timer() - wall_time:.4f}s",
+                    )
                 return data
 
             # cache not found
-            self.logger.info(f"generating cache: key='{cache_key}'")
+            metrics.inc("misses")
+            if self.verbose:
+                self.logger.info(f"generating cache: key='{cache_key}'")
+
+            coalesced = False
+            if self.single_flight:
+                data, coalesced = await self._async_single_flight.do(
+                    cache_key,
+                    partial(self._agenerate_cache, func, args, f_kwargs, cache_key),
+                )
+            else:
+                data = await self._agenerate_cache(func, args, f_kwargs, cache_key)
+
+            metrics.observe("miss_latency", default_timer() - wall_time)
+            if coalesced:
+                metrics.inc("coalesced")
+                if self.verbose:
+                    self.logger.info(f"coalesced cache: key='{cache_key}'")
+            elif self.verbose:
+                self.logger.info(
+                    f"saving cache: key='{cache_key}' in {default_timer() - wall_time:.4f}s",
+                )
+            return data
 
+        return wrapped
+
+    def _generate_cache(self, func, args, kwargs, cache_key):
+        lease = None
+        if self.lease_ttl and hasattr(self.fs_agent, "acquire_lease"):
+            lease = self.fs_agent.acquire_lease(cache_key, self.lease_ttl)
+            if lease is None:
+                # another process is generating the cache, wait for it
+                status, data, lease = self._wait_for_lease(cache_key)
+                if status:
+                    with self._lease_coalesced_lock:
+                        self._lease_coalesced += 1
+                    return data
+
+        metrics = self.metrics.get(_metrics_name(func))
+        try:
             # run function to get cache
-            data = func(*args, **f_kwargs)
+            start = default_timer()
+            data = func(*args, **kwargs)
+            metrics.observe("compute", default_timer() - start)
 
-            if data is not None:
+            if data is not None or self.cache_none:
                 # write serilized_data to agent
-                self.write_cache(data, cache_key)
+                self._write_cache(data, cache_key, metrics)
+        finally:
+            if lease is not None:
+                self.fs_agent.release_lease(cache_key, lease)
 
-            self.logger.info(
-                f"saving cache: key='{cache_key}' in {default_timer() - wall_time:.4f}s",
+        return data
+
+    def _wait_for_lease(self, cache_key):
+        # poll the cache until the lease holder writes the data,
+        # take over the lease if it is released or expired without data
+        deadline = default_timer() + self.lease_ttl
+        while default_timer() < deadline:
+            sleep(self.lease_poll_interval)
+            status, data = self._poll_cache(cache_key)
+            if status:
+                return True, data, None
+            lease = self.fs_agent.acquire_lease(cache_key, self.lease_ttl)
+            if lease is not None:
+                return False, None, lease
+        return False, None, None
+
+    def _poll_cache(self, cache_key):
+        # read for the waiters of a lease, the same way as read_cache
+        if self.stores_objects:
+            status, data, _ = self._read_object(cache_key)
+            if status:
+                return status, data
+        status, serilized_data = self.fs_agent.read(cache_key)
+        return self._load_cache(status, serilized_data, cache_key)[:2]
+
+    async def _agenerate_cache(self, func, args, kwargs, cache_key):
+        # the lease needs an agent with an async client, e.g. AsyncRedisAgent
+        lease = None
+        if self.lease_ttl and hasattr(self.fs_agent, "aacquire_lease"):
+            lease = await self.fs_agent.aacquire_lease(cache_key, self.lease_ttl)
+            if lease is None:
+                # another process is generating the cache, wait for it
+                status, data, lease = await self._await_lease(cache_key)
+                if status:
+                    with self._lease_coalesced_lock:
+                        self._lease_coalesced += 1
+                    return data
+
+        metrics = self.metrics.get(_metrics_name(func))
+        try:
+            start = default_timer()
+            data = await func(*args, **kwargs)
+            metrics.observe("compute", default_timer() - start)
+
+            if data is not None or self.cache_none:
+                await self._awrite_cache(data, cache_key, metrics)
+        finally:
+            if lease is not None:
+                await self.fs_agent.arelease_lease(cache_key, lease)
+
+        return data
+
+    async def _apoll_cache(self, cache_key):
+        if self.stores_objects:
+            status, data, _ = self._read_object(cache_key)
+            if status:
+                return status, data
+        status, serilized_data = await self.fs_agent.aread(cache_key)
+        return self._load_cache(status, serilized_data, cache_key)[:2]
+
+    async def _await_lease(self, cache_key):
+        deadline = default_timer() + self.lease_ttl
+        while default_timer() < deadline:
+            await asyncio.sleep(self.lease_poll_interval)
+            status, data = await self._apoll_cache(cache_key)
+            if status:
+                return True, data, None
+            lease = await self.fs_agent.aacquire_lease(cache_key, self.lease_ttl)
+            if lease is not None:
+                return False, None, lease
+        return False, None, None
+
+    def batch(self, func=None, argnum: int = 0):
+        """
+        Element-wise cache on a list argument.
+
+        The decorated function receives a list at position `argnum` and must
+        return a list of the same length. Each item is cached under its own key,
+        and the function is only called with the items missing from the cache.
+
+            @cache.batch
+            def encode(sentences):
+                ...
+
+            @cache.batch(argnum=1)
+            def encode(self, sentences):
+                ...
+        """
+        if func is None:
+            return partial(self.batch, argnum=argnum)
+
+        @wraps(func)
+        def wrapped(*args, **kwargs):
+            # remove reserved_kwarg before going into func
+            f_kwargs = kwargs.copy()
+            for reserved_kwarg in RESERVED_KWARGS:
+                if reserved_kwarg in f_kwargs:
+                    del f_kwargs[reserved_kwarg]
+
+            wall_time = default_timer()
+
+            # agent not connected
+            if not self.connected:
+                self.logger.error("Cache Agent is not connected. Skiping the cache.")
+                return func(*args, **f_kwargs)
+
+            # no_cache passed, skiping
+            if kwargs.get("no_cache", False):
+                self.logger.error("`no_cache` is set to True. Skiping the cache.")
+                return func(*args, **f_kwargs)
+
+            items = args[argnum]
+            if not items:
+                return func(*args, **f_kwargs)
+
+            # one cache_key per item, other arguments are shared by all items
+            with key_memo_scope():
+                cache_keys = [
+                    self.get_cache_key(
+                        func.__name__,
+                        *args[:argnum],
+                        item,
+                        *args[argnum + 1 :],
+                        **f_kwargs,
+                    )
+                    for item in items
+                ]
+
+            metrics = self.metrics.get(_metrics_name(func))
+
+            if kwargs.get("overwrite", False):
+                results = [(False, None)] * len(items)
+            else:
+                start = default_timer()
+                results = self.read_many_cache(cache_keys)
+                metrics.observe("read", default_timer() - start)
+
+            outputs = [data for _, data in results]
+            missing = [
+                idx
+                for idx, (status, data) in enumerate(results)
+                if not status or (data is None and not self.cache_none)
+            ]
+
+            if missing:
+                # run function only on the items not found in cache
+                missing_args = list(args)
+                missing_args[argnum] = [items[idx] for idx in missing]
+                start = default_timer()
+                missing_outputs = func(*missing_args, **f_kwargs)
+                metrics.observe("compute", default_timer() - start)
+                if len(missing_outputs) != len(missing):
+                    raise ValueError(
+                        f"{func.__name__} returned {len(missing_outputs)} outputs "
+                        f"for {len(missing)} inputs, cache.batch needs one output per input",
+                    )
+
+                write_datas, write_keys = [], []
+                for idx, data in zip(missing, missing_outputs):
+                    outputs[idx] = data
+                    if data is not None or self.cache_none:
+                        write_datas.append(data)
+                        write_keys.append(cache_keys[idx])
+                start = default_timer()
+                self.write_many_cache(write_datas, write_keys)
+                metrics.observe("write", default_timer() - start)
+
+            metrics.inc("hits", len(items) - len(missing))
+            metrics.inc("misses", len(missing))
+            metrics.observe(
+                "miss_latency" if missing else "hit_latency",
+                default_timer() - wall_time,
             )
-            return data
+            if self.verbose:
+                self.logger.info(
+                    f"batch cache: {len(items) - len(missing)} hits, {len(missing)} misses "
+                    f"in {default_timer() - wall_time:.4f}s",
+                )
+            return outputs
 
         return wrapped
 
     def get_cache_key(self, *args, **kwargs):
-        # use pickle to dump binary context of python object
-        # pickle is in memory operations.
-        # tested with a 300,000 words doc.
-        # It takes 11.5 µs to generate the binary
         # hash should take both args and kwargs so that cache is assosicated
         # with both data and hyper-parameters
         if "cache_key" in kwargs:
             return kwargs["cache_key"]
+
+        if self.key_builder == "pickle":
+            return self._get_pickle_cache_key(*args, **kwargs)
+        return build_cache_key(args, kwargs, self.key_memo_threshold)
+
+    @staticmethod
+    def key_scope():
+        """
+        Memoize the hash of large str/bytes arguments by id() within the scope,
+        e.g. around one request which passes the same document to many functions.
+        """
+        return key_memo_scope()
+
+    def _get_pickle_cache_key(self, *args, **kwargs):
+        # use pickle to dump binary context of python object
+        # pickle is in memory operations.
+        # tested with a 300,000 words doc.
+        # It takes 11.5 µs to generate the binary
         if "overwrite" in kwargs:
             del kwargs["overwrite"]
 
-        self.logger.info("no cache_key provided, generating by hashing")
         hash_args = []
         # remove class object from args
         for index, arg in enumerate(args):
@@ -157,50 +636,403 @@ class Cache:
             self.logger.info(f"overwriting cache: key='{cache_key}'")
             return status, None, cache_key
 
+        if self.stores_objects:
+            status, data, written_at = self._read_object(cache_key)
+            if status:
+                if self._is_stale(written_at):
+                    self._refresh(func, args, kwargs, cache_key)
+                return status, data, cache_key
+
         # read cache
+        metrics = self.metrics.get(_metrics_name(func))
+        start = default_timer()
         status, serilized_data = self.fs_agent.read(cache_key)
+        metrics.observe("read", default_timer() - start)
+        if not status and self.verbose:
+            self.logger.info(f"cache key='{cache_key}' not found, skipping")
+        status, data, written_at = self._load_cache(
+            status,
+            serilized_data,
+            cache_key,
+            metrics,
+        )
+        if status and self._is_stale(written_at):
+            self._refresh(func, args, kwargs, cache_key)
+        return status, data, cache_key
+
+    async def aread_cache(self, func, *args, **kwargs):
+        cache_key = self.get_cache_key(func.__name__, *args, **kwargs)
 
+        if kwargs.get("overwrite", False):
+            self.logger.info(f"overwriting cache: key='{cache_key}'")
+            return False, None, cache_key
+
+        if self.stores_objects:
+            status, data, written_at = self._read_object(cache_key)
+            if status:
+                if self._is_stale(written_at):
+                    self._arefresh(func, args, kwargs, cache_key)
+                return status, data, cache_key
+
+        metrics = self.metrics.get(_metrics_name(func))
+        start = default_timer()
+        status, serilized_data = await self.fs_agent.aread(cache_key)
+        metrics.observe("read", default_timer() - start)
+        if not status and self.verbose:
+            self.logger.info(f"cache key='{cache_key}' not found, skipping")
+        status, data, written_at = self._load_cache(
+            status,
+            serilized_data,
+            cache_key,
+            metrics,
+        )
+        if status and self._is_stale(written_at):
+            self._arefresh(func, args, kwargs, cache_key)
+        return status, data, cache_key
+
+    def _load_cache(self, status, serilized_data, cache_key, metrics=NULL_METRICS):
+        # returns (status, data, written_at), written_at is None without envelope
         data = None
+        written_at = None
         if status:
+            metrics.inc("bytes_read", _nbytes(serilized_data))
             # deserilize object
             try:
-                # deserilize pickle
-                if self.protocol == "pickle":
-                    data = pickle.loads(serilized_data)
-                # deserilize grpc
-                elif self.protocol == "grpc":
-                    data = self.grpc_object.FromString(serilized_data)
-                # return original data
-                else:
-                    data = serilized_data
+                start = default_timer()
+                written_at, flags, data = self._unpack(serilized_data)
+                metrics.observe("deserialize", default_timer() - start)
+                if flags & NEGATIVE_FLAG:
+                    if time() - written_at > self.negative_ttl:
+                        # expired negative entry, same as a miss
+                        return False, None, None
+                    metrics.inc("negative_hits")
+                    # negative entries expire instead of being refreshed
+                    return True, data, None
+                if self.stores_objects:
+                    self._write_object(data, cache_key, serilized_data, written_at)
             except Exception as e:
                 self.logger.error(f"unable to read cache key='{cache_key}', {e}")
                 status = False
+        return status, data, written_at
+
+    def _read_object(self, cache_key):
+        # returns (status, data, written_at), with soft_ttl objects are kept
+        # along with their write time
+        status, data = self.fs_agent.read_object(cache_key)
+        if status and self.soft_ttl:
+            written_at, data = data
+            return status, data, written_at
+        return status, data, None
+
+    def _write_object(self, data, cache_key, serilized_data, written_at=None):
+        if self.soft_ttl:
+            data = (time() if written_at is None else written_at, data)
+        self.fs_agent.write_object(data, cache_key, _nbytes(serilized_data))
+
+    def _is_stale(self, written_at):
+        return (
+            self.soft_ttl is not None
+            and written_at is not None
+            and time() - written_at > self.soft_ttl
+        )
+
+    def _start_refresh(self, cache_key):
+        # only one refresh per cache_key at a time
+        with self._refresh_lock:
+            if cache_key in self._refreshing:
+                return False
+            self._refreshing.add(cache_key)
+            self._stale += 1
+        self.logger.info(f"refreshing stale cache: key='{cache_key}'")
+        return True
+
+    def _finish_refresh(self, cache_key):
+        with self._refresh_lock:
+            self._refreshing.discard(cache_key)
+
+    def _refresh(self, func, args, kwargs, cache_key):
+        if not self._start_refresh(cache_key):
+            return
+        self.metrics.get(_metrics_name(func)).inc("stale")
+        f_kwargs = {
+            key: value for key, value in kwargs.items() if key not in RESERVED_KWARGS
+        }
+
+        def refresh():
+            try:
+                self._generate_cache(func, args, f_kwargs, cache_key)
+            except Exception as e:
+                self.logger.error(f"unable to refresh cache key='{cache_key}', {e}")
+            finally:
+                self._finish_refresh(cache_key)
+
+        self._refresh_executor.submit(refresh)
+
+    def _arefresh(self, func, args, kwargs, cache_key):
+        if not self._start_refresh(cache_key):
+            return
+        self.metrics.get(_metrics_name(func)).inc("stale")
+        f_kwargs = {
+            key: value for key, value in kwargs.items() if key not in RESERVED_KWARGS
+        }
+
+        def done(task):
+            self._refresh_tasks.discard(task)
+            self._finish_refresh(cache_key)
+            if not task.cancelled() and task.exception() is not None:
+                self.logger.error(
+                    f"unable to refresh cache key='{cache_key}', {task.exception()}",
+                )
+
+        # keep a reference, the event loop only keeps weak references to tasks
+        task = asyncio.get_running_loop().create_task(
+            self._agenerate_cache(func, args, f_kwargs, cache_key),
+        )
+        self._refresh_tasks.add(task)
+        task.add_done_callback(done)
+
+    def read_many_cache(self, cache_keys):
+        # returns a list of (status, data) in the order of cache_keys
+        if self.stores_objects:
+            results = [self._read_object(cache_key)[:2] for cache_key in cache_keys]
         else:
-            self.logger.info(f"cache key='{cache_key}' not found, skipping")
+            results = [(False, None)] * len(cache_keys)
 
-        return status, data, cache_key
+        missing = [idx for idx, (status, _) in enumerate(results) if not status]
+        if not missing:
+            return results
+
+        results = list(results)
+        for idx, (status, serilized_data) in zip(
+            missing,
+            self.fs_agent.read_many([cache_keys[idx] for idx in missing]),
+        ):
+            results[idx] = self._load_cache(status, serilized_data, cache_keys[idx])[:2]
+        return results
+
+    async def aread_many_cache(self, cache_keys):
+        if self.stores_objects:
+            results = [self._read_object(cache_key)[:2] for cache_key in cache_keys]
+        else:
+            results = [(False, None)] * len(cache_keys)
+
+        missing = [idx for idx, (status, _) in enumerate(results) if not status]
+        if not missing:
+            return results
+
+        results = list(results)
+        for idx, (status, serilized_data) in zip(
+            missing,
+            await self.fs_agent.aread_many([cache_keys[idx] for idx in missing]),
+        ):
+            results[idx] = self._load_cache(status, serilized_data, cache_keys[idx])[:2]
+        return results
 
     def write_cache(self, data, cache_key):
-        if self.connected:
+        self._write_cache(data, cache_key, NULL_METRICS)
 
-            # serilize data
-            if self.protocol == "pickle":
-                # pickle object with protocol 4
-                serilized_data = pickle.dumps(data, protocol=4)
-            elif self.protocol == "grpc":
-                # serilize to protobuf
-                serilized_data = data.SerializeToString()
-            else:
-                serilized_data = data
-                assert isinstance(serilized_data, [str, bytes])
+    def _write_cache(self, data, cache_key, metrics):
+        if self.connected:
+            start = default_timer()
+            serilized_data = self.serialize(data)
+            metrics.observe("serialize", default_timer() - start)
+            metrics.inc("bytes_written", _nbytes(serilized_data))
+            if self.stores_objects and not self._is_negative(data):
+                self._write_object(data, cache_key, serilized_data)
 
+            start = default_timer()
             self.fs_agent.write(serilized_data, cache_key)
+            metrics.observe("write", default_timer() - start)
+
+    def write_many_cache(self, datas, cache_keys):
+        if self.connected:
+            serilized_datas = [self.serialize(data) for data in datas]
+            if self.stores_objects:
+                for data, serilized_data, cache_key in zip(
+                    datas,
+                    serilized_datas,
+                    cache_keys,
+                ):
+                    if not self._is_negative(data):
+                        self._write_object(data, cache_key, serilized_data)
+            self.fs_agent.write_many(serilized_datas, cache_keys)
+
+    async def awrite_cache(self, data, cache_key):
+        await self._awrite_cache(data, cache_key, NULL_METRICS)
+
+    async def _awrite_cache(self, data, cache_key, metrics):
+        if self.connected:
+            start = default_timer()
+            serilized_data = self.serialize(data)
+            metrics.observe("serialize", default_timer() - start)
+            metrics.inc("bytes_written", _nbytes(serilized_data))
+            if self.stores_objects and not self._is_negative(data):
+                self._write_object(data, cache_key, serilized_data)
+
+            start = default_timer()
+            await self.fs_agent.awrite(serilized_data, cache_key)
+            metrics.observe("write", default_timer() - start)
+
+    async def awrite_many_cache(self, datas, cache_keys):
+        if self.connected:
+            serilized_datas = [self.serialize(data) for data in datas]
+            if self.stores_objects:
+                for data, serilized_data, cache_key in zip(
+                    datas,
+                    serilized_datas,
+                    cache_keys,
+                ):
+                    if not self._is_negative(data):
+                        self._write_object(data, cache_key, serilized_data)
+            await self.fs_agent.awrite_many(serilized_datas, cache_keys)
+
+    def _is_negative(self, data):
+        return data is None or (
+            self.negative_empty
+            and isinstance(data, (list, tuple, dict, set, str, bytes))
+            and not data
+        )
+
+    def serialize(self, data):
+        if data is None:
+            # negative entry, only written with cache_none
+            serilized_data = b""
+        elif self.protocol in SERIALIZERS:
+            # pickle (protocol 4), pickle5 (out-of-band buffers) or msgpack
+            dumps, _ = SERIALIZERS[self.protocol]
+            serilized_data = dumps(data)
+        elif self.protocol == "grpc":
+            # serilize to protobuf
+            serilized_data = data.SerializeToString()
+        else:
+            assert isinstance(data, (str, bytes))
+            serilized_data = data
+
+        if self.compression:
+            serilized_data = compress(
+                serilized_data,
+                self.compression,
+                self.compression_threshold,
+                self.compression_level,
+            )
+
+        if self._envelope and isinstance(serilized_data, (bytes, bytearray)):
+            # record when the entry was written for stale-while-revalidate,
+            # and flag negative entries
+            serilized_data = wrap(
+                serilized_data,
+                flags=NEGATIVE_FLAG if self._is_negative(data) else 0,
+            )
+        return serilized_data
+
+    def deserialize(self, serilized_data):
+        return self._unpack(serilized_data)[2]
+
+    def _unpack(self, serilized_data):
+        # returns (written_at, flags, data)
+        written_at, flags = None, 0
+        if self._envelope:
+            written_at, flags, serilized_data = unwrap(serilized_data)
+        if flags & NEGATIVE_FLAG and not len(serilized_data):
+            return written_at, flags, None
+        return written_at, flags, self._decode(serilized_data)
+
+    def _decode(self, serilized_data):
+        # payloads without compression header are returned as is
+        if self.compression:
+            serilized_data = decompress(serilized_data)
+
+        # deserilize pickle, pickle5 or msgpack
+        if self.protocol in SERIALIZERS:
+            _, loads = SERIALIZERS[self.protocol]
+            return loads(serilized_data)
+        # deserilize grpc
+        elif self.protocol == "grpc":
+            return self.grpc_object.FromString(serilized_data)
+        # return original data
+        else:
+            return serilized_data
 
     def delete_cache(self, cache_key):
         if self.connected:
             self.fs_agent.delete(cache_key)
 
+    def delete_many_cache(self, cache_keys):
+        if self.connected:
+            self.fs_agent.delete_many(cache_keys)
+
+    async def adelete_cache(self, cache_key):
+        if self.connected:
+            await self.fs_agent.adelete(cache_key)
+
+    async def adelete_many_cache(self, cache_keys):
+        if self.connected:
+            await self.fs_agent.adelete_many(cache_keys)
+
     def reset(self):
         if self.connected:
             self.fs_agent.reset()
+
+    def export_snapshot(self, path, limit: int = 10000, batch_size: int = 1000):
+        """
+        Write the `limit` hottest entries of the agent to a snapshot file,
+        see `load_snapshot`. Values are written as stored by the agent
+        (serialized, compressed), from the coldest to the hottest entry.
+        Returns the number of entries written.
+        """
+        if not hasattr(self.fs_agent, "hot_keys"):
+            raise TypeError(
+                f"{self.fs_agent.__name__} does not track the hot keys, "
+                "export_snapshot needs an agent with hot_keys",
+            )
+        # coldest first, so the hottest entries are the most recently used ones
+        # after loading into an LRU, and reading them here keeps their order
+        cache_keys = self.fs_agent.hot_keys(limit)[::-1]
+
+        def items():
+            for i in range(0, len(cache_keys), batch_size):
+                chunk = cache_keys[i : i + batch_size]
+                for cache_key, (status, serilized_data) in zip(
+                    chunk,
+                    self.fs_agent.read_many(chunk),
+                ):
+                    if not status and self.stores_objects:
+                        # only kept as object in L1
+                        status, data = self._read_object(cache_key)[:2]
+                        if status:
+                            serilized_data = self.serialize(data)
+                    if status and isinstance(
+                        serilized_data,
+                        (bytes, bytearray, memoryview),
+                    ):
+                        yield cache_key, serilized_data
+
+        n_entries = write_snapshot(path, items())
+        self.logger.info(f"exported {n_entries} cache entries to {path}")
+        return n_entries
+
+    def load_snapshot(self, path, batch_size: int = 1000):
+        """
+        Bulk load a snapshot written by `export_snapshot` into the agent,
+        e.g. to warm up a MemoryAgent at startup. With a deserialized L1
+        (TieredAgent(l1_deserialized=True)), the entries are deserialized into
+        L1 as well.
+        Returns the number of entries loaded.
+        """
+        n_entries = 0
+        serilized_datas, cache_keys = [], []
+        for cache_key, serilized_data in read_snapshot(path):
+            if self.stores_objects:
+                # writes the object into L1, expired negative entries are skipped
+                self._load_cache(True, serilized_data, cache_key)
+            serilized_datas.append(serilized_data)
+            cache_keys.append(cache_key)
+            if len(cache_keys) >= batch_size:
+                self.fs_agent.write_many(serilized_datas, cache_keys)
+                n_entries += len(cache_keys)
+                serilized_datas, cache_keys = [], []
+        if cache_keys:
+            self.fs_agent.write_many(serilized_datas, cache_keys)
+            n_entries += len(cache_keys)
+        self.logger.info(f"loaded {n_entries} cache entries from {path}")
+        return n_entries
@@ -0,0 +1,88 @@
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+
+# With compression enabled, every payload starts with a one byte header naming
+# the codec, payloads below the threshold get NONE_HEADER and are stored as is.
+# Payloads without header (entries written before compression was enabled)
+# are returned as is. The header values have 110 as their low 3 bits, an
+# invalid protobuf wire type, and pickle protocol 2+ payloads always start
+# with \x80, so those entries can not be mistaken for a compressed payload.
+NONE_HEADER = 0x0E
+ZLIB_HEADER = 0x1E
+ZSTD_HEADER = 0x2E
+LZ4_HEADER = 0x3E
+
+
+def _zstd_compress(data, level):
+    return zstandard.ZstdCompressor(level=level or 3).compress(data)
+
+
+def _zstd_decompress(data):
+    # frames written by ZstdCompressor.compress always carry the content size
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def _lz4_compress(data, level):
+    return lz4_frame.compress(data, compression_level=level or 0)
+
+
+def _lz4_decompress(data):
+    return lz4_frame.decompress(data)
+
+
+def _zlib_compress(data, level):
+    return zlib.compress(data, level or 6)
+
+
+def _zlib_decompress(data):
+    return zlib.decompress(data)
+
+
+CODECS = {
+    "zlib": (ZLIB_HEADER, _zlib_compress, _zlib_decompress),
+    "zstd": (ZSTD_HEADER, _zstd_compress, _zstd_decompress),
+    "lz4": (LZ4_HEADER, _lz4_compress, _lz4_decompress),
+}
+HEADERS = {header: decompress for header, _, decompress in CODECS.values()}
+
+
+def check_codec(codec):
+    if codec not in CODECS:
+        raise ValueError(
+            f"Unknown compression {codec}, please choose from {list(CODECS)}",
+        )
+    if codec == "zstd" and zstandard is None:
+        raise ImportError("Please install `zstandard` to use zstd compression")
+    if codec == "lz4" and lz4_frame is None:
+        raise ImportError("Please install `lz4` to use lz4 compression")
+
+
+def compress(data, codec, threshold=0, level=None):
+    # empty payloads (None results of negative caching) are kept empty
+    if not isinstance(data, (bytes, bytearray, memoryview)) or not len(data):
+        return data
+    if len(data) < threshold:
+        return bytes([NONE_HEADER]) + data
+    header, compress_func, _ = CODECS[codec]
+    return bytes([header]) + compress_func(data, level)
+
+
+def decompress(data):
+    if not isinstance(data, (bytes, bytearray, memoryview)) or not len(data):
+        return data
+    if data[0] == NONE_HEADER:
+        return data[1:]
+    decompress_func = HEADERS.get(data[0])
+    if decompress_func is None:
+        return data
+    return decompress_func(memoryview(data)[1:])
@@ -0,0 +1,40 @@
+import struct
+from time import time
+
+# Entries written with soft_ttl or negative caching are wrapped in an envelope:
+#   header byte | written_at (float64, unix time) | flags (uint8) | payload
+# The header has 110 as its low 3 bits like the compression headers, so it can
+# not be mistaken for a protobuf or pickle payload.
+ENVELOPE_HEADER = 0x4E
+ENVELOPE_STRUCT = struct.Struct("<dB")
+
+# flags
+# negative entry: a None (empty payload) or empty result, expires after negative_ttl
+NEGATIVE_FLAG = 0x01
+
+
+def wrap(payload, flags=0, written_at=None):
+    if written_at is None:
+        written_at = time()
+    return b"".join(
+        [
+            bytes([ENVELOPE_HEADER]),
+            ENVELOPE_STRUCT.pack(written_at, flags),
+            payload,
+        ],
+    )
+
+
+def unwrap(data):
+    """
+    Returns (written_at, flags, payload), written_at is None for entries
+    written without envelope.
+    """
+    if (
+        not isinstance(data, (bytes, bytearray, memoryview))
+        or len(data) <= ENVELOPE_STRUCT.size
+        or data[0] != ENVELOPE_HEADER
+    ):
+        return None, 0, data
+    written_at, flags = ENVELOPE_STRUCT.unpack_from(data, 1)
+    return written_at, flags, memoryview(data)[1 + ENVELOPE_STRUCT.size :]
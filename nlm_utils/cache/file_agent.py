@@ -1,15 +1,62 @@
+import heapq
+import mmap
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from shutil import rmtree
 from tempfile import mkdtemp
+from tempfile import mkstemp
+from time import time
+from uuid import uuid4
+
+from xxhash import xxh64
 
 from .base_agent import BaseAgent
 
+TMP_PREFIX = ".tmp-"
+
 
 class FileAgent(BaseAgent):
+    """
+    Cache each key in one file, sharded by the hash of the key:
+    `{path}/{collection}/ab/cd/{cache_key}` with shard_depth=2.
+
+    Writes go to a temporary file which is renamed over the cache file, so
+    readers (in any process) never see a partially written file. Files larger
+    than mmap_threshold are read through mmap and returned as memoryview.
+
+    With max_bytes, the least recently used files are evicted once the
+    collection grows over max_bytes. Temporary files left behind by crashed
+    writers are removed by the eviction once older than tmp_max_age seconds.
+    """
+
     __name__ = "FileAgent"
 
-    def __init__(self, path: str = None, collection: str = None):
+    def __init__(
+        self,
+        path: str = None,
+        collection: str = None,
+        max_workers: int = 8,
+        shard_depth: int = 2,
+        mmap_threshold: int = 1 << 20,
+        max_bytes: int = None,
+        evict_ratio: float = 0.8,
+        tmp_max_age: float = 3600,
+    ):
         super().__init__()
+        # number of threads used by read_many/write_many/delete_many
+        self._max_workers = max_workers
+        # number of directory levels, 256 folders each
+        self._shard_depth = shard_depth
+        # files of at least mmap_threshold bytes are memory mapped, None to disable
+        self._mmap_threshold = mmap_threshold
+        # evict down to max_bytes * evict_ratio once max_bytes is exceeded
+        self._max_bytes = max_bytes
+        self._evict_ratio = evict_ratio
+        self._tmp_max_age = tmp_max_age
+        self._bytes = 0
+        self._evict_lock = threading.Lock()
 
         if path:
             self.filepath = Path(path)
@@ -25,31 +72,150 @@ class FileAgent(BaseAgent):
         self.logger.info(f"FileAgent will save cache to {self.filepath}")
 
     def connect(self):
+        if self._max_bytes:
+            self._bytes = sum(size for _, size, _ in self._scan(sweep=True))
         self.connected = True
 
     def reset(self):
-        from shutil import rmtree
-
-        rmtree(self.filepath)
+        # move the folder away first, readers see an empty cache immediately
+        trash = self.filepath.with_name(f".{self.filepath.name}-{uuid4().hex}")
+        try:
+            os.rename(self.filepath, trash)
+        except FileNotFoundError:
+            trash = None
         self.filepath.mkdir(parents=True, exist_ok=True)
+        self._bytes = 0
+
+        if trash is not None:
+            threading.Thread(
+                target=rmtree,
+                args=(trash,),
+                kwargs={"ignore_errors": True},
+                daemon=True,
+            ).start()
+
+    def _get_file_name(self, cache_key):
+        if not self._shard_depth:
+            return self.filepath.joinpath(cache_key)
+        digest = xxh64(cache_key.encode("utf-8")).hexdigest()
+        shards = [digest[i * 2 : i * 2 + 2] for i in range(self._shard_depth)]
+        return self.filepath.joinpath(*shards, cache_key)
 
     def read(self, cache_key):
-        file_name = self.filepath.joinpath(cache_key)
-        if not file_name.exists():
+        file_name = self._get_file_name(cache_key)
+        try:
+            f = open(file_name, "rb")
+        except FileNotFoundError:
             self.logger.debug(f"cache not exists {file_name}")
             return False, None
-        else:
-            self.logger.debug(f"reading cache from {file_name}")
-            with open(file_name, "rb") as f:
-                return True, f.read()
+
+        self.logger.debug(f"reading cache from {file_name}")
+        with f:
+            if self._max_bytes:
+                # update access time for LRU eviction
+                os.utime(f.fileno())
+            size = os.fstat(f.fileno()).st_size
+            if (
+                self._mmap_threshold is not None
+                and size
+                and size >= self._mmap_threshold
+            ):
+                # the mapping stays valid after closing the file,
+                # and writers never modify the file in place
+                return True, memoryview(
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ),
+                )
+            return True, f.read()
 
     def write(self, serilized_data, cache_key):
-        file_name = self.filepath.joinpath(cache_key)
+        file_name = self._get_file_name(cache_key)
         self.logger.debug(f"writing cache to {file_name}")
-        with open(file_name, "wb") as f:
-            f.write(serilized_data)
+        file_name.parent.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_file_name = mkstemp(dir=file_name.parent, prefix=TMP_PREFIX)
+        try:
+            # mkstemp creates the file readable by the owner only
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, "wb") as f:
+                f.write(serilized_data)
+            os.replace(tmp_file_name, file_name)
+        except BaseException:
+            os.remove(tmp_file_name)
+            raise
+
+        if self._max_bytes:
+            self._bytes += memoryview(serilized_data).nbytes
+            if self._bytes > self._max_bytes:
+                self.evict()
 
     def delete(self, cache_key):
-        file_name = self.filepath.joinpath(cache_key)
-        if os.path.exists(file_name):
-            os.remove(file_name)
+        try:
+            os.remove(self._get_file_name(cache_key))
+        except FileNotFoundError:
+            pass
+
+    def _scan(self, sweep: bool = False):
+        # yields (path, size, last access) of all cache files,
+        # with sweep, removes the temporary files older than tmp_max_age
+        tmp_before = time() - self._tmp_max_age
+        for root, _, files in os.walk(self.filepath):
+            for file in files:
+                file_name = os.path.join(root, file)
+                try:
+                    stat = os.stat(file_name)
+                except FileNotFoundError:
+                    continue
+                if file.startswith(TMP_PREFIX):
+                    if sweep and stat.st_mtime < tmp_before:
+                        try:
+                            os.remove(file_name)
+                        except FileNotFoundError:
+                            pass
+                    continue
+                yield file_name, stat.st_size, max(stat.st_atime, stat.st_mtime)
+
+    def evict(self):
+        """
+        Remove the least recently used files until the collection is smaller
+        than max_bytes * evict_ratio. The size is re-computed from disk, so
+        the agent also accounts for files written by other processes.
+        """
+        if not self._evict_lock.acquire(blocking=False):
+            # eviction is running in another thread
+            return
+        try:
+            files = sorted(self._scan(sweep=True), key=lambda x: x[2])
+            total_bytes = sum(size for _, size, _ in files)
+            target_bytes = self._max_bytes * self._evict_ratio
+            n_evicted = 0
+            for file_name, size, _ in files:
+                if total_bytes <= target_bytes:
+                    break
+                try:
+                    os.remove(file_name)
+                    n_evicted += 1
+                except FileNotFoundError:
+                    pass
+                total_bytes -= size
+            self._bytes = total_bytes
+            self.logger.info(f"evicted {n_evicted} files from {self.filepath}")
+        finally:
+            self._evict_lock.release()
+
+    def hot_keys(self, limit):
+        # reads only update the access time with max_bytes (or a filesystem
+        # mounted with strictatime), otherwise keys are ranked by write time
+        files = heapq.nlargest(limit, self._scan(), key=lambda x: x[2])
+        return [os.path.basename(file_name) for file_name, _, _ in files]
+
+    def read_many(self, cache_keys):
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            return list(executor.map(self.read, cache_keys))
+
+    def write_many(self, serilized_datas, cache_keys):
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            list(executor.map(self.write, serilized_datas, cache_keys))
+
+    def delete_many(self, cache_keys):
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            list(executor.map(self.delete, cache_keys))
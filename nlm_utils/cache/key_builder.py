@@ -0,0 +1,161 @@
+import pickle
+import struct
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import is_dataclass
+
+import numpy as np
+from xxhash import xxh3_128
+
+# kwargs used by Cache itself, never part of the cache_key
+RESERVED_KWARGS = ("overwrite", "cache_key", "no_cache")
+
+# {id(obj): (obj, digest)} of large immutable arguments, see key_memo_scope
+_key_memo = ContextVar("nlm_utils_cache_key_memo", default=None)
+
+
+@contextmanager
+def key_memo_scope():
+    """
+    Memoize the hash of large immutable arguments (str, bytes, read-only numpy
+    arrays) by id() while the scope is active, e.g. for the duration of one
+    request where the same document is passed to many cached functions.
+    """
+    token = _key_memo.set({})
+    try:
+        yield
+    finally:
+        _key_memo.reset(token)
+
+
+def _convert_arg(arg):
+    # convert the argument if it is not builtin types
+    if arg.__class__.__module__ != "builtins" and not isinstance(
+        arg,
+        (np.ndarray, np.generic),
+    ):
+        # use uid for dataclass if provided
+        if is_dataclass(arg) and hasattr(arg, "uid"):
+            return arg.uid
+        # use class name for other cases
+        return arg.__class__.__name__
+    return arg
+
+
+def _is_memoizable(obj, memo_threshold):
+    if isinstance(obj, (str, bytes)):
+        return len(obj) >= memo_threshold
+    if isinstance(obj, np.ndarray):
+        return not obj.flags.writeable and obj.nbytes >= memo_threshold
+    return False
+
+
+def _update_content(hasher, obj):
+    if isinstance(obj, str):
+        data = obj.encode("utf-8", "surrogatepass")
+        hasher.update(b"s" + struct.pack("<Q", len(data)))
+        hasher.update(data)
+    elif isinstance(obj, bytes):
+        hasher.update(b"b" + struct.pack("<Q", len(obj)))
+        hasher.update(obj)
+    else:
+        # numpy array, hash the buffer without copy when contiguous
+        obj = np.ascontiguousarray(obj)
+        header = f"{obj.dtype.str}{obj.shape}".encode()
+        hasher.update(b"a" + struct.pack("<Q", len(header)) + header)
+        try:
+            hasher.update(memoryview(obj).cast("B"))
+        except (TypeError, ValueError):
+            # dtypes without buffer protocol, e.g. datetime64
+            hasher.update(obj.tobytes())
+
+
+def _update(hasher, obj, memo, memo_threshold):
+    if obj is None or isinstance(obj, (bool, int, float, complex)):
+        data = f"{type(obj).__name__}:{obj!r}".encode()
+        hasher.update(b"v" + struct.pack("<Q", len(data)) + data)
+    elif isinstance(obj, (str, bytes, np.ndarray)):
+        if _is_memoizable(obj, memo_threshold):
+            # large values are hashed separately, the digest is memoized by id()
+            # when a key_memo_scope is active
+            cached = memo.get(id(obj)) if memo is not None else None
+            if cached is None or cached[0] is not obj:
+                content_hasher = xxh3_128()
+                _update_content(content_hasher, obj)
+                # keep a reference to obj so its id() can not be reused
+                cached = (obj, content_hasher.digest())
+                if memo is not None:
+                    memo[id(obj)] = cached
+            hasher.update(b"m" + cached[1])
+        else:
+            _update_content(hasher, obj)
+    elif isinstance(obj, np.generic):
+        _update(hasher, obj.item(), memo, memo_threshold)
+    elif isinstance(obj, (list, tuple)):
+        hasher.update(
+            (b"l" if isinstance(obj, list) else b"t") + struct.pack("<Q", len(obj)),
+        )
+        if obj and all(type(item) is str and len(item) < 1024 for item in obj):
+            # list of short str, e.g. sentences: hash the lengths and the text
+            hasher.update(b"S" + struct.pack(f"<{len(obj)}Q", *map(len, obj)))
+            for i in range(0, len(obj), 4096):
+                hasher.update(
+                    "".join(obj[i : i + 4096]).encode("utf-8", "surrogatepass"),
+                )
+        else:
+            for item in obj:
+                _update(hasher, item, memo, memo_threshold)
+    elif isinstance(obj, dict):
+        hasher.update(b"d" + struct.pack("<Q", len(obj)))
+        for key, value in obj.items():
+            _update(hasher, key, memo, memo_threshold)
+            _update(hasher, value, memo, memo_threshold)
+    elif isinstance(obj, (set, frozenset)):
+        # iteration order of sets is not stable across processes, and repr may
+        # hold ids, hash each item separately and sort the digests
+        digests = []
+        for item in obj:
+            item_hasher = xxh3_128()
+            _update(item_hasher, item, memo, memo_threshold)
+            digests.append(item_hasher.digest())
+        hasher.update(b"e" + struct.pack("<Q", len(obj)))
+        for digest in sorted(digests):
+            hasher.update(digest)
+    else:
+        data = pickle.dumps(obj, protocol=4)
+        hasher.update(b"p" + struct.pack("<Q", len(data)))
+        hasher.update(data)
+
+
+def _is_small(obj):
+    return obj is None or (
+        type(obj) in (bool, int, float, str, bytes)
+        and (type(obj) not in (str, bytes) or len(obj) < 1024)
+    )
+
+
+def build_cache_key(args, kwargs, memo_threshold: int = 1 << 16):
+    """
+    Hash args and kwargs with a streaming xxh3-128.
+
+    str, bytes and numpy arrays are hashed from their buffers, other objects
+    are pickled. As in the pickle-based key, args which are not builtin types
+    (e.g. self) are replaced by their `uid` (dataclass) or class name.
+    kwargs are hashed in sorted order.
+    """
+    args = [_convert_arg(arg) for arg in args]
+    kwargs = {key: kwargs[key] for key in sorted(kwargs) if key not in RESERVED_KWARGS}
+
+    # only scalars and short strings, a single pickle is the cheapest
+    if all(_is_small(arg) for arg in args) and all(
+        _is_small(value) for value in kwargs.values()
+    ):
+        return xxh3_128(
+            b"p" + pickle.dumps((args, list(kwargs.items())), protocol=4),
+        ).hexdigest()
+
+    memo = _key_memo.get()
+    hasher = xxh3_128()
+    _update(hasher, args, memo, memo_threshold)
+    _update(hasher, kwargs, memo, memo_threshold)
+    return hasher.hexdigest()
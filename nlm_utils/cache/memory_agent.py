@@ -1,68 +1,189 @@
+import threading
 from collections import OrderedDict
-from time import time
+from contextlib import nullcontext
+from itertools import islice
+from time import monotonic
 
 from .base_agent import BaseAgent
 
 
-class MemoryCacheData:
-    def __init__(self, data, ttl):
-        self._data = data
-        self._ttl = ttl
-        self._last_access = time()
+class _MemoryCacheEntry:
+    __slots__ = ("data", "size", "last_access")
+
+    def __init__(self, data, size, last_access):
+        self.data = data
+        self.size = size
+        self.last_access = last_access
 
-    def get_data(self):
-        self._last_access = time()
-        return self._data
 
-    def is_expired(self):
-        return time() - self._last_access > self._ttl
+def _sizeof(data):
+    if isinstance(data, memoryview):
+        return data.nbytes
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    if isinstance(data, str):
+        # bytes, not characters
+        return len(data.encode("utf-8"))
+    # deserialized objects have no reliable in-memory size
+    return None
 
 
 class MemoryAgent(BaseAgent):
+    """
+    LRU cache in memory, bounded by number of entries and/or bytes.
+
+    TTL is sliding and shared by all entries, so the LRU order is also the expiry
+    order: expired entries are always at the head of the LRU and are dropped
+    from there in amortized O(1).
+
+    max_bytes counts the size of the serialized data. Objects, e.g. kept by
+    TieredAgent(l1_deserialized=True), are counted with the size of their
+    serialized form given to write, writing an object without size raises
+    ValueError when max_bytes is set.
+    """
+
     __name__ = "MemoryAgent"
 
-    def __init__(self, prefix: str = None, max_size: int = 1024, ttl: int = 3600):
+    def __init__(
+        self,
+        prefix: str = None,
+        max_size: int = 1024,
+        ttl: int = 3600,
+        max_bytes: int = None,
+        thread_safe: bool = True,
+    ):
         super().__init__()
         # setting parameters
         self._max_size = max_size
+        self._max_bytes = max_bytes
         self._ttl = ttl
         # create data
         self._data = OrderedDict()
-        self.logger.info(f"MemoryAgent will save cache to {self._max_size}")
+        self._bytes = 0
+        self._lock = threading.Lock() if thread_safe else nullcontext()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        self.logger.info(
+            f"MemoryAgent will save cache to {self._max_size} entries, "
+            f"{self._max_bytes} bytes",
+        )
         # prefix of the cache key
 
     def connect(self):
         self.connected = True
 
+    @property
+    def size_in_bytes(self):
+        return self._bytes
+
     def reset(self):
-        self._data.clear()
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
 
-    def read(self, cache_key):
-        cache_key = f"{cache_key}"
-        if cache_key in self._data:
-            # check TTL
-            if self._data[cache_key].is_expired():
-                # current cache_key is expired, and _data is LRU
-                # this means all keys before cache_key is also expired
-                for _ in range(len(self._data)):
-                    key, _ = self._data.popitem(last=False)
-                    if key == cache_key:
-                        break
-                return False, None
-            # update LRU
-            self._data.move_to_end(cache_key)
-            # return cache
-            return True, self._data[cache_key].get_data()
-        else:
+    def _is_expired(self, entry, now):
+        return self._ttl and now - entry.last_access > self._ttl
+
+    def _pop(self, cache_key):
+        entry = self._data.pop(cache_key)
+        self._bytes -= entry.size
+        return entry
+
+    def _expire(self, now):
+        # expired entries are at the head of the LRU
+        while self._data:
+            cache_key, entry = next(iter(self._data.items()))
+            if not self._is_expired(entry, now):
+                break
+            self._pop(cache_key)
+            self.stats["expirations"] += 1
+
+    def _read(self, cache_key, now):
+        entry = self._data.get(cache_key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return False, None
+        # check TTL
+        if self._is_expired(entry, now):
+            self._expire(now)
+            self.stats["misses"] += 1
             return False, None
+        # update LRU
+        entry.last_access = now
+        self._data.move_to_end(cache_key)
+        self.stats["hits"] += 1
+        # return cache
+        return True, entry.data
 
-    def write(self, serilized_data, cache_key):
-        # max_size enabled
-        if self._max_size and len(self._data) >= self._max_size:
-            key = next(iter(self._data))
-            del self._data[key]
+    def _write(self, serilized_data, cache_key, now, size=None):
+        if size is None:
+            size = _sizeof(serilized_data)
+        if size is None:
+            if self._max_bytes:
+                raise ValueError(
+                    f"cache key='{cache_key}' is an object, "
+                    "its serialized size is needed with max_bytes",
+                )
+            size = 0
 
-        self._data[cache_key] = MemoryCacheData(serilized_data, self._ttl)
+        if cache_key in self._data:
+            self._pop(cache_key)
+        self._expire(now)
+
+        if self._max_bytes and size > self._max_bytes:
+            self.logger.debug(
+                f"cache key='{cache_key}' is larger than max_bytes, skipping",
+            )
+            return
+
+        # evict from the head of LRU until the new entry fits
+        while self._data and (
+            (self._max_size and len(self._data) >= self._max_size)
+            or (self._max_bytes and self._bytes + size > self._max_bytes)
+        ):
+            self._pop(next(iter(self._data)))
+            self.stats["evictions"] += 1
+
+        self._data[cache_key] = _MemoryCacheEntry(serilized_data, size, now)
+        self._bytes += size
+
+    def hot_keys(self, limit):
+        with self._lock:
+            self._expire(monotonic())
+            # the tail of the LRU is the most recently used
+            return list(islice(reversed(self._data), limit))
+
+    def read(self, cache_key):
+        cache_key = f"{cache_key}"
+        with self._lock:
+            return self._read(cache_key, monotonic())
+
+    def write(self, serilized_data, cache_key, size: int = None):
+        with self._lock:
+            self._write(serilized_data, cache_key, monotonic(), size)
 
     def delete(self, cache_key):
-        del self._data[cache_key]
+        with self._lock:
+            if cache_key in self._data:
+                self._pop(cache_key)
+
+    def read_many(self, cache_keys):
+        with self._lock:
+            now = monotonic()
+            return [self._read(f"{cache_key}", now) for cache_key in cache_keys]
+
+    def write_many(self, serilized_datas, cache_keys, sizes=None):
+        with self._lock:
+            now = monotonic()
+            sizes = sizes or [None] * len(cache_keys)
+            for serilized_data, cache_key, size in zip(
+                serilized_datas,
+                cache_keys,
+                sizes,
+            ):
+                self._write(serilized_data, cache_key, now, size)
+
+    def delete_many(self, cache_keys):
+        with self._lock:
+            for cache_key in cache_keys:
+                if cache_key in self._data:
+                    self._pop(cache_key)
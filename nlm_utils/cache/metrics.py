@@ -0,0 +1,179 @@
+import threading
+from bisect import bisect_left
+
+# upper bounds in seconds, the last bucket (+Inf) is implicit
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+COUNTERS = (
+    # calls served from cache
+    "hits",
+    # calls which ran the function
+    "misses",
+    # calls which waited on the computation of another call
+    "coalesced",
+    # stale entries returned while being refreshed
+    "stale",
+    # negative entries (None or empty results) returned from cache
+    "negative_hits",
+    # size of the serialized payloads read from and written to the agent
+    "bytes_read",
+    "bytes_written",
+)
+
+HISTOGRAMS = (
+    # wall time of the decorated call, by outcome
+    "hit_latency",
+    "miss_latency",
+    # time spent in the decorated function itself
+    "compute",
+    # time spent in the agent
+    "read",
+    "write",
+    # time spent in (de)serialization and (de)compression
+    "serialize",
+    "deserialize",
+)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        return {
+            "buckets": dict(zip([*self.buckets, float("inf")], self.counts)),
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+class FunctionMetrics:
+    """
+    Counters and latency histograms of one decorated function.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.histograms = {name: Histogram() for name in HISTOGRAMS}
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self.histograms[name].observe(seconds)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                **self.counters,
+                **{
+                    name: histogram.to_dict()
+                    for name, histogram in self.histograms.items()
+                },
+            }
+
+
+class _NullMetrics:
+    # used when metrics are disabled
+    def inc(self, name, value=1):
+        pass
+
+    def observe(self, name, seconds):
+        pass
+
+
+NULL_METRICS = _NullMetrics()
+
+
+class CacheMetrics:
+    """
+    Per-function metrics of a Cache, keyed by the module and qualified name of
+    the decorated function, e.g. "app.models.User.load".
+
+        cache.metrics.to_dict()
+        cache.metrics.to_prometheus()
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._functions = {}
+
+    def get(self, name):
+        if not self.enabled:
+            return NULL_METRICS
+        metrics = self._functions.get(name)
+        if metrics is None:
+            with self._lock:
+                metrics = self._functions.setdefault(name, FunctionMetrics())
+        return metrics
+
+    def reset(self):
+        with self._lock:
+            self._functions = {}
+
+    def to_dict(self):
+        # functions may be added by other threads while iterating
+        with self._lock:
+            functions = list(self._functions.items())
+        return {name: metrics.to_dict() for name, metrics in functions}
+
+    def to_prometheus(self, prefix: str = "nlm_cache"):
+        """
+        Render all metrics in the Prometheus text exposition format.
+        """
+        functions = self.to_dict()
+        lines = []
+        for name in COUNTERS:
+            metric = f"{prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for function, metrics in functions.items():
+                lines.append(f'{metric}{{function="{function}"}} {metrics[name]}')
+        for name in HISTOGRAMS:
+            metric = f"{prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for function, metrics in functions.items():
+                histogram = metrics[name]
+                cumulative = 0
+                for le, count in histogram["buckets"].items():
+                    cumulative += count
+                    le = "+Inf" if le == float("inf") else repr(le)
+                    lines.append(
+                        f'{metric}_bucket{{function="{function}",le="{le}"}} '
+                        f"{cumulative}",
+                    )
+                lines.append(
+                    f'{metric}_sum{{function="{function}"}} {histogram["sum"]}',
+                )
+                lines.append(
+                    f'{metric}_count{{function="{function}"}} {histogram["count"]}',
+                )
+        return "\n".join(lines) + "\n"
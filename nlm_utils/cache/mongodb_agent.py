@@ -1,8 +1,39 @@
+import threading
+
+from pymongo import DESCENDING
 from pymongo import MongoClient
+from pymongo import UpdateOne
 from pymongo.errors import ConnectionFailure
 
 from .base_agent import BaseAgent
 
+# clients shared by all agents connecting to the same server
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_mongo_client(host: str = "localhost", port: int = 27017, max_pool_size=100):
+    """
+    Returns the MongoClient of the server, created on first use. MongoClient
+    is thread-safe and owns its connection pool, so it is shared by every
+    agent (and Cache) using the same server.
+    """
+    key = (host, port, max_pool_size)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = MongoClient(host, port, maxPoolSize=max_pool_size)
+            _clients[key] = client
+    return client
+
+
+def _update(serilized_data, cache_key):
+    # written_at is set by the server, hot_keys ranks the keys by it
+    return {
+        "$set": {"cache_key": cache_key, "serilized_data": serilized_data},
+        "$currentDate": {"written_at": True},
+    }
+
 
 class MongodbAgent(BaseAgent):
     __name__ = "MongodbAgent"
@@ -13,10 +44,13 @@ class MongodbAgent(BaseAgent):
         collection,
         host: str = "localhost",
         port: int = 27017,
+        max_pool_size: int = 100,
     ):
         super().__init__()
         self._host = host
         self._port = port if isinstance(port, int) else int(port)
+        # max number of connections of the shared client
+        self._max_pool_size = max_pool_size
         # prefix of the cache key
         self._db = db
         self._collection = collection
@@ -35,7 +69,11 @@ class MongodbAgent(BaseAgent):
 
         try:
             # connect client
-            self.client = MongoClient(self._host, self._port)
+            self.client = get_mongo_client(
+                self._host,
+                self._port,
+                self._max_pool_size,
+            )
             self.client.admin.command("ismaster")
             self.collection = self.client[self._db][self._collection]
             # ensure index
@@ -49,7 +87,7 @@ class MongodbAgent(BaseAgent):
         self.collection.drop()
 
     def read(self, cache_key):
-        data = self.collection.find_one(cache_key)
+        data = self.collection.find_one({"cache_key": cache_key})
         if data:
             serilized_data = data["serilized_data"]
             return True, serilized_data
@@ -57,12 +95,54 @@ class MongodbAgent(BaseAgent):
             return False, None
 
     def write(self, serilized_data, cache_key):
-        data = {"cache_key": cache_key, "serilized_data": serilized_data}
         self.collection.update_one(
             {"cache_key": cache_key},
-            {"$set": data},
+            _update(serilized_data, cache_key),
             upsert=True,
         )
 
     def delete(self, cache_key):
         self.collection.delete_one({"cache_key": cache_key})
+
+    def read_many(self, cache_keys):
+        if not cache_keys:
+            return []
+        found = {
+            data["cache_key"]: data["serilized_data"]
+            for data in self.collection.find(
+                {"cache_key": {"$in": list(cache_keys)}},
+                {"_id": False, "cache_key": True, "serilized_data": True},
+            )
+        }
+        return [
+            (True, found[cache_key]) if cache_key in found else (False, None)
+            for cache_key in cache_keys
+        ]
+
+    def write_many(self, serilized_datas, cache_keys):
+        requests = [
+            UpdateOne(
+                {"cache_key": cache_key},
+                _update(serilized_data, cache_key),
+                upsert=True,
+            )
+            for serilized_data, cache_key in zip(serilized_datas, cache_keys)
+        ]
+        if requests:
+            self.collection.bulk_write(requests, ordered=False)
+
+    def hot_keys(self, limit):
+        # access is not tracked, the most recently written keys come first
+        return [
+            data["cache_key"]
+            for data in self.collection.find(
+                {},
+                {"_id": False, "cache_key": True},
+                sort=[("written_at", DESCENDING), ("_id", DESCENDING)],
+                limit=limit,
+            )
+        ]
+
+    def delete_many(self, cache_keys):
+        if cache_keys:
+            self.collection.delete_many({"cache_key": {"$in": list(cache_keys)}})
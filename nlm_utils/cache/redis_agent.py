@@ -1,10 +1,75 @@
+import heapq
+import threading
+from time import monotonic
+from uuid import uuid4
+
 from redis import Redis
+from redis.cluster import RedisCluster
 from redis.exceptions import ConnectionError
+from redis.exceptions import RedisClusterException
+from redis.exceptions import ResponseError
 
 from .base_agent import BaseAgent
 
+# clients shared by all agents connecting to the same endpoint
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_redis_client(
+    host: str = "localhost",
+    port: str = "6379",
+    db: str = "0",
+    unix_socket_path: str = None,
+    max_connections: int = None,
+    cluster: bool = False,
+):
+    """
+    Returns the client of the endpoint, created on first use. Clients are
+    thread-safe and own their connection pool, so they are shared by every
+    agent (and Cache) using the same endpoint and settings.
+    """
+    key = (host, str(port), str(db), unix_socket_path, max_connections, cluster)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            if cluster:
+                client = RedisCluster(
+                    host=host,
+                    port=port,
+                    max_connections=max_connections or 2**31,
+                )
+            elif unix_socket_path:
+                client = Redis(
+                    unix_socket_path=unix_socket_path,
+                    db=db,
+                    max_connections=max_connections,
+                )
+            else:
+                client = Redis(
+                    host=host,
+                    port=port,
+                    db=db,
+                    max_connections=max_connections,
+                )
+            _clients[key] = client
+    return client
+
 
 class RedisAgent(BaseAgent):
+    """
+    Cache in Redis, keys are `{prefix}-{cache_key}`.
+
+    With versioned=True, keys are `{prefix}-v{generation}-{cache_key}` where the
+    generation is a counter stored in Redis. `reset()` then only increments the
+    counter, and the keys of older generations expire through their TTL.
+    Other processes pick up the new generation within generation_refresh seconds.
+
+    Agents with the same endpoint share one client and its connection pool
+    (at most max_connections connections). Use unix_socket_path for a local
+    server, and cluster=True for Redis Cluster.
+    """
+
     __name__ = "RedisAgent"
 
     def __init__(
@@ -14,14 +79,39 @@ class RedisAgent(BaseAgent):
         host: str = "localhost",
         port: str = "6379",
         db: str = "0",
+        versioned: bool = False,
+        generation_refresh: float = 1.0,
+        scan_count: int = 1000,
+        max_connections: int = None,
+        unix_socket_path: str = None,
+        cluster: bool = False,
+        client=None,
     ):
         super().__init__()
         self._host = host
         self._port = port
         self.db = db
+        self._max_connections = max_connections
+        self._unix_socket_path = unix_socket_path
+        self._cluster = cluster
+        # an existing redis client, e.g. Redis(connection_pool=...)
+        self._client = client
+        # GETEX refreshes the TTL in the same round trip (Redis >= 6.2)
+        self._getex = True
         # prefix of the cache key
         self._prefix = prefix
         self._ttl = ttl
+        # namespace versioning, the generation is re-read every generation_refresh
+        self._versioned = versioned
+        self._generation_refresh = generation_refresh
+        self._generation = 0
+        self._generation_read_at = None
+        # number of keys per SCAN / UNLINK batch in reset
+        self._scan_count = scan_count
+        if versioned and not ttl:
+            self.logger.warning(
+                "versioned RedisAgent without ttl, keys of old generations never expire",
+            )
         self.logger.info(f"Redis cache agent is initilized with prefix: {self._prefix}")
 
     @property
@@ -39,36 +129,137 @@ class RedisAgent(BaseAgent):
         if self._connected:
             return
         try:
-            self.client = Redis(host=self._host, port=self._port, db=self.db)
+            if self._client is not None:
+                self.client = self._client
+            else:
+                self.client = get_redis_client(
+                    host=self._host,
+                    port=self._port,
+                    db=self.db,
+                    unix_socket_path=self._unix_socket_path,
+                    max_connections=self._max_connections,
+                    cluster=self._cluster,
+                )
             self.client.ping()
             self.connected = True
-        except ConnectionError:
-            self.logger.error(
-                f"Can not connect to Redis server {self._host}:{self._port}.",
-            )
+        except (ConnectionError, RedisClusterException):
+            endpoint = self._unix_socket_path or f"{self._host}:{self._port}"
+            self.logger.error(f"Can not connect to Redis server {endpoint}.")
             self._connected = False
 
     def reset(self):
+        if self._versioned:
+            # O(1), keys of the previous generation age out through TTL
+            self._generation = self.client.incr(self._generation_key)
+            self._generation_read_at = monotonic()
+            self.logger.info(
+                f"redis keys with prefix {self._prefix} moved to "
+                f"generation {self._generation}",
+            )
+            return
+
         self.logger.debug(f"deleting redis keys with prefix {self._prefix}")
-        for key in self.client.keys(f"{self._prefix}*"):
-            self.logger.debug(f"Deleting {key} from Redis")
-            self.client.delete(key)
+        # SCAN does not block the server like KEYS, UNLINK frees memory
+        # in a background thread
+        n_deleted = 0
+        keys = []
+        for key in self.client.scan_iter(
+            match=self._get_key("*"),
+            count=self._scan_count,
+        ):
+            keys.append(key)
+            if len(keys) >= self._scan_count:
+                n_deleted += self.client.unlink(*keys)
+                keys = []
+        if keys:
+            n_deleted += self.client.unlink(*keys)
+        self.logger.info(f"deleted {n_deleted} redis keys with prefix {self._prefix}")
 
-    def read(self, cache_key):
+    @property
+    def _generation_key(self):
+        return f"{self._prefix}-__generation__" if self._prefix else "__generation__"
+
+    def _generation_is_stale(self, now):
+        return (
+            self._generation_read_at is None
+            or now - self._generation_read_at > self._generation_refresh
+        )
+
+    def _current_generation(self):
+        now = monotonic()
+        if self._generation_is_stale(now):
+            self._generation = int(self.client.get(self._generation_key) or 0)
+            self._generation_read_at = now
+        return self._generation
+
+    def _format_key(self, cache_key, generation=None):
+        if generation is not None:
+            cache_key = f"v{generation}-{cache_key}"
         if self._prefix:
-            cache_key = f"{self._prefix}-{cache_key}"
+            return f"{self._prefix}-{cache_key}"
+        return cache_key
+
+    def _get_key(self, cache_key):
+        generation = self._current_generation() if self._versioned else None
+        return self._format_key(cache_key, generation)
+
+    # release the lease only if it is still held by the caller
+    _release_lease_script = """
+    if redis.call("get", KEYS[1]) == ARGV[1] then
+        return redis.call("del", KEYS[1])
+    end
+    return 0
+    """
+
+    def acquire_lease(self, cache_key, ttl):
+        """
+        Try to take the lease to generate cache_key across processes.
+        Returns a token when acquired, None when the lease is held by others.
+        """
+        token = uuid4().hex
+        acquired = self.client.set(
+            self._get_key(f"lease-{cache_key}"),
+            token,
+            nx=True,
+            px=int(ttl * 1000),
+        )
+        return token if acquired else None
+
+    def release_lease(self, cache_key, token):
+        self.client.eval(
+            self._release_lease_script,
+            1,
+            self._get_key(f"lease-{cache_key}"),
+            token,
+        )
+
+    def read(self, cache_key):
+        cache_key = self._get_key(cache_key)
+
+        # None results are stored by Cache in an envelope, see cache_none
+        serilized_data = None
+        if not self._ttl:
+            serilized_data = self.client.get(cache_key)
+        elif self._getex:
+            try:
+                serilized_data = self.client.getex(cache_key, ex=self._ttl)
+            except ResponseError:
+                # server older than 6.2, fall back to a pipeline
+                self._getex = False
+
+        if self._ttl and not self._getex:
+            pipeline = self.client.pipeline(transaction=False)
+            pipeline.get(cache_key)
+            pipeline.expire(cache_key, self._ttl)
+            serilized_data = pipeline.execute()[0]
 
-        # this can be problematic when cache result is None.
-        serilized_data = self.client.get(cache_key)
-        self.client.expire(cache_key, self._ttl)
         if serilized_data is not None:
             return True, serilized_data
         else:
             return False, None
 
     def write(self, serilized_data, cache_key):
-        if self._prefix:
-            cache_key = f"{self._prefix}-{cache_key}"
+        cache_key = self._get_key(cache_key)
         if self._ttl:
             # set with expire time
             self.client.setex(cache_key, self._ttl, serilized_data)
@@ -77,12 +268,120 @@ class RedisAgent(BaseAgent):
             self.client.set(cache_key, serilized_data)
 
     def delete(self, cache_key):
-        cache_key_in_db = cache_key
-        if self._prefix:
-            cache_key_in_db = f"{self._prefix}-{cache_key}"
-
-        res = self.client.delete(cache_key_in_db)
+        res = self.client.delete(self._get_key(cache_key))
         if res:
             self.logger.info(f"Deleting cache with key='{cache_key}'")
         else:
             self.logger.info(f"Cache not found wiht key='{cache_key}', skip deleting.")
+
+    def read_many(self, cache_keys):
+        if not cache_keys:
+            return []
+        keys = [self._get_key(cache_key) for cache_key in cache_keys]
+
+        if not self._ttl:
+            serilized_datas = self._mget(keys)
+        elif self._getex:
+            # read and refresh TTL of all keys in one round trip
+            pipeline = self.client.pipeline(transaction=False)
+            for key in keys:
+                pipeline.getex(key, ex=self._ttl)
+            try:
+                serilized_datas = pipeline.execute()
+            except ResponseError:
+                # server older than 6.2
+                self._getex = False
+                return self.read_many(cache_keys)
+        else:
+            serilized_datas = self._mget(keys)
+            pipeline = self.client.pipeline(transaction=False)
+            for key in keys:
+                pipeline.expire(key, self._ttl)
+            pipeline.execute()
+
+        return [
+            (True, serilized_data) if serilized_data is not None else (False, None)
+            for serilized_data in serilized_datas
+        ]
+
+    def hot_keys(self, limit):
+        """
+        Up to limit cache_keys of the prefix, most recently used first, ranked by
+        OBJECT IDLETIME, or by OBJECT FREQ under an LFU maxmemory-policy.
+        All keys of the prefix are scanned, this is meant for occasional exports.
+        """
+        generation = self._current_generation() if self._versioned else None
+        key_prefix = self._format_key("", generation)
+        infotype = "idletime"
+        # min-heap of (score, cache_key), the higher the score the hotter the key
+        hottest = []
+
+        def rank(keys):
+            nonlocal infotype
+            cache_keys = []
+            for key in keys:
+                cache_key = key.decode("utf-8")[len(key_prefix) :]
+                if cache_key != "__generation__" and not cache_key.startswith("lease-"):
+                    cache_keys.append((key, cache_key))
+            try:
+                values = self._object(infotype, [key for key, _ in cache_keys])
+            except ResponseError:
+                if infotype != "idletime":
+                    raise
+                # idle time is not tracked with an LFU maxmemory-policy
+                infotype = "freq"
+                values = self._object(infotype, [key for key, _ in cache_keys])
+            for (_, cache_key), value in zip(cache_keys, values):
+                if value is None:
+                    # expired since the scan
+                    continue
+                item = (-value if infotype == "idletime" else value, cache_key)
+                if len(hottest) < limit:
+                    heapq.heappush(hottest, item)
+                else:
+                    heapq.heappushpop(hottest, item)
+
+        keys = []
+        for key in self.client.scan_iter(
+            match=f"{key_prefix}*",
+            count=self._scan_count,
+        ):
+            keys.append(key)
+            if len(keys) >= self._scan_count:
+                rank(keys)
+                keys = []
+        if keys:
+            rank(keys)
+        return [cache_key for _, cache_key in sorted(hottest, reverse=True)]
+
+    def _object(self, infotype, keys):
+        if self._cluster:
+            # keys are spread over slots
+            return [self.client.object(infotype, key) for key in keys]
+        pipeline = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.object(infotype, key)
+        return pipeline.execute()
+
+    def _mget(self, keys):
+        if self._cluster:
+            # keys are spread over slots, MGET is split by node
+            return self.client.mget_nonatomic(keys)
+        return self.client.mget(keys)
+
+    def write_many(self, serilized_datas, cache_keys):
+        pipeline = self.client.pipeline(transaction=False)
+        for serilized_data, cache_key in zip(serilized_datas, cache_keys):
+            if self._ttl:
+                pipeline.setex(self._get_key(cache_key), self._ttl, serilized_data)
+            else:
+                pipeline.set(self._get_key(cache_key), serilized_data)
+        pipeline.execute()
+
+    def delete_many(self, cache_keys):
+        if not cache_keys:
+            return
+        res = self.client.delete(
+            *[self._get_key(cache_key) for cache_key in cache_keys],
+        )
+        self.logger.info(f"Deleted {res} of {len(cache_keys)} caches")
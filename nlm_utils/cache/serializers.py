@@ -0,0 +1,99 @@
+import pickle
+import struct
+
+import msgpack
+import numpy as np
+
+
+# pickle5 payload layout:
+#   version byte | number of buffers (uint32) | buffer sizes (uint64 each)
+#   | out-of-band buffers | pickle stream
+# The version byte keeps the payload distinguishable from compression headers.
+PICKLE5_VERSION = 0x05
+
+# msgpack extension type code for numpy.ndarray
+NDARRAY_EXT_TYPE = 1
+
+
+def pickle4_dumps(data):
+    return pickle.dumps(data, protocol=4)
+
+
+def pickle4_loads(serilized_data):
+    return pickle.loads(serilized_data)
+
+
+def pickle5_dumps(data):
+    buffers = []
+    stream = pickle.dumps(data, protocol=5, buffer_callback=buffers.append)
+    buffers = [buffer.raw() for buffer in buffers]
+    header = struct.pack(
+        f"<BI{len(buffers)}Q",
+        PICKLE5_VERSION,
+        len(buffers),
+        *[buffer.nbytes for buffer in buffers],
+    )
+    return b"".join([header, *buffers, stream])
+
+
+def pickle5_loads(serilized_data):
+    # numpy arrays are rebuilt on top of serilized_data without copy,
+    # they are read-only when serilized_data is bytes
+    view = memoryview(serilized_data)
+    version, n_buffers = struct.unpack_from("<BI", view)
+    if version != PICKLE5_VERSION:
+        raise ValueError(f"Unknown pickle5 payload version {version}")
+    offset = struct.calcsize("<BI")
+    sizes = struct.unpack_from(f"<{n_buffers}Q", view, offset)
+    offset += struct.calcsize(f"<{n_buffers}Q")
+
+    buffers = []
+    for size in sizes:
+        buffers.append(view[offset : offset + size])
+        offset += size
+    return pickle.loads(view[offset:], buffers=buffers)
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.hasobject:
+            raise TypeError("Can not serialize numpy array of objects with msgpack")
+        obj = np.ascontiguousarray(obj)
+        return msgpack.ExtType(
+            NDARRAY_EXT_TYPE,
+            msgpack.packb(
+                (obj.dtype.str, obj.shape, obj.data),
+                use_bin_type=True,
+            ),
+        )
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Can not serialize {type(obj)} with msgpack")
+
+
+def _msgpack_ext_hook(code, data):
+    if code == NDARRAY_EXT_TYPE:
+        dtype, shape, buffer = msgpack.unpackb(data, raw=False)
+        return np.frombuffer(buffer, dtype=dtype).reshape(shape)
+    return msgpack.ExtType(code, data)
+
+
+def msgpack_dumps(data):
+    return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+
+def msgpack_loads(serilized_data):
+    # tuples are restored as lists
+    return msgpack.unpackb(
+        serilized_data,
+        ext_hook=_msgpack_ext_hook,
+        raw=False,
+        strict_map_key=False,
+    )
+
+
+SERIALIZERS = {
+    "pickle": (pickle4_dumps, pickle4_loads),
+    "pickle5": (pickle5_dumps, pickle5_loads),
+    "msgpack": (msgpack_dumps, msgpack_loads),
+}
@@ -0,0 +1,53 @@
+import os
+import struct
+from tempfile import mkstemp
+
+# snapshot file layout:
+#   magic | records of key size (uint32), value size (uint64), key (utf-8), value
+SNAPSHOT_MAGIC = b"NLMSNAP\x01"
+RECORD_STRUCT = struct.Struct("<IQ")
+
+
+def write_snapshot(path, items):
+    """
+    Write (cache_key, serilized_data) items to path, atomically.
+    Returns the number of items written.
+    """
+    path = os.fspath(path)
+    fd, tmp_path = mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    n_items = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            for cache_key, serilized_data in items:
+                key = cache_key.encode("utf-8")
+                f.write(RECORD_STRUCT.pack(len(key), len(serilized_data)))
+                f.write(key)
+                f.write(serilized_data)
+                n_items += 1
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return n_items
+
+
+def read_snapshot(path):
+    """
+    Yield (cache_key, serilized_data) items of the snapshot at path.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a cache snapshot")
+        while True:
+            header = f.read(RECORD_STRUCT.size)
+            if not header:
+                break
+            if len(header) < RECORD_STRUCT.size:
+                raise ValueError(f"truncated cache snapshot {path}")
+            key_size, value_size = RECORD_STRUCT.unpack(header)
+            key = f.read(key_size)
+            serilized_data = f.read(value_size)
+            if len(key) < key_size or len(serilized_data) < value_size:
+                raise ValueError(f"truncated cache snapshot {path}")
+            yield key.decode("utf-8"), serilized_data
@@ -0,0 +1,153 @@
+import sqlite3
+import threading
+from pathlib import Path
+from tempfile import mkdtemp
+from time import time
+
+from .base_agent import BaseAgent
+
+
+class SqliteAgent(BaseAgent):
+    """
+    Cache all keys in one SQLite database file `{path}/{collection}.sqlite3`.
+
+    The database runs in WAL mode, so any number of processes can read while one
+    writes. Each thread uses its own connection. With ttl, entries expire `ttl`
+    seconds after they are written; expired entries are removed by `compact()`.
+    """
+
+    __name__ = "SqliteAgent"
+
+    # max number of host parameters in one statement for old SQLite builds
+    _max_variables = 500
+
+    def __init__(
+        self,
+        path: str = None,
+        collection: str = "cache",
+        ttl: int = None,
+        timeout: float = 30.0,
+    ):
+        super().__init__()
+        if path:
+            self.filepath = Path(path)
+        else:
+            self.filepath = Path(mkdtemp())
+        self.filepath = self.filepath.joinpath(f"{collection}.sqlite3")
+        self._ttl = ttl
+        self._timeout = timeout
+        self._local = threading.local()
+
+        self.logger.info(f"SqliteAgent will save cache to {self.filepath}")
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # autocommit mode, batches are wrapped in explicit transactions
+            connection = sqlite3.connect(
+                self.filepath,
+                timeout=self._timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def connect(self):
+        try:
+            self.filepath.parent.mkdir(parents=True, exist_ok=True)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "cache_key TEXT PRIMARY KEY, "
+                "serilized_data BLOB, "
+                "expire_at REAL)",
+            )
+            self.connected = True
+        except sqlite3.Error as e:
+            self.logger.error(f"Can not open SQLite database {self.filepath}: {e}")
+            self.connected = False
+
+    def reset(self):
+        self.connection.execute("DELETE FROM cache")
+
+    def compact(self):
+        """
+        Remove expired entries and give the free pages back to the file system.
+        """
+        self.connection.execute(
+            "DELETE FROM cache WHERE expire_at IS NOT NULL AND expire_at < ?",
+            (time(),),
+        )
+        self.connection.execute("VACUUM")
+        self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _expire_at(self):
+        return time() + self._ttl if self._ttl else None
+
+    def read(self, cache_key):
+        row = self.connection.execute(
+            "SELECT serilized_data, expire_at FROM cache WHERE cache_key = ?",
+            (cache_key,),
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time()):
+            return False, None
+        return True, row[0]
+
+    def write(self, serilized_data, cache_key):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+            (cache_key, serilized_data, self._expire_at()),
+        )
+
+    def delete(self, cache_key):
+        self.connection.execute("DELETE FROM cache WHERE cache_key = ?", (cache_key,))
+
+    def hot_keys(self, limit):
+        # access is not tracked, the most recently written keys come first
+        rows = self.connection.execute(
+            "SELECT cache_key FROM cache WHERE expire_at IS NULL OR expire_at >= ? "
+            "ORDER BY rowid DESC LIMIT ?",
+            (time(), limit),
+        )
+        return [cache_key for cache_key, in rows]
+
+    def read_many(self, cache_keys):
+        found = {}
+        now = time()
+        for i in range(0, len(cache_keys), self._max_variables):
+            chunk = list(cache_keys[i : i + self._max_variables])
+            rows = self.connection.execute(
+                "SELECT cache_key, serilized_data, expire_at FROM cache "
+                f"WHERE cache_key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for cache_key, serilized_data, expire_at in rows:
+                if expire_at is None or expire_at >= now:
+                    found[cache_key] = serilized_data
+        return [
+            (True, found[cache_key]) if cache_key in found else (False, None)
+            for cache_key in cache_keys
+        ]
+
+    def write_many(self, serilized_datas, cache_keys):
+        expire_at = self._expire_at()
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+                [
+                    (cache_key, serilized_data, expire_at)
+                    for serilized_data, cache_key in zip(serilized_datas, cache_keys)
+                ],
+            )
+
+    def delete_many(self, cache_keys):
+        with self.connection:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(
+                "DELETE FROM cache WHERE cache_key = ?",
+                [(cache_key,) for cache_key in cache_keys],
+            )
@@ -0,0 +1,220 @@
+from .base_agent import BaseAgent
+from .memory_agent import MemoryAgent
+
+
+def _detach(serilized_data):
+    # memoryviews of memory mapped files (FileAgent) keep a file descriptor open
+    # as long as they live, entries kept by L1 are copied to bytes
+    if isinstance(serilized_data, memoryview):
+        return serilized_data.tobytes()
+    return serilized_data
+
+
+class TieredAgent(BaseAgent):
+    """
+    Two-tier cache agent, a MemoryAgent (L1) in front of a remote agent (L2).
+
+    Reads go to L1 first and fall through to L2, L2 hits are promoted to L1.
+    Writes and deletes go to both tiers.
+
+    With `l1_deserialized=True`, L1 keeps the deserialized objects (set by Cache
+    through read_object/write_object) so hot keys skip deserialization entirely.
+    Objects returned from L1 are shared between callers and must not be mutated.
+    Memory mapped L2 results (FileAgent) are copied to bytes, so L1 does not
+    keep their file descriptors open.
+    l1_max_bytes bounds L1 by the size of the serialized entries, also when
+    L1 keeps the deserialized objects.
+    """
+
+    __name__ = "TieredAgent"
+
+    def __init__(
+        self,
+        l2_agent="RedisAgent",
+        l1_max_size: int = 1024,
+        l1_ttl: int = 3600,
+        l1_max_bytes: int = None,
+        l1_deserialized: bool = False,
+        **kwargs,
+    ):
+        super().__init__()
+        # avoid circular import, FS_AGENTS is defined along with Cache
+        from .cache import FS_AGENTS
+
+        self.l1 = MemoryAgent(
+            max_size=l1_max_size,
+            ttl=l1_ttl,
+            max_bytes=l1_max_bytes,
+        )
+        if isinstance(l2_agent, str):
+            self.l2 = FS_AGENTS[l2_agent](**kwargs)
+        else:
+            self.l2 = l2_agent
+        self.l1_deserialized = l1_deserialized
+
+        # cross process lease is provided by L2
+        if hasattr(self.l2, "acquire_lease"):
+            self.acquire_lease = self.l2.acquire_lease
+            self.release_lease = self.l2.release_lease
+        if hasattr(self.l2, "aacquire_lease"):
+            self.aacquire_lease = self.l2.aacquire_lease
+            self.arelease_lease = self.l2.arelease_lease
+
+        self.logger.info(
+            f"TieredAgent is initialized with L1: MemoryAgent, L2: {self.l2.__name__}",
+        )
+
+    def connect(self):
+        self.l1.connect()
+        self.l2.connect()
+        if not self.l2.connected:
+            self.logger.error(
+                f"L2 {self.l2.__name__} is not connected, using L1 MemoryAgent only.",
+            )
+        self.connected = self.l1.connected
+
+    def reset(self):
+        self.l1.reset()
+        if self.l2.connected:
+            self.l2.reset()
+
+    def read(self, cache_key):
+        if not self.l1_deserialized:
+            status, serilized_data = self.l1.read(cache_key)
+            if status:
+                return status, serilized_data
+
+        if not self.l2.connected:
+            return False, None
+
+        status, serilized_data = self.l2.read(cache_key)
+        serilized_data = _detach(serilized_data)
+        if status and not self.l1_deserialized:
+            # promote to L1
+            self.l1.write(serilized_data, cache_key)
+        return status, serilized_data
+
+    def write(self, serilized_data, cache_key):
+        if not self.l1_deserialized:
+            self.l1.write(serilized_data, cache_key)
+        if self.l2.connected:
+            self.l2.write(serilized_data, cache_key)
+
+    def delete(self, cache_key):
+        self.l1.delete(cache_key)
+        if self.l2.connected:
+            self.l2.delete(cache_key)
+
+    def hot_keys(self, limit):
+        cache_keys = self.l1.hot_keys(limit)
+        if len(cache_keys) < limit and self.l2.connected:
+            l2_keys = self.l2.hot_keys(limit) if hasattr(self.l2, "hot_keys") else []
+            seen = set(cache_keys)
+            cache_keys += [key for key in l2_keys if key not in seen]
+        return cache_keys[:limit]
+
+    def read_object(self, cache_key):
+        return self.l1.read(cache_key)
+
+    def write_object(self, data, cache_key, size: int = None):
+        # size: bytes of the serialized data, counted against l1_max_bytes
+        self.l1.write(data, cache_key, size)
+
+    def read_many(self, cache_keys):
+        if self.l1_deserialized:
+            results = [(False, None)] * len(cache_keys)
+        else:
+            results = self.l1.read_many(cache_keys)
+
+        missing = [idx for idx, (status, _) in enumerate(results) if not status]
+        if not missing or not self.l2.connected:
+            return results
+
+        results = list(results)
+        l2_results = self.l2.read_many([cache_keys[idx] for idx in missing])
+        promote_datas, promote_keys = [], []
+        for idx, (status, serilized_data) in zip(missing, l2_results):
+            serilized_data = _detach(serilized_data)
+            results[idx] = (status, serilized_data)
+            if status:
+                promote_datas.append(serilized_data)
+                promote_keys.append(cache_keys[idx])
+
+        # promote to L1
+        if promote_keys and not self.l1_deserialized:
+            self.l1.write_many(promote_datas, promote_keys)
+        return results
+
+    def write_many(self, serilized_datas, cache_keys):
+        if not self.l1_deserialized:
+            self.l1.write_many(serilized_datas, cache_keys)
+        if self.l2.connected:
+            self.l2.write_many(serilized_datas, cache_keys)
+
+    def delete_many(self, cache_keys):
+        self.l1.delete_many(cache_keys)
+        if self.l2.connected:
+            self.l2.delete_many(cache_keys)
+
+    async def aread(self, cache_key):
+        if not self.l1_deserialized:
+            status, serilized_data = self.l1.read(cache_key)
+            if status:
+                return status, serilized_data
+
+        if not self.l2.connected:
+            return False, None
+
+        status, serilized_data = await self.l2.aread(cache_key)
+        serilized_data = _detach(serilized_data)
+        if status and not self.l1_deserialized:
+            # promote to L1
+            self.l1.write(serilized_data, cache_key)
+        return status, serilized_data
+
+    async def awrite(self, serilized_data, cache_key):
+        if not self.l1_deserialized:
+            self.l1.write(serilized_data, cache_key)
+        if self.l2.connected:
+            await self.l2.awrite(serilized_data, cache_key)
+
+    async def adelete(self, cache_key):
+        self.l1.delete(cache_key)
+        if self.l2.connected:
+            await self.l2.adelete(cache_key)
+
+    async def aread_many(self, cache_keys):
+        if self.l1_deserialized:
+            results = [(False, None)] * len(cache_keys)
+        else:
+            results = self.l1.read_many(cache_keys)
+
+        missing = [idx for idx, (status, _) in enumerate(results) if not status]
+        if not missing or not self.l2.connected:
+            return results
+
+        results = list(results)
+        l2_results = await self.l2.aread_many([cache_keys[idx] for idx in missing])
+        promote_datas, promote_keys = [], []
+        for idx, (status, serilized_data) in zip(missing, l2_results):
+            serilized_data = _detach(serilized_data)
+            results[idx] = (status, serilized_data)
+            if status:
+                promote_datas.append(serilized_data)
+                promote_keys.append(cache_keys[idx])
+
+        # promote to L1
+        if promote_keys and not self.l1_deserialized:
+            self.l1.write_many(promote_datas, promote_keys)
+        return results
+
+    async def awrite_many(self, serilized_datas, cache_keys):
+        if not self.l1_deserialized:
+            self.l1.write_many(serilized_datas, cache_keys)
+        if self.l2.connected:
+            await self.l2.awrite_many(serilized_datas, cache_keys)
+
+    async def adelete_many(self, cache_keys):
+        self.l1.delete_many(cache_keys)
+        if self.l2.connected:
+            await self.l2.adelete_many(cache_keys)
@@ -1,7 +1,14 @@
+from .async_bart_client import AsyncBartClient
+from .async_classification import AsyncClassificationClient
+from .async_encoder import AsyncEncoderClient
+from .async_flan_t5_client import AsyncFlanT5Client
+from .async_nlp_client import AsyncNlpClient
+from .async_yolo_client import AsyncYoloClient
 from .classification import ClassificationClient
 from .encoder import EncoderClient
 from .flan_t5_client import FlanT5Client
 from .nlp_client import NlpClient
+from .transport import Transport
 from .yolo_client import YoloClient
 
 __all__ = (
@@ -10,4 +17,11 @@ __all__ = (
     "NlpClient",
     "YoloClient",
     "FlanT5Client",
+    "Transport",
+    "AsyncEncoderClient",
+    "AsyncClassificationClient",
+    "AsyncNlpClient",
+    "AsyncYoloClient",
+    "AsyncFlanT5Client",
+    "AsyncBartClient",
 )
@@ -0,0 +1,41 @@
+import json
+
+import aiohttp
+
+from nlm_utils.model_client.async_nlp_client import AsyncNlpClient
+from nlm_utils.model_client.bart_client import BartClient
+from nlm_utils.model_client.session_pool import get_session
+
+
+class AsyncBartClient(BartClient):
+    """
+    BartClient with asyncio versions of its methods (acall_bart, aqa_sum).
+    Requests are sent with the aiohttp session shared by the async clients
+    (see session_pool) unless session is given. The blocking methods are kept.
+    """
+
+    nlp_client_class = AsyncNlpClient
+
+    def __init__(self, *args, session: aiohttp.ClientSession = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = session
+        self.nlp_client.session = session
+
+    async def acall_bart(self, prompts, max_length=120):
+        url = f"{self.url}/bart/infer"
+        req_data, headers = self._encode_request(prompts, max_length)
+        content = await self.transport.arequest(
+            self.session or get_session(),
+            "POST",
+            url,
+            body=req_data,
+            headers=headers,
+        )
+        return json.loads(content)
+
+    async def aqa_sum(self, questions, passages, **kwargs):
+        prompts = BartClient.get_qa_sum_prompts(questions, passages)
+        if self.debug:
+            self.logger.info(f"QA Summary Message Prompts are : {prompts}")
+        result = await self.acall_bart(prompts, max_length=1024)
+        return self._qa_sum_output(result)
@@ -0,0 +1,94 @@
+import asyncio
+from functools import partial
+from typing import List
+
+import aiohttp
+
+from nlm_utils.model_client.async_bart_client import AsyncBartClient
+from nlm_utils.model_client.async_flan_t5_client import AsyncFlanT5Client
+from nlm_utils.model_client.classification import ClassificationClient
+from nlm_utils.model_client.request_body import encode_request
+from nlm_utils.model_client.session_pool import get_session
+from nlm_utils.model_client.transport import TransportError
+
+
+class AsyncClassificationClient(ClassificationClient):
+    """
+    asyncio version of ClassificationClient.__call__, requests are sent with
+    the aiohttp session shared by the async clients (see session_pool) unless
+    session is given. The openai client is blocking, it runs in the default
+    executor. active_learning and restart stay blocking.
+    """
+
+    flan_t5_client_class = AsyncFlanT5Client
+    bart_client_class = AsyncBartClient
+
+    def __init__(self, *args, session: aiohttp.ClientSession = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.micro_batch:
+            raise ValueError(f"{self.__class__.__name__} does not support micro_batch")
+        self.session = session
+        if self.model in {"flan-t5", "bart"}:
+            self.model_client.session = session
+            self.model_client.nlp_client.session = session
+
+    async def __call__(
+        self,
+        questions: List[str],
+        sentences: List[str] = None,
+        return_labels=True,
+        return_logits=False,
+        return_probs=False,
+        **kwargs,
+    ):
+        if self.model == "openai":
+            return await asyncio.get_running_loop().run_in_executor(
+                None,
+                partial(self._call_model_client, questions, sentences, **kwargs),
+            )
+        if self.model_client:
+            return await self._acall_model_client(questions, sentences, **kwargs)
+
+        req_data = self._build_request(
+            questions,
+            sentences,
+            return_labels,
+            return_logits,
+            return_probs,
+            **kwargs,
+        )
+        return await self._apost(req_data)
+
+    async def _acall_model_client(self, questions, sentences, **kwargs):
+        if self.model == "flan-t5":
+            if self.task in {"qa", "roberta-qa"}:
+                return await self.model_client.aqa(questions, sentences, **kwargs)
+            elif self.task in {"boolq"}:
+                return await self.model_client.aboolq(questions, sentences, **kwargs)
+            elif self.task in {"qa_type"}:
+                return await self.model_client.aqa_type(questions)
+        elif self.model == "bart":
+            if self.task in {"qa_sum"}:
+                return await self.model_client.aqa_sum(questions, sentences, **kwargs)
+
+    async def _apost(self, req_data):
+        use_msgpack = req_data.get("use_msgpack", False)
+        req_data, headers = encode_request(
+            req_data,
+            self.request_encoding,
+            self.request_compression,
+        )
+
+        try:
+            content = await self.transport.arequest(
+                self.session or get_session(),
+                "POST",
+                self.url,
+                body=req_data,
+                headers=headers,
+                retry=self.retry,
+            )
+        except TransportError as e:
+            self.logger.error(f"Error in classification: {e}")
+            return None
+        return self._parse_response(content, use_msgpack)
@@ -0,0 +1,62 @@
+from timeit import default_timer
+from typing import List
+
+from nlm_utils.model_client.encoder import EncoderClient
+from nlm_utils.model_client.session_pool import get_session
+from nlm_utils.model_client.transport import TransportError
+
+
+class AsyncEncoderClient(EncoderClient):
+    """
+    asyncio version of EncoderClient, requests are sent with the aiohttp
+    session shared by the async clients (see session_pool) unless session is
+    given. The embedding cache is read and written with the async Cache API.
+    """
+
+    async def encode(self, sentences: List[str], headers: List[str] = None, **kwargs):
+        return await self.aencode(sentences, headers, **kwargs)
+
+    async def compare(
+        self,
+        sentences_a: List[str],
+        sentences_b: List[str] = None,
+        **kwargs,
+    ):
+        wall_time = default_timer()
+        req_data, req_headers, use_msgpack = self._compare_request(
+            sentences_a,
+            sentences_b,
+            **kwargs,
+        )
+        try:
+            content = await self.transport.arequest(
+                self.session or get_session(),
+                "POST",
+                self._replica_urls(f"/{self.model}/similarity"),
+                body=req_data,
+                headers=req_headers,
+                retry=self.retry,
+            )
+        except TransportError as e:
+            self.logger.error(f"Error in encoder: {e}")
+            return None
+        return self._compare_response(
+            content,
+            sentences_a,
+            sentences_b,
+            use_msgpack,
+            wall_time,
+        )
+
+    async def __call__(
+        self,
+        sentences_a: List[str],
+        sentences_b: List[str] = None,
+        **kwargs,
+    ):
+        if len(sentences_a) == 0:
+            return {"embeddings": []}
+        if kwargs.get("compare", False):
+            return await self.compare(sentences_a, sentences_b, **kwargs)
+        else:
+            return await self.encode(sentences_a, **kwargs)
@@ -0,0 +1,62 @@
+import json
+
+import aiohttp
+
+from nlm_utils.model_client.async_nlp_client import AsyncNlpClient
+from nlm_utils.model_client.flan_t5_client import FlanT5Client
+from nlm_utils.model_client.session_pool import get_session
+
+
+class AsyncFlanT5Client(FlanT5Client):
+    """
+    FlanT5Client with asyncio versions of its methods (acall_flan_t5, aqa,
+    aboolq, aqa_type, aget_mnli_prompts). Requests are sent with the aiohttp
+    session shared by the async clients (see session_pool) unless session is
+    given. The blocking methods are kept.
+    """
+
+    nlp_client_class = AsyncNlpClient
+
+    def __init__(self, *args, session: aiohttp.ClientSession = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = session
+        self.nlp_client.session = session
+
+    async def acall_flan_t5(self, prompts, max_length=120):
+        url = f"{self.url}/flan-t5/infer"
+        req_data, headers = self._encode_request(prompts, max_length)
+        content = await self.transport.arequest(
+            self.session or get_session(),
+            "POST",
+            url,
+            body=req_data,
+            headers=headers,
+        )
+        return json.loads(content)
+
+    async def aqa_type(self, questions):
+        prompts = FlanT5Client.get_qa_type_prompts(questions)
+        result = await self.acall_flan_t5(prompts, max_length=20)
+        return self._qa_type_output(result)
+
+    async def aboolq(self, questions, sentences, **kwargs):
+        prompts = FlanT5Client.get_boolq_prompts(questions, sentences, **kwargs)
+        if self.debug:
+            self.logger.info(f"BOOLQ Message Prompts are : {prompts}")
+        result = await self.acall_flan_t5(prompts, max_length=500)
+        return self._boolq_output(result, **kwargs)
+
+    async def aqa(self, questions, sentences, **kwargs):
+        prompts = FlanT5Client.get_qa_prompts(questions, sentences, **kwargs)
+        if self.debug:
+            self.logger.info(f"QA Message Prompts are : {prompts}")
+        result = await self.acall_flan_t5(prompts, max_length=500)
+        return self._qa_output(result)
+
+    async def aget_mnli_prompts(self, questions, sentences):
+        uniq_questions = list(set(questions))
+        uniq_hypotheses = await self.nlp_client.acall(
+            texts=uniq_questions,
+            option="convert_question_to_sentence",
+        )
+        return self._mnli_prompts(questions, sentences, uniq_questions, uniq_hypotheses)
@@ -0,0 +1,38 @@
+from timeit import default_timer
+from typing import List
+
+import aiohttp
+
+from nlm_utils.model_client.nlp_client import NlpClient
+from nlm_utils.model_client.session_pool import get_session
+from nlm_utils.model_client.transport import TransportError
+
+
+class AsyncNlpClient(NlpClient):
+    """
+    NlpClient with acall, the asyncio version of __call__. Requests are sent
+    with the aiohttp session shared by the async clients (see session_pool)
+    unless session is given. The blocking methods are kept.
+    """
+
+    def __init__(self, *args, session: aiohttp.ClientSession = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = session
+
+    async def acall(self, texts: List[str], option: str, domain: str = "", **kwargs):
+        self.logger.info(f"Running NLP server with option {option}.. domain {domain}")
+        wall_time = default_timer()
+        req_data, headers = self._encode_request(texts, option, domain)
+
+        try:
+            content = await self.transport.arequest(
+                self.session or get_session(),
+                "POST",
+                self.url,
+                body=req_data,
+                headers=headers,
+            )
+        except TransportError as e:
+            self.logger.error(e)
+            return []
+        return self._parse_response(content, wall_time)
@@ -0,0 +1,37 @@
+from timeit import default_timer
+
+import aiohttp
+
+from nlm_utils.model_client.request_body import encode_request
+from nlm_utils.model_client.session_pool import get_session
+from nlm_utils.model_client.yolo_client import YoloClient
+
+
+class AsyncYoloClient(YoloClient):
+    """
+    YoloClient with acall, the asyncio version of __call__. Requests are sent
+    with the aiohttp session shared by the async clients (see session_pool)
+    unless session is given. The blocking methods are kept.
+    """
+
+    def __init__(self, *args, session: aiohttp.ClientSession = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = session
+
+    async def acall(self, doc_id, page_idxs=[]):
+        self.logger.info(f"Running YOLO inference with doc_id {doc_id}")
+        wall_time = default_timer()
+
+        req_data = {"doc_id": doc_id}
+        if page_idxs:
+            req_data["page_idxs"] = page_idxs
+        req_data, headers = encode_request(req_data)
+
+        content = await self.transport.arequest(
+            self.session or get_session(),
+            "POST",
+            self.url,
+            body=req_data,
+            headers=headers,
+        )
+        return self._parse_response(content, wall_time)
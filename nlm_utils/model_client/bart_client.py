@@ -1,42 +1,63 @@
 import json
 import logging
 
-from nlm_utils.model_client.connection_pool import connection_pool
 from nlm_utils.model_client.nlp_client import NlpClient
+from nlm_utils.model_client.request_body import check_request_encoding
+from nlm_utils.model_client.request_body import encode_request
+from nlm_utils.model_client.transport import default_transport
 
 
 class BartClient:
+    nlp_client_class = NlpClient
+
     def __init__(
         self,
         url: str,
+        request_encoding: str = "json",
+        request_compression: str = None,
+        transport=None,
     ):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.logger.setLevel(logging.INFO)
         self.url = url
         self.debug = False
-        self.nlp_client = NlpClient(url=url)
+        check_request_encoding(request_encoding, request_compression)
+        self.request_encoding = request_encoding
+        self.request_compression = request_compression
+        self.transport = transport or default_transport
+        self.nlp_client = self.nlp_client_class(
+            url=url,
+            request_encoding=request_encoding,
+            request_compression=request_compression,
+            transport=self.transport,
+        )
 
     def set_debug_flag(self, debug_flag):
         self.debug = debug_flag
 
     def call_bart(self, prompts, max_length=120):
         url = f"{self.url}/bart/infer"
-        headers = {
-            "Accept-Encoding": "gzip, deflate",
-            "Accept": "*/*",
-            "Content-Type": "application/json",
-        }
-        req_data = {"prompts": prompts, "max_length": max_length}
-        req_data = json.dumps(req_data).encode("utf-8")
-        resp = connection_pool.request("POST", url, body=req_data, headers=headers)
-        result = json.loads(resp.data)
+        req_data, headers = self._encode_request(prompts, max_length)
+        content = self.transport.request("POST", url, body=req_data, headers=headers)
+        result = json.loads(content)
         return result
 
+    def _encode_request(self, prompts, max_length):
+        req_data = {"prompts": prompts, "max_length": max_length}
+        return encode_request(
+            req_data,
+            self.request_encoding,
+            self.request_compression,
+        )
+
     def qa_sum(self, questions, passages, **kwargs):
         prompts = BartClient.get_qa_sum_prompts(questions, passages)
         if self.debug:
             self.logger.info(f"QA Summary Message Prompts are : {prompts}")
         result = self.call_bart(prompts, max_length=1024)
+        return self._qa_sum_output(result)
+
+    def _qa_sum_output(self, result):
         if self.debug:
             self.logger.info(f"Bart QA Summary Results are : {result}")
         answers = {}
@@ -8,7 +8,19 @@ import numpy as np
 from nlm_utils.model_client.bart_client import BartClient
 from nlm_utils.model_client.connection_pool import connection_pool
 from nlm_utils.model_client.flan_t5_client import FlanT5Client
+from nlm_utils.model_client.micro_batcher import get_batcher
+from nlm_utils.model_client.micro_batcher import merge_requests
+from nlm_utils.model_client.micro_batcher import split_response
 from nlm_utils.model_client.openai_client import OpenAIClient
+from nlm_utils.model_client.request_body import check_request_encoding
+from nlm_utils.model_client.request_body import encode_request
+from nlm_utils.model_client.transport import default_transport
+from nlm_utils.model_client.transport import TransportError
+
+# fields with one entry per question/sentence pair, concatenated by the micro-batcher
+BATCHED_FIELDS = ("questions", "sentences", "left_sentences", "right_sentences")
+# fields of the response with one entry per pair, split by the micro-batcher
+SPLIT_FIELDS = ("predictions", "probs", "logits", "labels", "answers")
 
 
 def fix_answer_tokenization_issues(answer):
@@ -39,6 +51,9 @@ def fix_tokenizer_issues(response):
 
 
 class ClassificationClient:
+    flan_t5_client_class = FlanT5Client
+    bart_client_class = BartClient
+
     def __init__(
         self,
         model: str = "roberta",
@@ -47,6 +62,12 @@ class ClassificationClient:
         batch_size: int = None,
         use_msgpack: bool = False,
         retry: int = 5,
+        request_encoding: str = "json",
+        request_compression: str = None,
+        transport=None,
+        micro_batch: bool = False,
+        micro_batch_size: int = 64,
+        micro_batch_wait_ms: float = 5,
         **kwargs,
     ):
         self.logger = logging.getLogger(self.__class__.__name__)
@@ -57,13 +78,28 @@ class ClassificationClient:
         self.use_msgpack = use_msgpack
         self.retry = retry
         self.connection = connection_pool
+        # timeouts, backoff, circuit breaker and hedging, see transport.Transport
+        self.transport = transport or default_transport
+        # gather concurrent calls to the same model/task into one request
+        self.micro_batch = micro_batch
+        self.micro_batch_size = micro_batch_size
+        self.micro_batch_wait_ms = micro_batch_wait_ms
+        # encoding of the request bodies, see request_body.encode_request
+        check_request_encoding(request_encoding, request_compression)
+        self.request_encoding = request_encoding
+        self.request_compression = request_compression
 
         self.url = f"{url}/{model}/{task}"
         if self.model in ["flan-t5", "openai", "bart"]:
             self.url = url
         self.model_client = None
         if self.model == "flan-t5":
-            self.model_client = FlanT5Client(self.url)
+            self.model_client = self.flan_t5_client_class(
+                self.url,
+                request_encoding=request_encoding,
+                request_compression=request_compression,
+                transport=self.transport,
+            )
             self.model_client.set_debug_flag(kwargs.get("debug", False))
         elif self.model == "openai":
             self.model_client = OpenAIClient()
@@ -72,7 +108,12 @@ class ClassificationClient:
                 self.model_client.set_model(openai_model)
             self.model_client.set_debug_flag(kwargs.get("debug", False))
         elif self.model == "bart":
-            self.model_client = BartClient(self.url)
+            self.model_client = self.bart_client_class(
+                self.url,
+                request_encoding=request_encoding,
+                request_compression=request_compression,
+                transport=self.transport,
+            )
             self.model_client.set_debug_flag(kwargs.get("debug", False))
 
     # @cache
@@ -85,17 +126,33 @@ class ClassificationClient:
         return_probs=False,
         **kwargs,
     ):
-        if self.model == "flan-t5" and self.model_client:
+        if self.model_client:
+            return self._call_model_client(questions, sentences, **kwargs)
+
+        req_data = self._build_request(
+            questions,
+            sentences,
+            return_labels,
+            return_logits,
+            return_probs,
+            **kwargs,
+        )
+        if self.micro_batch and questions:
+            return self._submit(req_data, len(questions))
+        return self._post(req_data)
+
+    def _call_model_client(self, questions, sentences, **kwargs):
+        if self.model == "flan-t5":
             if self.task in {"qa", "roberta-qa"}:
                 return self.model_client.qa(questions, sentences, **kwargs)
             elif self.task in {"boolq"}:
                 return self.model_client.boolq(questions, sentences, **kwargs)
             elif self.task in {"qa_type"}:
                 return self.model_client.qa_type(questions)
-        elif self.model == "bart" and self.model_client:
+        elif self.model == "bart":
             if self.task in {"qa_sum"}:
                 return self.model_client.qa_sum(questions, sentences, **kwargs)
-        elif self.model == "openai" and self.model_client:
+        elif self.model == "openai":
             if self.task in {"qa", "roberta-qa"}:
                 return self.model_client.qa(questions, sentences)
             elif self.task in {"boolq"}:
@@ -104,93 +161,132 @@ class ClassificationClient:
                 return self.model_client.qa_type(questions)
             elif self.task == "qa_sum":
                 return self.model_client.qa_sum(questions, sentences, **kwargs)
+
+    def _build_request(
+        self,
+        questions,
+        sentences,
+        return_labels,
+        return_logits,
+        return_probs,
+        **kwargs,
+    ):
+        if self.task in {"qa", "phraseqa", "calc"}:
+            req_data = {
+                # replace ” with "
+                "questions": questions,
+                "sentences": sentences,
+                "return_logits": return_logits,
+                "return_probs": return_probs,
+            }
+        elif self.task in {"roberta-qa", "roberta-phraseqa", "roberta-calc"}:
+            sentences = [s + "<s>" for s in sentences]
+            req_data = {
+                # replace ” with "
+                "left_sentences": sentences,
+                "right_sentences": questions,
+                "return_logits": return_logits,
+                "return_probs": return_probs,
+            }
+        elif self.task in {"io-qa"}:
+            req_data = {
+                "left_sentences": questions,
+                "right_sentences": sentences,
+                "return_logits": return_logits,
+                "return_probs": return_probs,
+            }
         else:
-            if self.task in {"qa", "phraseqa", "calc"}:
-                req_data = {
-                    # replace ” with "
-                    "questions": questions,
-                    "sentences": sentences,
-                    "return_logits": return_logits,
-                    "return_probs": return_probs,
-                }
-            elif self.task in {"roberta-qa", "roberta-phraseqa", "roberta-calc"}:
-                sentences = [s + "<s>" for s in sentences]
+            if sentences:
                 req_data = {
-                    # replace ” with "
-                    "left_sentences": sentences,
-                    "right_sentences": questions,
+                    "left_sentences": questions,
+                    "right_sentences": sentences,
+                    "return_labels": return_labels,
                     "return_logits": return_logits,
                     "return_probs": return_probs,
+                    "keep_statement": kwargs.get("keep_statement", False),
                 }
-            elif self.task in {"io-qa"}:
+            else:
                 req_data = {
                     "left_sentences": questions,
-                    "right_sentences": sentences,
+                    "return_labels": return_labels,
                     "return_logits": return_logits,
                     "return_probs": return_probs,
                 }
-            else:
-                if sentences:
-                    req_data = {
-                        "left_sentences": questions,
-                        "right_sentences": sentences,
-                        "return_labels": return_labels,
-                        "return_logits": return_logits,
-                        "return_probs": return_probs,
-                        "keep_statement": kwargs.get("keep_statement", False),
-                    }
-                else:
-                    req_data = {
-                        "left_sentences": questions,
-                        "return_labels": return_labels,
-                        "return_logits": return_logits,
-                        "return_probs": return_probs,
-                    }
 
-            batch_size = kwargs.get("batch_size", False) or self.batch_size
+        batch_size = kwargs.get("batch_size", False) or self.batch_size
+
+        if batch_size:
+            req_data["batch_size"] = batch_size
+
+        use_msgpack = kwargs.get("use_msgpack", False) or self.use_msgpack
 
-            if batch_size:
-                req_data["batch_size"] = batch_size
+        if use_msgpack:
+            req_data["use_msgpack"] = True
+
+        return req_data
+
+    def _submit(self, req_data, size):
+        batcher = get_batcher(
+            self.url,
+            self.micro_batch_size,
+            self.micro_batch_wait_ms / 1000,
+        )
+        # calls with the same fields and options are batched together
+        key = (
+            self.request_encoding,
+            self.request_compression,
+            tuple(field for field in BATCHED_FIELDS if field in req_data),
+            tuple(
+                (field, value)
+                for field, value in sorted(req_data.items())
+                if field not in BATCHED_FIELDS
+            ),
+        )
 
-            use_msgpack = kwargs.get("use_msgpack", False) or self.use_msgpack
+        def send(items):
+            if len(items) == 1:
+                return [self._post(items[0][0])]
+            req_datas, sizes = zip(*items)
+            response = self._post(merge_requests(req_datas, BATCHED_FIELDS))
+            if response is None:
+                return [None] * len(items)
+            self.logger.info(
+                f"{self.__class__.__name__} sent {len(items)} calls of {sum(sizes)} pairs in one request",
+            )
+            return split_response(response, sizes, SPLIT_FIELDS)
 
-            if use_msgpack:
-                req_data["use_msgpack"] = True
+        return batcher.submit(key, (req_data, size), size, send)
 
-            req_data = json.dumps(req_data).encode("utf-8")
+    def _post(self, req_data):
+        use_msgpack = req_data.get("use_msgpack", False)
+        req_data, headers = encode_request(
+            req_data,
+            self.request_encoding,
+            self.request_compression,
+        )
 
-            for i in range(self.retry):
-                try:
-                    resp = self.connection.request(
-                        "POST",
-                        self.url,
-                        body=req_data,
-                        headers={
-                            "Accept-Encoding": "gzip, deflate",
-                            "Accept": "*/*",
-                            "Content-Type": "application/json",
-                        },
-                    )
+        try:
+            content = self.transport.request(
+                "POST",
+                self.url,
+                body=req_data,
+                headers=headers,
+                retry=self.retry,
+            )
+        except TransportError as e:
+            self.logger.error(f"Error in classification: {e}")
+            return None
+        return self._parse_response(content, use_msgpack)
 
-                    if resp.status == 200:
-                        response = None
-                        if use_msgpack:
-                            data = msgpack.unpackb(resp.data, raw=False)
-                            data["predictions"] = np.frombuffer(data["predictions"])
-                            response = data
-                        else:
-                            response = json.loads(resp.data)
-                        if self.task in "roberta-qa":
-                            fix_tokenizer_issues(response)
-                        return response
-                    else:
-                        raise RuntimeError(
-                            f"Exception when query {self.url}: {resp.text},",
-                        )
-                except Exception as e:
-                    self.logger.error(
-                        f"Error in classification, retried {i} times: {e}",
-                    )
+    def _parse_response(self, content, use_msgpack):
+        if use_msgpack:
+            response = msgpack.unpackb(content, raw=False)
+            response["predictions"] = np.frombuffer(response["predictions"])
+        else:
+            response = json.loads(content)
+        if self.task in "roberta-qa":
+            fix_tokenizer_issues(response)
+        return response
 
     def active_learning(self, update_workers: bool = False, **req_data):
         req_data.update(
@@ -203,28 +299,24 @@ class ClassificationClient:
                 "restart_workers": True,
             },
         )
-        req_data = json.dumps(req_data).encode("utf-8")
-
-        for i in range(self.retry):
-            try:
-                resp = self.connection.request(
-                    "PUT",
-                    self.url,
-                    body=req_data,
-                    headers={
-                        "Accept-Encoding": "gzip, deflate",
-                        "Accept": "*/*",
-                        "Content-Type": "application/json",
-                    },
-                    retries=False,
-                )
+        req_data, headers = encode_request(
+            req_data,
+            self.request_encoding,
+            self.request_compression,
+        )
 
-                if resp.status == 200:
-                    return json.loads(resp.data)
-                else:
-                    raise RuntimeError(f"Exception when query {self.url}: {resp},")
-            except Exception as e:
-                self.logger.error(f"Error in classification, retried {i} times: {e}")
+        try:
+            content = self.transport.request(
+                "PUT",
+                self.url,
+                body=req_data,
+                headers=headers,
+                retry=self.retry,
+                hedge=False,
+            )
+            return json.loads(content)
+        except TransportError as e:
+            self.logger.error(f"Error in classification: {e}")
 
     def restart(self, restart_checkpoint: str = ""):
         req_data = {
@@ -233,24 +325,21 @@ class ClassificationClient:
         if restart_checkpoint:
             req_data["restart_checkpoint"] = restart_checkpoint
 
-        req_data = json.dumps(req_data).encode("utf-8")
+        req_data, headers = encode_request(
+            req_data,
+            self.request_encoding,
+            self.request_compression,
+        )
 
         try:
-            resp = self.connection.request(
+            content = self.transport.request(
                 "PUT",
                 self.url,
                 body=req_data,
-                headers={
-                    "Accept-Encoding": "gzip, deflate",
-                    "Accept": "*/*",
-                    "Content-Type": "application/json",
-                },
-                retries=False,
+                headers=headers,
+                retry=1,
+                hedge=False,
             )
-
-            if resp.status == 200:
-                return json.loads(resp.data)
-            else:
-                raise RuntimeError(f"Exception in restart {self.url}: {resp},")
-        except Exception as e:
+            return json.loads(content)
+        except TransportError as e:
             self.logger.error(f"Error in restart  {e}")
@@ -1,3 +1,182 @@
+import socket
+import threading
+
 import urllib3
+from urllib3.connection import HTTPConnection
+from urllib3.util import parse_url
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
 
 connection_pool = urllib3.PoolManager(maxsize=20)
+
+
+class HttpxResponse:
+    # the attributes of urllib3.HTTPResponse used by the model clients
+    def __init__(self, response):
+        self.status = response.status_code
+        self.data = response.content
+        self.headers = response.headers
+
+
+class EndpointPool:
+    """
+    Connection pool of one endpoint (scheme://host:port), a urllib3.PoolManager
+    or, with http2=True, an httpx.Client multiplexing requests over HTTP/2.
+
+    Counts the requests in flight, a request started while maxsize requests
+    are already in flight is counted as saturated: it waits for a connection
+    (block=True) or opens a connection which is discarded afterwards.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 20,
+        block: bool = False,
+        keep_alive: bool = True,
+        keepalive_expiry: float = 60.0,
+        http2: bool = False,
+        pool: urllib3.PoolManager = None,
+        **tls_kwargs,
+    ):
+        self.maxsize = maxsize
+        self.block = block
+        self.http2 = http2
+        # headers sent with every request, PoolManager only applies its own
+        # headers to requests sent without headers
+        self.headers = dict(tls_kwargs.pop("headers", None) or {})
+
+        if pool is not None:
+            self.pool = pool
+        elif http2:
+            if httpx is None:
+                raise ImportError("Please install `httpx[http2]` to use http2")
+            self.pool = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=maxsize,
+                    max_keepalive_connections=maxsize if keep_alive else 0,
+                    keepalive_expiry=keepalive_expiry,
+                ),
+                verify=tls_kwargs.get("ca_certs", True),
+                cert=(
+                    (tls_kwargs["cert_file"], tls_kwargs["key_file"])
+                    if tls_kwargs.get("key_file")
+                    else tls_kwargs.get("cert_file")
+                ),
+            )
+        else:
+            if keep_alive:
+                # TCP keep-alive, idle connections are not dropped by firewalls
+                tls_kwargs["socket_options"] = list(
+                    tls_kwargs.get(
+                        "socket_options",
+                        HTTPConnection.default_socket_options,
+                    ),
+                ) + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            else:
+                self.headers["Connection"] = "close"
+            self.pool = urllib3.PoolManager(maxsize=maxsize, block=block, **tls_kwargs)
+
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.n_requests = 0
+        self.n_saturated = 0
+
+    def request(self, method, url, body=None, headers=None, timeout=None, **kwargs):
+        with self._lock:
+            if self.in_flight >= self.maxsize:
+                self.n_saturated += 1
+            self.in_flight += 1
+            self.n_requests += 1
+            self.peak = max(self.peak, self.in_flight)
+        if self.headers:
+            headers = {**self.headers, **(headers or {})}
+        try:
+            if not self.http2:
+                return self.pool.request(
+                    method,
+                    url,
+                    body=body,
+                    headers=headers,
+                    timeout=timeout,
+                    **kwargs,
+                )
+            if isinstance(timeout, urllib3.Timeout):
+                timeout = httpx.Timeout(
+                    None,
+                    connect=timeout.connect_timeout,
+                    read=timeout.read_timeout,
+                )
+            return HttpxResponse(
+                self.pool.request(
+                    method,
+                    url,
+                    content=body,
+                    headers=headers,
+                    timeout=timeout,
+                ),
+            )
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def stats(self):
+        return {
+            "maxsize": self.maxsize,
+            "http2": self.http2,
+            "in_flight": self.in_flight,
+            "peak": self.peak,
+            "requests": self.n_requests,
+            "saturated": self.n_saturated,
+            "saturation": self.peak / self.maxsize,
+        }
+
+
+# {endpoint: EndpointPool}, None is the pool of endpoints not configured
+_pools = {None: EndpointPool(pool=connection_pool)}
+_pools_lock = threading.Lock()
+
+
+def _endpoint(url):
+    if url is None:
+        return None
+    url = parse_url(url)
+    scheme = url.scheme or "http"
+    port = url.port or (443 if scheme == "https" else 80)
+    return f"{scheme}://{url.host}:{port}"
+
+
+def configure_pool(url: str = None, **kwargs):
+    """
+    Use a dedicated pool for the endpoint of url, see EndpointPool for the
+    settings. Without url, configure the pool of all other endpoints.
+
+        configure_pool("http://encoder:5000", maxsize=64, block=True)
+        configure_pool("https://qa:443", http2=True, ca_certs="/etc/ssl/ca.pem")
+    """
+    pool = EndpointPool(**kwargs)
+    with _pools_lock:
+        _pools[_endpoint(url)] = pool
+    return pool
+
+
+def get_pool(url: str = None):
+    """
+    The pool configured for the endpoint of url, or the default pool.
+    """
+    return _pools.get(_endpoint(url)) or _pools[None]
+
+
+def pool_stats():
+    """
+    Requests in flight, peak and saturation of each configured pool.
+    saturation is peak / maxsize, above 1 requests had to wait for (block=True)
+    or open (block=False) connections beyond maxsize.
+    """
+    return {
+        endpoint or "default": pool.stats() for endpoint, pool in list(_pools.items())
+    }
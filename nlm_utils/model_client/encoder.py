@@ -1,14 +1,27 @@
+import asyncio
+import itertools
 import json
 import logging
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from timeit import default_timer
 from typing import List
 
+import aiohttp
 import msgpack
 import numpy as np
+from xxhash import xxh64
 
 from nlm_utils.model_client.connection_pool import connection_pool
+from nlm_utils.model_client.request_body import check_request_encoding
+from nlm_utils.model_client.request_body import encode_request
+from nlm_utils.model_client.session_pool import get_session
+from nlm_utils.model_client.transport import default_transport
+from nlm_utils.model_client.transport import TransportError
 from nlm_utils.utils import normalize_embeddings
+from nlm_utils.utils import normalize_embeddings_array
+from nlm_utils.utils import quantize_embeddings
 
 # import http.client
 # http.client.HTTPConnection.debuglevel = 1
@@ -25,18 +38,53 @@ class EncoderClient:
         dummy_number=True,
         lower=True,
         retry=5,
+        cache=None,
+        urls: List[str] = None,
+        shard_size: int = None,
+        max_workers: int = 8,
+        return_numpy: bool = False,
+        output_dtype: str = None,
+        request_encoding: str = "json",
+        request_compression: str = None,
+        transport=None,
+        session: aiohttp.ClientSession = None,
     ):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.logger.setLevel(logging.INFO)
         self.batch_size = batch_size
         self.use_msgpack = use_msgpack
+        # encoding of the request bodies, see request_body.encode_request
+        check_request_encoding(request_encoding, request_compression)
+        self.request_encoding = request_encoding
+        self.request_compression = request_compression
         self.normalization = normalization
+        # return embeddings as a numpy array instead of lists of rounded floats,
+        # optionally converted to float16 or int8 (scaled by 127)
+        self.return_numpy = return_numpy
+        if output_dtype not in (None, "float32", "float16", "int8"):
+            raise ValueError(f"Unknown output_dtype {output_dtype}")
+        self.output_dtype = output_dtype
         self.dummy_number = dummy_number
         self.lower = lower
         self.retry = retry
         self.connection = connection_pool
+        # timeouts, backoff, circuit breaker and hedging, see transport.Transport
+        self.transport = transport or default_transport
+        # aiohttp session of aencode, the shared session_pool.get_session() by default
+        self.session = session
         self.model = model
-        self.url = url
+        # encoder replicas, requests are sent round-robin
+        self.urls = urls or [url]
+        self.url = self.urls[0]
+        self._url_counter = itertools.count()
+        self._url_lock = threading.Lock()
+        # split requests into shards of shard_size sentences, sent concurrently
+        self.shard_size = shard_size
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # optional nlm_utils.cache.Cache to store embeddings per sentence
+        self.cache = cache
 
         # reg for dummy number
         self.regx = re.compile(
@@ -65,11 +113,262 @@ class EncoderClient:
         )
 
     def encode(self, sentences: List[str], headers: List[str] = None, **kwargs):
-        url = f"{self.url}/{self.model}/encoder"
-        wall_time = default_timer()
+        sentences = self.pre_process_text(sentences)
+        if headers:
+            headers = self.pre_process_text(headers)
 
-        # request data
-        req_data = {"sentences": self.pre_process_text(sentences)}
+        if self._use_cache(sentences, **kwargs):
+            data = self._encode_with_cache(sentences, headers, **kwargs)
+        else:
+            data = self._encode(sentences, headers, **kwargs)
+
+        return self._post_process(data, **kwargs)
+
+    async def aencode(self, sentences: List[str], headers: List[str] = None, **kwargs):
+        """
+        asyncio version of encode, shards are sent concurrently with aiohttp.
+        """
+        sentences = self.pre_process_text(sentences)
+        if headers:
+            headers = self.pre_process_text(headers)
+
+        if self._use_cache(sentences, **kwargs):
+            data = await self._aencode_with_cache(sentences, headers, **kwargs)
+        else:
+            data = await self._aencode(sentences, headers, **kwargs)
+
+        return self._post_process(data, **kwargs)
+
+    def _use_cache(self, sentences, **kwargs):
+        return (
+            sentences
+            and self.cache is not None
+            and self.cache.connected
+            and not kwargs.get("no_cache", False)
+        )
+
+    def _post_process(self, data, **kwargs):
+        if data is None:
+            return None
+
+        if kwargs.get("return_numpy", self.return_numpy):
+            # normalize the float32 array in place, copy only if it is read-only
+            embeddings = np.require(
+                data["embeddings"],
+                dtype=np.float32,
+                requirements=["C", "W"],
+            )
+            if self.normalization:
+                normalize_embeddings_array(embeddings)
+            if self.output_dtype:
+                embeddings = quantize_embeddings(embeddings, self.output_dtype)
+            data["embeddings"] = embeddings
+        elif self.normalization:
+            data["embeddings"] = normalize_embeddings(data["embeddings"])
+        else:
+            data["embeddings"] = [
+                [round(y, 8) for y in x] for x in data["embeddings"].tolist()
+            ]
+        return data
+
+    def get_embedding_cache_key(self, sentence: str, header: str = None):
+        # sentence and header are expected after pre_process_text
+        if header:
+            sentence = f"{header}\x00{sentence}"
+        return f"{self.model}-{xxh64(sentence.encode('utf-8')).hexdigest()}"
+
+    def _encode_with_cache(
+        self,
+        sentences: List[str],
+        headers: List[str] = None,
+        **kwargs,
+    ):
+        cache_keys = self._get_cache_keys(sentences, headers)
+
+        if kwargs.get("overwrite", False):
+            results = [(False, None)] * len(cache_keys)
+        else:
+            results = self.cache.read_many_cache(cache_keys)
+
+        missing = self._find_missing(cache_keys, results)
+        data = {}
+        embeddings = {}
+        if missing:
+            data = self._encode(
+                *self._select(sentences, headers, missing.values()),
+                **kwargs,
+            )
+            if data is None:
+                return None
+            embeddings = self._missing_embeddings(missing, data)
+            self.cache.write_many_cache(
+                list(embeddings.values()),
+                list(embeddings.keys()),
+            )
+
+        return self._reassemble(data, cache_keys, results, embeddings, len(missing))
+
+    async def _aencode_with_cache(
+        self,
+        sentences: List[str],
+        headers: List[str] = None,
+        **kwargs,
+    ):
+        cache_keys = self._get_cache_keys(sentences, headers)
+
+        if kwargs.get("overwrite", False):
+            results = [(False, None)] * len(cache_keys)
+        else:
+            results = await self.cache.aread_many_cache(cache_keys)
+
+        missing = self._find_missing(cache_keys, results)
+        data = {}
+        embeddings = {}
+        if missing:
+            data = await self._aencode(
+                *self._select(sentences, headers, missing.values()),
+                **kwargs,
+            )
+            if data is None:
+                return None
+            embeddings = self._missing_embeddings(missing, data)
+            await self.cache.awrite_many_cache(
+                list(embeddings.values()),
+                list(embeddings.keys()),
+            )
+
+        return self._reassemble(data, cache_keys, results, embeddings, len(missing))
+
+    def _get_cache_keys(self, sentences, headers):
+        return [
+            self.get_embedding_cache_key(
+                sentence,
+                headers[idx] if headers else None,
+            )
+            for idx, sentence in enumerate(sentences)
+        ]
+
+    @staticmethod
+    def _find_missing(cache_keys, results):
+        # {cache_key: index} of the unique sentences not found in cache
+        missing = {}
+        for idx, (status, _) in enumerate(results):
+            if not status and cache_keys[idx] not in missing:
+                missing[cache_keys[idx]] = idx
+        return missing
+
+    @staticmethod
+    def _select(sentences, headers, idxs):
+        idxs = list(idxs)
+        return (
+            [sentences[idx] for idx in idxs],
+            [headers[idx] for idx in idxs] if headers else None,
+        )
+
+    @staticmethod
+    def _missing_embeddings(missing, data):
+        missing_embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+        return dict(zip(missing.keys(), missing_embeddings))
+
+    def _reassemble(self, data, cache_keys, results, embeddings, n_missing):
+        # reassemble embeddings in the original order
+        rows = [
+            embedding if status else embeddings[cache_key]
+            for cache_key, (status, embedding) in zip(cache_keys, results)
+        ]
+        data["embeddings"] = np.stack(rows).astype(np.float32, copy=False)
+
+        self.logger.info(
+            f"{self.__class__.__name__} found {len(cache_keys) - n_missing} of "
+            f"{len(cache_keys)} sentences in cache",
+        )
+        return data
+
+    def _replica_urls(self, path):
+        # all replicas starting with the next one round-robin, retries go to the others
+        if len(self.urls) == 1:
+            return [f"{self.url}{path}"]
+        with self._url_lock:
+            start = next(self._url_counter) % len(self.urls)
+        return [f"{url}{path}" for url in self.urls[start:] + self.urls[:start]]
+
+    def _shards(self, sentences, headers):
+        # [(start, sentences, headers)] of at most shard_size sentences
+        if not self.shard_size or len(sentences) <= self.shard_size:
+            return [(0, sentences, headers)]
+        return [
+            (
+                start,
+                sentences[start : start + self.shard_size],
+                headers[start : start + self.shard_size] if headers else None,
+            )
+            for start in range(0, len(sentences), self.shard_size)
+        ]
+
+    def _merge_shards(self, shards, results, n_sentences):
+        if any(data is None for data in results):
+            return None
+        if len(results) == 1:
+            return results[0]
+
+        # copy the shards into one contiguous float32 array
+        data = results[0]
+        embeddings = None
+        for (start, sentences, _), shard_data in zip(shards, results):
+            shard_embeddings = np.asarray(shard_data["embeddings"], dtype=np.float32)
+            if embeddings is None:
+                embeddings = np.empty(
+                    (n_sentences, *shard_embeddings.shape[1:]),
+                    dtype=np.float32,
+                )
+            embeddings[start : start + len(sentences)] = shard_embeddings
+        data["embeddings"] = embeddings
+        return data
+
+    def _encode(self, sentences: List[str], headers: List[str] = None, **kwargs):
+        # sentences and headers are expected after pre_process_text
+        shards = self._shards(sentences, headers)
+        if len(shards) == 1:
+            return self._encode_shard(sentences, headers, **kwargs)
+
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=self.__class__.__name__,
+                    )
+        futures = [
+            self._executor.submit(
+                self._encode_shard,
+                shard_sentences,
+                shard_headers,
+                **kwargs,
+            )
+            for _, shard_sentences, shard_headers in shards
+        ]
+        results = [future.result() for future in futures]
+        return self._merge_shards(shards, results, len(sentences))
+
+    async def _aencode(self, sentences: List[str], headers: List[str] = None, **kwargs):
+        shards = self._shards(sentences, headers)
+        session = self.session or get_session()
+        results = await asyncio.gather(
+            *[
+                self._aencode_shard(
+                    session,
+                    shard_sentences,
+                    shard_headers,
+                    **kwargs,
+                )
+                for _, shard_sentences, shard_headers in shards
+            ]
+        )
+        return self._merge_shards(shards, results, len(sentences))
+
+    def _encode_request(self, sentences, headers, **kwargs):
+        # returns the request body, its headers and whether the response is msgpack
+        req_data = {"sentences": sentences}
 
         # insert batch_size if needed
         batch_size = kwargs.get("batch_size", False) or self.batch_size
@@ -82,66 +381,118 @@ class EncoderClient:
             req_data["use_msgpack"] = True
 
         if headers:
-            req_data["headers"] = self.pre_process_text(headers)
-
-        req_data = json.dumps(req_data).encode("utf-8")
-
-        for i in range(self.retry):
-            try:
-                resp = self.connection.request(
-                    "POST",
-                    url,
-                    body=req_data,
-                    headers={
-                        "Accept-Encoding": "gzip, deflate",
-                        "Accept": "*/*",
-                        "Content-Type": "application/json",
-                    },
-                )
+            req_data["headers"] = headers
 
-                wall_time = (default_timer() - wall_time) * 1000
+        return (
+            *encode_request(
+                req_data,
+                self.request_encoding,
+                self.request_compression,
+            ),
+            use_msgpack,
+        )
 
-                self.logger.info(
-                    f"{self.__class__.__name__} Encoded {len(sentences)} sentences. Wall time: {wall_time:.2f}ms",
-                )
+    def _encode_response(self, content, n_sentences, use_msgpack):
+        if use_msgpack:
+            data = msgpack.unpackb(content, raw=False)
+            # unpack embeddings from binary
+            data["embeddings"] = np.frombuffer(
+                data["embeddings"],
+                dtype=np.float32,
+            ).reshape(
+                n_sentences,
+                -1,
+            )
+            # filling nan
+            data["embeddings"] = np.nan_to_num(data["embeddings"])
+        else:
+            data = json.loads(content)
+        return data
 
-                if resp.status == 200:
-                    if use_msgpack:
-                        data = msgpack.unpackb(resp.data, raw=False)
-                        # unpack embeddings from binary
-                        data["embeddings"] = np.frombuffer(
-                            data["embeddings"],
-                            dtype=np.float32,
-                        ).reshape(
-                            len(sentences),
-                            -1,
-                        )
-                        # filling nan
-                        data["embeddings"] = np.nan_to_num(data["embeddings"])
-                    else:
-                        data = json.loads(resp.data)
-
-                    if self.normalization:
-                        data["embeddings"] = normalize_embeddings(data["embeddings"])
-                    else:
-                        data["embeddings"] = [
-                            [round(y, 8) for y in x]
-                            for x in data["embeddings"].tolist()
-                        ]
-                    return data
-                else:
-                    raise RuntimeError(f"Exception: {resp.status} from {url}")
-            except Exception as e:
-                self.logger.error(
-                    f"Error in encoder to {self.url}, retried {i} times: {e}",
-                    exc_info=True,
-                )
+    def _encode_shard(self, sentences: List[str], headers: List[str] = None, **kwargs):
+        wall_time = default_timer()
+        req_data, req_headers, use_msgpack = self._encode_request(
+            sentences,
+            headers,
+            **kwargs,
+        )
 
-    def compare(self, sentences_a: List[str], sentences_b: List[str] = None, **kwargs):
-        url = f"{self.url}/{self.model}/similarity"
+        try:
+            content = self.transport.request(
+                "POST",
+                self._replica_urls(f"/{self.model}/encoder"),
+                body=req_data,
+                headers=req_headers,
+                retry=self.retry,
+            )
+        except TransportError as e:
+            self.logger.error(f"Error in encoder: {e}")
+            return None
+
+        self.logger.info(
+            f"{self.__class__.__name__} Encoded {len(sentences)} sentences. Wall time: {(default_timer() - wall_time) * 1000:.2f}ms",
+        )
+        return self._encode_response(content, len(sentences), use_msgpack)
 
+    async def _aencode_shard(
+        self,
+        session,
+        sentences: List[str],
+        headers: List[str] = None,
+        **kwargs,
+    ):
+        wall_time = default_timer()
+        req_data, req_headers, use_msgpack = self._encode_request(
+            sentences,
+            headers,
+            **kwargs,
+        )
+
+        try:
+            content = await self.transport.arequest(
+                session,
+                "POST",
+                self._replica_urls(f"/{self.model}/encoder"),
+                body=req_data,
+                headers=req_headers,
+                retry=self.retry,
+            )
+        except TransportError as e:
+            self.logger.error(f"Error in encoder: {e}")
+            return None
+
+        self.logger.info(
+            f"{self.__class__.__name__} Encoded {len(sentences)} sentences. Wall time: {(default_timer() - wall_time) * 1000:.2f}ms",
+        )
+        return self._encode_response(content, len(sentences), use_msgpack)
+
+    def compare(self, sentences_a: List[str], sentences_b: List[str] = None, **kwargs):
         wall_time = default_timer()
+        req_data, req_headers, use_msgpack = self._compare_request(
+            sentences_a,
+            sentences_b,
+            **kwargs,
+        )
+        try:
+            content = self.transport.request(
+                "POST",
+                self._replica_urls(f"/{self.model}/similarity"),
+                body=req_data,
+                headers=req_headers,
+                retry=self.retry,
+            )
+        except TransportError as e:
+            self.logger.error(f"Error in encoder: {e}")
+            return None
+        return self._compare_response(
+            content,
+            sentences_a,
+            sentences_b,
+            use_msgpack,
+            wall_time,
+        )
 
+    def _compare_request(self, sentences_a, sentences_b, **kwargs):
         # request data
         req_data = {
             "sentences_a": self.pre_process_text(sentences_a),
@@ -158,46 +509,41 @@ class EncoderClient:
         if use_msgpack:
             req_data["use_msgpack"] = True
 
-        req_data = json.dumps(req_data).encode("utf-8")
-        for i in range(self.retry):
-            try:
-                resp = self.connection.request(
-                    "POST",
-                    url,
-                    body=req_data,
-                    headers={
-                        "Accept-Encoding": "gzip, deflate",
-                        "Accept": "*/*",
-                        "Content-Type": "application/json",
-                    },
-                )
+        return (
+            *encode_request(
+                req_data,
+                self.request_encoding,
+                self.request_compression,
+            ),
+            use_msgpack,
+        )
 
-                wall_time = (default_timer() - wall_time) * 1000
+    def _compare_response(
+        self,
+        content,
+        sentences_a,
+        sentences_b,
+        use_msgpack,
+        wall_time,
+    ):
+        wall_time = (default_timer() - wall_time) * 1000
 
-                self.logger.info(
-                    f"{self.__class__.__name__} Compared {len(sentences_a)} with {len(sentences_b)} sentences. Wall time: {wall_time:.2f}ms",
-                )
+        self.logger.info(
+            f"{self.__class__.__name__} Compared {len(sentences_a)} with {len(sentences_b)} sentences. Wall time: {wall_time:.2f}ms",
+        )
 
-                if resp.status == 200:
-                    if use_msgpack:
-                        data = msgpack.unpackb(resp.data, raw=False)
-                        # unpack sims from binary
-                        data["sims"] = np.frombuffer(
-                            data["sims"],
-                            dtype=np.float32,
-                        ).reshape(len(sentences_a), len(sentences_b))
-                        # filling nan
-                        data = np.nan_to_num(data)
-                    else:
-                        data = json.loads(resp.data)
-                    return data
-                else:
-                    raise RuntimeError(f"Exception: {resp.text}")
-            except Exception as e:
-                self.logger.error(
-                    f"Error in encoder to {self.url}, retried {i} times: {e}",
-                    exc_info=True,
-                )
+        if use_msgpack:
+            data = msgpack.unpackb(content, raw=False)
+            # unpack sims from binary
+            data["sims"] = np.frombuffer(
+                data["sims"],
+                dtype=np.float32,
+            ).reshape(len(sentences_a), len(sentences_b))
+            # filling nan
+            data = np.nan_to_num(data)
+        else:
+            data = json.loads(content)
+        return data
 
     def __call__(self, sentences_a: List[str], sentences_b: List[str] = None, **kwargs):
         if len(sentences_a) == 0:
@@ -2,43 +2,64 @@ import json
 import logging
 import re
 
-from nlm_utils.model_client.connection_pool import connection_pool
 from nlm_utils.model_client.nlp_client import NlpClient
+from nlm_utils.model_client.request_body import check_request_encoding
+from nlm_utils.model_client.request_body import encode_request
+from nlm_utils.model_client.transport import default_transport
 from nlm_utils.utils.answer_type import answer_type_map
 
 # Flan Prompt Reference is available here: https://github.com/google-research/FLAN/blob/main/flan/templates.py
 
 
 class FlanT5Client:
+    nlp_client_class = NlpClient
+
     def __init__(
         self,
         url: str = None,
+        request_encoding: str = "json",
+        request_compression: str = None,
+        transport=None,
     ):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.logger.setLevel(logging.INFO)
         self.url = url
         self.debug = False
-        self.nlp_client = NlpClient(url=url)
+        check_request_encoding(request_encoding, request_compression)
+        self.request_encoding = request_encoding
+        self.request_compression = request_compression
+        self.transport = transport or default_transport
+        self.nlp_client = self.nlp_client_class(
+            url=url,
+            request_encoding=request_encoding,
+            request_compression=request_compression,
+            transport=self.transport,
+        )
 
     def set_debug_flag(self, debug_flag):
         self.debug = debug_flag
 
     def call_flan_t5(self, prompts, max_length=120):
         url = f"{self.url}/flan-t5/infer"
-        headers = {
-            "Accept-Encoding": "gzip, deflate",
-            "Accept": "*/*",
-            "Content-Type": "application/json",
-        }
-        req_data = {"prompts": prompts, "max_length": max_length}
-        req_data = json.dumps(req_data).encode("utf-8")
-        resp = connection_pool.request("POST", url, body=req_data, headers=headers)
-        result = json.loads(resp.data)
+        req_data, headers = self._encode_request(prompts, max_length)
+        content = self.transport.request("POST", url, body=req_data, headers=headers)
+        result = json.loads(content)
         return result
 
+    def _encode_request(self, prompts, max_length):
+        req_data = {"prompts": prompts, "max_length": max_length}
+        return encode_request(
+            req_data,
+            self.request_encoding,
+            self.request_compression,
+        )
+
     def qa_type(self, questions):
         prompts = FlanT5Client.get_qa_type_prompts(questions)
         result = self.call_flan_t5(prompts, max_length=20)
+        return self._qa_type_output(result)
+
+    def _qa_type_output(self, result):
         predictions = []
         for pred in result["outputs"]:
             if pred.strip() != "":
@@ -52,6 +73,9 @@ class FlanT5Client:
         if self.debug:
             self.logger.info(f"BOOLQ Message Prompts are : {prompts}")
         result = self.call_flan_t5(prompts, max_length=500)
+        return self._boolq_output(result, **kwargs)
+
+    def _boolq_output(self, result, **kwargs):
         if self.debug:
             self.logger.info(f"FlanT5Client BOOLQ Results are : {result}")
             # look at "outputs" key in result, convert yes to "True" and no to "False" and anything else to "Neutral"
@@ -94,6 +118,9 @@ class FlanT5Client:
         if self.debug:
             self.logger.info(f"QA Message Prompts are : {prompts}")
         result = self.call_flan_t5(prompts, max_length=500)
+        return self._qa_output(result)
+
+    def _qa_output(self, result):
         if self.debug:
             self.logger.info(f"FlanT5Client QA Results are : {result}")
         answers = {}
@@ -109,13 +136,17 @@ class FlanT5Client:
         return {"answers": [answers, {}]}
 
     def get_mnli_prompts(self, questions, sentences):
-        prompts = []
         # get unique questions
         uniq_questions = list(set(questions))
         uniq_hypotheses = self.nlp_client(
             texts=uniq_questions,
             option="convert_question_to_sentence",
         )
+        return self._mnli_prompts(questions, sentences, uniq_questions, uniq_hypotheses)
+
+    @staticmethod
+    def _mnli_prompts(questions, sentences, uniq_questions, uniq_hypotheses):
+        prompts = []
         # create map with key as question and value as hypothesis
         question_hypothesis_map = dict(zip(uniq_questions, uniq_hypotheses))
         hypotheses = []
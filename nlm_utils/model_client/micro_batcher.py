@@ -0,0 +1,157 @@
+import threading
+
+import numpy as np
+
+
+class _Batch:
+    def __init__(self):
+        self.items = []
+        self.size = 0
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Gathers concurrent calls with the same key for up to max_wait seconds, or
+    until max_batch_size items, and sends them as one request. A call which
+    does not fit into the open batch closes it and starts the next one.
+
+    The first caller of a batch waits, then sends the whole batch with its
+    send function, send([item, ...]) -> [result, ...]. The other callers wait
+    for their result. A call larger than max_batch_size is sent alone.
+    """
+
+    def __init__(self, max_batch_size: int = 64, max_wait: float = 0.005):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._batches = {}
+        self._lock = threading.Lock()
+        self.n_calls = 0
+        self.n_batches = 0
+
+    def submit(self, key, item, size, send):
+        if size >= self.max_batch_size:
+            # fills a batch on its own
+            with self._lock:
+                self.n_calls += 1
+                self.n_batches += 1
+            return send([item])[0]
+
+        with self._lock:
+            self.n_calls += 1
+            batch = self._batches.get(key)
+            if batch is not None and batch.size + size > self.max_batch_size:
+                # does not fit, the open batch is sent as is
+                del self._batches[key]
+                batch.full.set()
+                batch = None
+            leader = batch is None
+            if leader:
+                batch = self._batches[key] = _Batch()
+            idx = len(batch.items)
+            batch.items.append(item)
+            batch.size += size
+            if batch.size >= self.max_batch_size:
+                # later calls start a new batch
+                del self._batches[key]
+                batch.full.set()
+
+        if not leader:
+            batch.done.wait()
+        else:
+            batch.full.wait(self.max_wait)
+            with self._lock:
+                if self._batches.get(key) is batch:
+                    del self._batches[key]
+                self.n_batches += 1
+            try:
+                batch.results = send(batch.items)
+            except Exception as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[idx]
+
+
+# {(key, max_batch_size, max_wait): MicroBatcher} shared by all clients
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(key, max_batch_size: int = 64, max_wait: float = 0.005):
+    """
+    The batcher shared by the clients of key (e.g. the url of the endpoint)
+    with the same max_batch_size and max_wait.
+    """
+    batcher_key = (key, max_batch_size, max_wait)
+    with _batchers_lock:
+        if batcher_key not in _batchers:
+            _batchers[batcher_key] = MicroBatcher(max_batch_size, max_wait)
+        return _batchers[batcher_key]
+
+
+def merge_requests(req_datas, fields):
+    """
+    One request with the list fields of all req_datas concatenated.
+    """
+    req_data = dict(req_datas[0])
+    for field in fields:
+        if field in req_data:
+            req_data[field] = [
+                value for other_req_data in req_datas for value in other_req_data[field]
+            ]
+    return req_data
+
+
+def _split_value(value, ranges, total):
+    # lists of one entry per item, flat arrays of a fixed number of entries per item,
+    # dicts keyed by item index; other values are given to every caller
+    if isinstance(value, np.ndarray) and value.ndim and len(value) % total == 0:
+        k = len(value) // total
+        return [value[start * k : end * k] for start, end in ranges]
+    if isinstance(value, list) and len(value) == total:
+        return [value[start:end] for start, end in ranges]
+    if isinstance(value, dict) and value and all(key.isdigit() for key in value):
+        return [
+            {
+                str(int(key) - start): item
+                for key, item in value.items()
+                if start <= int(key) < end
+            }
+            for start, end in ranges
+        ]
+    return [value] * len(ranges)
+
+
+def split_response(response, sizes, fields):
+    """
+    Split the response of a merged request into one response per request of
+    sizes[i] items. Only the fields with one entry per item are split, the
+    other fields are given to every request.
+    """
+    ranges = []
+    start = 0
+    for size in sizes:
+        ranges.append((start, start + size))
+        start += size
+    total = start
+
+    responses = [{} for _ in sizes]
+    for key, value in response.items():
+        if key not in fields:
+            values = [value] * len(sizes)
+        elif key == "answers" and isinstance(value, list):
+            # [{item index: answer}, ...]
+            values = zip(*[_split_value(item, ranges, total) for item in value])
+            values = [list(answers) for answers in values] or [[] for _ in sizes]
+        else:
+            values = _split_value(value, ranges, total)
+        for split, split_value in zip(responses, values):
+            split[key] = split_value
+    return responses
@@ -4,6 +4,10 @@ from timeit import default_timer
 from typing import List
 
 from nlm_utils.model_client.connection_pool import connection_pool
+from nlm_utils.model_client.request_body import check_request_encoding
+from nlm_utils.model_client.request_body import encode_request
+from nlm_utils.model_client.transport import default_transport
+from nlm_utils.model_client.transport import TransportError
 
 
 class NlpClient:
@@ -11,6 +15,9 @@ class NlpClient:
         self,
         url: str = None,
         model: str = "nlp",
+        request_encoding: str = "json",
+        request_compression: str = None,
+        transport=None,
     ):
         """
         This is a client to interact with the nlp_server
@@ -20,6 +27,10 @@ class NlpClient:
         self.logger.setLevel(logging.INFO)
 
         self.connection = connection_pool
+        self.transport = transport or default_transport
+        check_request_encoding(request_encoding, request_compression)
+        self.request_encoding = request_encoding
+        self.request_compression = request_compression
 
         self.url = f"{url}/{model}"
 
@@ -27,38 +38,38 @@ class NlpClient:
     def __call__(self, texts: List[str], option: str, domain: str = "", **kwargs):
         self.logger.info(f"Running NLP server with option {option}.. domain {domain}")
         wall_time = default_timer()
-
-        req_data = {
-            "option": option,
-            "texts": texts,
-        }
-        if domain:
-            req_data["domain"] = domain
-        req_data = json.dumps(req_data).encode("utf-8")
+        req_data, headers = self._encode_request(texts, option, domain)
 
         try:
-            resp = self.connection.request(
+            content = self.transport.request(
                 "POST",
                 self.url,
                 body=req_data,
-                headers={
-                    "Accept-Encoding": "gzip, deflate",
-                    "Accept": "*/*",
-                    "Content-Type": "application/json",
-                },
+                headers=headers,
             )
+        except TransportError as e:
+            self.logger.error(e)
+            return [] * len(texts)
+        return self._parse_response(content, wall_time)
 
-            if resp.status == 200:
-                results = json.loads(resp.data)["data"]
-                wall_time = (default_timer() - wall_time) * 1000
+    def _encode_request(self, texts, option, domain):
+        req_data = {
+            "option": option,
+            "texts": texts,
+        }
+        if domain:
+            req_data["domain"] = domain
+        return encode_request(
+            req_data,
+            self.request_encoding,
+            self.request_compression,
+        )
 
-                self.logger.info(
-                    f"Extracting Entities for {len(results)} lines. Wall time: {wall_time:.2f}ms",
-                )
-            else:
-                raise RuntimeError(f"Exception when query {self.url}: {resp.text},")
-        except Exception as e:
-            self.logger.error(e)
-            results = [] * len(texts)
+    def _parse_response(self, content, wall_time):
+        results = json.loads(content)["data"]
+        wall_time = (default_timer() - wall_time) * 1000
 
+        self.logger.info(
+            f"Extracting Entities for {len(results)} lines. Wall time: {wall_time:.2f}ms",
+        )
         return results
@@ -0,0 +1,61 @@
+import gzip
+import json
+
+import msgpack
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# request bodies can be sent as json (default) or msgpack, optionally compressed,
+# the model server picks the decoder from the Content-Type and Content-Encoding
+CONTENT_TYPES = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+}
+COMPRESSIONS = ("gzip", "zstd")
+
+
+def check_request_encoding(encoding: str = "json", compression: str = None):
+    if encoding not in CONTENT_TYPES:
+        raise ValueError(
+            f"Unknown request encoding {encoding}, please choose from {list(CONTENT_TYPES)}",
+        )
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(
+            f"Unknown request compression {compression}, please choose from {list(COMPRESSIONS)}",
+        )
+    if compression == "zstd" and zstandard is None:
+        raise ImportError("Please install `zstandard` to compress requests with zstd")
+
+
+def encode_request(
+    req_data,
+    encoding: str = "json",
+    compression: str = None,
+    level: int = None,
+):
+    """
+    Serialize req_data for a POST/PUT to a model server.
+    Returns the body and the headers describing it.
+    """
+    if encoding == "msgpack":
+        body = msgpack.packb(req_data, use_bin_type=True)
+    else:
+        body = json.dumps(req_data).encode("utf-8")
+
+    headers = {
+        "Accept-Encoding": "gzip, deflate",
+        "Accept": "*/*",
+        "Content-Type": CONTENT_TYPES[encoding],
+    }
+
+    if compression == "zstd":
+        body = zstandard.ZstdCompressor(level=level or 3).compress(body)
+        headers["Content-Encoding"] = "zstd"
+    elif compression == "gzip":
+        body = gzip.compress(body, compresslevel=level or 6)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
@@ -0,0 +1,45 @@
+import asyncio
+
+import aiohttp
+
+# aiohttp sessions are bound to their event loop, one session per loop
+_sessions = {}
+_connector_kwargs = {
+    "limit": 100,
+    "limit_per_host": 0,
+    "keepalive_timeout": 60,
+}
+
+
+def configure_sessions(**connector_kwargs):
+    """
+    Settings of aiohttp.TCPConnector for the sessions created from now on,
+    e.g. limit (connections in total), limit_per_host and keepalive_timeout.
+    """
+    _connector_kwargs.update(connector_kwargs)
+
+
+def get_session():
+    """
+    The aiohttp session shared by the async model clients on the running loop.
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        # forget the sessions of closed loops, e.g. after asyncio.run
+        for other_loop in [other for other in _sessions if other.is_closed()]:
+            del _sessions[other_loop]
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(**_connector_kwargs),
+        )
+        _sessions[loop] = session
+    return session
+
+
+async def close_session():
+    """
+    Close the shared session of the running loop, e.g. on shutdown.
+    """
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
@@ -0,0 +1,437 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from timeit import default_timer
+
+import aiohttp
+import urllib3
+
+from nlm_utils.model_client.connection_pool import get_pool
+
+# statuses worth retrying, other errors are raised to the caller at once
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TransportError(RuntimeError):
+    def __init__(self, message, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(TransportError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures, requests are then
+    refused for reset_timeout seconds. After that a single request is let
+    through (half-open), its result closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half-open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def cancel(self):
+        # the request was abandoned, it tells nothing about the endpoint
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class LatencyWindow:
+    """
+    Latencies of the last `size` successful requests to one endpoint.
+    """
+
+    def __init__(self, size: int = 100):
+        self._latencies = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._latencies)
+
+    def add(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def quantile(self, q):
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+
+class Transport:
+    """
+    Sends requests to the model servers through the pool of their endpoint
+    (see connection_pool.configure_pool), or through connection, with connect
+    and read timeouts, retries with exponential backoff and full jitter, and a
+    circuit breaker per endpoint. A request can be given a list of replica
+    urls, retries go to the next replica whose circuit is not open.
+
+    With hedge=True, a duplicate request is sent to the next replica once the
+    first one takes longer than the hedge_quantile latency of its endpoint,
+    the first successful response is returned. Requests are not hedged when
+    no other replica is available.
+    """
+
+    def __init__(
+        self,
+        retry: int = 5,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 600.0,
+        backoff: float = 0.1,
+        max_backoff: float = 10.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        hedge_workers: int = 32,
+        connection=None,
+    ):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.logger.setLevel(logging.INFO)
+        self.retry = retry
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.timeout = urllib3.Timeout(connect=connect_timeout, read=read_timeout)
+        # sleep uniform(0, min(max_backoff, backoff * 2 ** attempt)) between retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # hedging starts once hedge_min_samples latencies of the endpoint are known
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_workers = hedge_workers
+        self.connection = connection
+
+        self._breakers = {}
+        self._latencies = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self.n_hedged = 0
+
+    def breaker(self, url):
+        breaker = self._breakers.get(url)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(
+                    url,
+                    CircuitBreaker(self.failure_threshold, self.reset_timeout),
+                )
+        return breaker
+
+    def latency(self, url):
+        latency = self._latencies.get(url)
+        if latency is None:
+            with self._lock:
+                latency = self._latencies.setdefault(url, LatencyWindow())
+        return latency
+
+    def stats(self):
+        """
+        Circuit state, p95 latency (seconds) and failures of each endpoint.
+        """
+        return {
+            url: {
+                "state": breaker.state,
+                "failures": breaker.failures,
+                "p95": self.latency(url).quantile(0.95),
+            }
+            for url, breaker in list(self._breakers.items())
+        }
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def _pick(self, urls, attempt):
+        # (url, hedge url) starting at urls[attempt], skipping open circuits,
+        # the hedge url is None without another replica available
+        available = [
+            urls[(attempt + i) % len(urls)]
+            for i in range(len(urls))
+            if self.breaker(urls[(attempt + i) % len(urls)]).state != "open"
+        ]
+        if not available:
+            return None, None
+        return available[0], available[1] if len(available) > 1 else None
+
+    def _hedge_delay(self, url):
+        latency = self.latency(url)
+        if len(latency) < self.hedge_min_samples:
+            return None
+        return latency.quantile(self.hedge_quantile)
+
+    def _check(self, method, url, status, content, start):
+        breaker = self.breaker(url)
+        if status == 200:
+            breaker.record_success()
+            self.latency(url).add(default_timer() - start)
+            return content
+        if status in RETRY_STATUSES:
+            breaker.record_failure()
+        else:
+            # the server is up, the request is wrong
+            breaker.record_success()
+        raise TransportError(
+            f"{method} {url} returned {status}: {content[:200]!r}",
+            status=status,
+        )
+
+    def _send(self, method, url, body, headers):
+        if not self.breaker(url).allow():
+            raise CircuitOpenError(f"Circuit open for {url}")
+        start = default_timer()
+        try:
+            resp = (self.connection or get_pool(url)).request(
+                method,
+                url,
+                body=body,
+                headers=headers,
+                timeout=self.timeout,
+                retries=False,
+            )
+        except Exception as e:
+            self.breaker(url).record_failure()
+            raise TransportError(f"{method} {url} failed: {e!r}") from e
+        return self._check(method, url, resp.status, resp.data, start)
+
+    def _send_hedged(self, method, url, hedge_url, body, headers):
+        delay = self._hedge_delay(url)
+        if delay is None:
+            return self._send(method, url, body, headers)
+
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.hedge_workers,
+                        thread_name_prefix=self.__class__.__name__,
+                    )
+        first = self._executor.submit(self._send, method, url, body, headers)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        self.logger.info(f"Hedging {method} {url} to {hedge_url} after {delay:.3f}s")
+        self.n_hedged += 1
+        # the slower request can not be cancelled, it finishes in the background
+        pending = {
+            first,
+            self._executor.submit(self._send, method, hedge_url, body, headers),
+        }
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except TransportError as e:
+                    error = e
+        raise error
+
+    def _should_retry(self, error, attempt, retry, method, url):
+        if error.status is not None and error.status not in RETRY_STATUSES:
+            return False
+        self.logger.warning(
+            f"{method} {url} failed, attempt {attempt + 1} of {retry}: {error}",
+        )
+        return attempt + 1 < retry
+
+    def request(
+        self,
+        method: str,
+        urls,
+        body=None,
+        headers=None,
+        retry: int = None,
+        hedge: bool = None,
+    ):
+        """
+        Send the request to urls (one url or a list of replicas), returns the
+        content of the first 200 response. Raises TransportError once all
+        retries failed, or CircuitOpenError when every circuit is open or the
+        only endpoint left is being probed by another request.
+        """
+        urls = [urls] if isinstance(urls, str) else list(urls)
+        # retry=0 sends the request once, like retry=1
+        retry = max(1, self.retry if retry is None else retry)
+        hedge = self.hedge if hedge is None else hedge
+
+        error = None
+        for attempt in range(retry):
+            url, hedge_url = self._pick(urls, attempt)
+            if url is None:
+                raise CircuitOpenError(f"Circuit open for {urls}")
+            try:
+                if hedge and hedge_url is not None:
+                    return self._send_hedged(method, url, hedge_url, body, headers)
+                return self._send(method, url, body, headers)
+            except CircuitOpenError as e:
+                # another thread is probing the endpoint, go to the next replica
+                if hedge_url is None:
+                    raise
+                error = e
+            except TransportError as e:
+                error = e
+                if not self._should_retry(e, attempt, retry, method, url):
+                    break
+                time.sleep(self._backoff(attempt))
+        raise error
+
+    async def _asend(self, session, method, url, body, headers):
+        if not self.breaker(url).allow():
+            raise CircuitOpenError(f"Circuit open for {url}")
+        start = default_timer()
+        try:
+            async with session.request(
+                method,
+                url,
+                data=body,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=self.connect_timeout,
+                    sock_read=self.read_timeout,
+                ),
+            ) as resp:
+                status = resp.status
+                content = await resp.read()
+        except asyncio.CancelledError:
+            # the other hedged request won
+            self.breaker(url).cancel()
+            raise
+        except Exception as e:
+            self.breaker(url).record_failure()
+            raise TransportError(f"{method} {url} failed: {e!r}") from e
+        return self._check(method, url, status, content, start)
+
+    async def _asend_hedged(self, session, method, url, hedge_url, body, headers):
+        delay = self._hedge_delay(url)
+        if delay is None:
+            return await self._asend(session, method, url, body, headers)
+
+        first = asyncio.ensure_future(
+            self._asend(session, method, url, body, headers),
+        )
+        done, _ = await asyncio.wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        self.logger.info(f"Hedging {method} {url} to {hedge_url} after {delay:.3f}s")
+        self.n_hedged += 1
+        pending = {
+            first,
+            asyncio.ensure_future(
+                self._asend(session, method, hedge_url, body, headers),
+            ),
+        }
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for future in done:
+                    try:
+                        return future.result()
+                    except TransportError as e:
+                        error = e
+        finally:
+            for future in pending:
+                future.cancel()
+        raise error
+
+    async def arequest(
+        self,
+        session,
+        method: str,
+        urls,
+        body=None,
+        headers=None,
+        retry: int = None,
+        hedge: bool = None,
+    ):
+        """
+        asyncio version of request, sent with the aiohttp session.
+        """
+        urls = [urls] if isinstance(urls, str) else list(urls)
+        # retry=0 sends the request once, like retry=1
+        retry = max(1, self.retry if retry is None else retry)
+        hedge = self.hedge if hedge is None else hedge
+
+        error = None
+        for attempt in range(retry):
+            url, hedge_url = self._pick(urls, attempt)
+            if url is None:
+                raise CircuitOpenError(f"Circuit open for {urls}")
+            try:
+                if hedge and hedge_url is not None:
+                    return await self._asend_hedged(
+                        session,
+                        method,
+                        url,
+                        hedge_url,
+                        body,
+                        headers,
+                    )
+                return await self._asend(session, method, url, body, headers)
+            except CircuitOpenError as e:
+                if hedge_url is None:
+                    raise
+                error = e
+            except TransportError as e:
+                error = e
+                if not self._should_retry(e, attempt, retry, method, url):
+                    break
+                await asyncio.sleep(self._backoff(attempt))
+        raise error
+
+
+# shared by all model clients, so the circuit of an endpoint is shared too
+default_transport = Transport()
@@ -3,6 +3,7 @@ import logging
 from timeit import default_timer
 
 from nlm_utils.model_client.connection_pool import connection_pool
+from nlm_utils.model_client.transport import default_transport
 
 
 def get_iou(bb1, bb2):
@@ -48,6 +49,7 @@ class YoloClient:
     def __init__(
         self,
         url="http://18.222.177.211",
+        transport=None,
     ):
         """
         This is a client to interact with the nlp_server
@@ -57,6 +59,7 @@ class YoloClient:
         self.logger.setLevel(logging.INFO)
 
         self.connection = connection_pool
+        self.transport = transport or default_transport
 
         self.url = f"{url}/yolo"
 
@@ -79,7 +82,7 @@ class YoloClient:
         #         "Content-Type": "application/json",
         #     },
         # )
-        resp = self.connection.request(
+        content = self.transport.request(
             "POST",
             self.url,
             body=json.dumps(req_data),
@@ -90,18 +93,18 @@ class YoloClient:
             },
         )
 
-        if resp.status == 200:
-            results = json.loads(resp.data)
-            wall_time = (default_timer() - wall_time) * 1000
-
-            self.logger.info(
-                f"Yolo finished on {len(results)} pages. Wall time: {wall_time:.2f}ms",
-            )
-        else:
-            raise RuntimeError(f"Exception when query {self.url}: {resp},")
         # except Exception as e:
         #     self.logger.error(e)
         #     # results = [] * len(texts)
+        return self._parse_response(content, wall_time)
+
+    def _parse_response(self, content, wall_time):
+        results = json.loads(content)
+        wall_time = (default_timer() - wall_time) * 1000
+
+        self.logger.info(
+            f"Yolo finished on {len(results)} pages. Wall time: {wall_time:.2f}ms",
+        )
         return results
 
     def active_learning(self, train_samples):
@@ -110,7 +113,8 @@ class YoloClient:
 
         req_data = {"active_learn_samples": train_samples}
 
-        resp = self.connection.request(
+        # active learning is not idempotent, it is neither retried nor hedged
+        content = self.transport.request(
             "POST",
             self.url,
             body=json.dumps(req_data),
@@ -119,16 +123,15 @@ class YoloClient:
                 "Accept": "*/*",
                 "Content-Type": "application/json",
             },
+            retry=1,
+            hedge=False,
+        )
+        results = json.loads(content)
+        wall_time = (default_timer() - wall_time) * 1000
+
+        self.logger.info(
+            f"Yolo finished on {len(results)} pages. Wall time: {wall_time:.2f}ms",
         )
-        if resp.status == 200:
-            results = json.loads(resp.data)
-            wall_time = (default_timer() - wall_time) * 1000
-
-            self.logger.info(
-                f"Yolo finished on {len(results)} pages. Wall time: {wall_time:.2f}ms",
-            )
-        else:
-            raise RuntimeError(f"Exception when query {self.url}: {resp},")
 
     def get_accuracy(self, test_samples):
         overall_iou = 0
@@ -9,7 +9,9 @@ from .utils import ensure_bool
 from .utils import ensure_float
 from .utils import ensure_integer
 from .utils import normalize_embeddings
+from .utils import normalize_embeddings_array
 from .utils import num_tokens_from_string
+from .utils import quantize_embeddings
 
 
 __all__ = (
@@ -19,6 +21,8 @@ __all__ = (
     "STOPWORDS",
     "AsyncHttpClient",
     "normalize_embeddings",
+    "normalize_embeddings_array",
+    "quantize_embeddings",
     "ensure_bool",
     "ensure_float",
     "ensure_integer",
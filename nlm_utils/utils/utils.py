@@ -7,29 +7,71 @@ oai_tokenizer = tiktoken.get_encoding(
 
 
 def normalize_embeddings(X):
+    # list-returning form, kept for compatibility: floats rounded to 8 digits
     # convert list to numpy
     if isinstance(X, list):
         if not X:
             return X
         X = np.array(X)
 
-    # check dimension
-    is_1_dim = X.ndim == 1
-    if is_1_dim:
-        X = X.reshape(1, -1)
-
-    # normalize
-    if len(X):
-        norms = np.einsum("ij,ij->i", X, X)
-        norms = np.sqrt(norms)
-        # add epsilon to avoid division by 0
-        X /= norms[:, np.newaxis] + 1e-10
-    if is_1_dim:
-        return [round(x, 8) for x in X[0].tolist()]
+    X = normalize_embeddings_array(X)
+    if X.ndim == 1:
+        return [round(x, 8) for x in X.tolist()]
     else:
         return [[round(y, 8) for y in x] for x in X.tolist()]
 
 
+def normalize_embeddings_array(X, out=None, dtype=None, chunk_size: int = 65536):
+    """
+    L2-normalize the rows of X and return the array, without going through
+    python lists.
+
+    X is normalized in place when it is a float array of the requested dtype
+    (the input dtype by default), lists and other arrays are converted to dtype
+    (float32 by default). With out, the result is written to out and X is left
+    untouched. Rows are processed chunk_size at a time to bound peak memory.
+    """
+    if not isinstance(X, np.ndarray) or (dtype is not None and X.dtype != dtype):
+        X = np.asarray(X, dtype=dtype or np.float32)
+    elif not np.issubdtype(X.dtype, np.floating):
+        X = X.astype(np.float32)
+    if out is None:
+        out = X
+    elif out.shape != X.shape:
+        raise ValueError(f"out has shape {out.shape}, expected {X.shape}")
+
+    rows = X.reshape(1, -1) if X.ndim == 1 else X
+    out_rows = out.reshape(1, -1) if out.ndim == 1 else out
+    # accumulate the norms of half precision embeddings in float32
+    norm_dtype = np.promote_types(X.dtype, np.float32)
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start : start + chunk_size]
+        norms = np.sqrt(np.einsum("ij,ij->i", chunk, chunk, dtype=norm_dtype))
+        # add epsilon to avoid division by 0
+        norms += 1e-10
+        np.divide(
+            chunk,
+            norms[:, np.newaxis],
+            out=out_rows[start : start + chunk_size],
+            casting="unsafe",
+        )
+    return out
+
+
+def quantize_embeddings(X, dtype):
+    """
+    Convert normalized embeddings to float16, or to int8 scaled by 127.
+    int8 expects values in [-1, 1], e.g. after normalization.
+    """
+    if dtype == "float16":
+        return X.astype(np.float16)
+    if dtype == "int8":
+        return np.rint(np.clip(X, -1.0, 1.0) * 127).astype(np.int8)
+    if dtype == "float32":
+        return X.astype(np.float32, copy=False)
+    raise ValueError(f"Unknown embedding dtype {dtype}")
+
+
 def ensure_bool(value):
     if isinstance(value, bool):
         return value
@@ -23,13 +23,18 @@ setup(
         "numpy==1.24.4",
         "openai",
         "pymongo==3.11.4",
-        "redis==3.5.3",
+        "redis==4.6.0",
         "tiktoken",
         "urllib3==1.26.6",
         "xxhash==2.0.2",
         "python-magic==0.4.22",
         "dicttoxml"
     ],
+    extras_require={
+        "compression": ["zstandard", "lz4"],
+        "async": ["motor"],
+        "http2": ["httpx[http2]"],
+    },
     classifiers=[
         'Development Status :: 5 - Production/Stable',
         'Development Status :: 1 - Planning',
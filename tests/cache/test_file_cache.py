@@ -1,4 +1,11 @@
+import asyncio
+import os
+from time import sleep
+from time import time
+
 from nlm_utils.cache import Cache
+from nlm_utils.cache import FileAgent
+from nlm_utils.cache.file_agent import TMP_PREFIX
 
 
 class DummyObject:
@@ -124,3 +131,143 @@ class TestCache:
         assert function1(obj, cache_key="cache_key").uid == obj.uid
 
         # cache.reset()
+
+    def test_batch_cache(self):
+
+        cache = Cache("FileAgent", path=".cache")
+        assert cache.connected
+
+        calls = []
+
+        @cache.batch
+        def function1(items, power=1):
+            calls.append(list(items))
+            return [item**power for item in items]
+
+        cache.reset()
+
+        assert function1([1, 2, 3]) == [1, 2, 3]
+        assert function1([2, 3, 4]) == [2, 3, 4]
+        assert calls == [[1, 2, 3], [4]]
+
+        assert function1([2, 3], power=2) == [4, 9]
+        assert calls[-1] == [2, 3]
+
+        assert function1([1, 4], overwrite=True) == [1, 4]
+        assert calls[-1] == [1, 4]
+
+    def test_read_write_many(self):
+
+        cache = Cache("FileAgent", path=".cache")
+        assert cache.connected
+
+        cache.reset()
+
+        cache.write_many_cache([1, "a"], ["key1", "key2"])
+        assert cache.read_many_cache(["key1", "key3", "key2"]) == [
+            (True, 1),
+            (False, None),
+            (True, "a"),
+        ]
+
+        cache.delete_many_cache(["key1", "key2"])
+        assert cache.read_many_cache(["key1", "key2"]) == [(False, None), (False, None)]
+
+    def test_async_cache(self):
+
+        cache = Cache("AsyncFileAgent", path=".cache")
+        assert cache.connected
+
+        cache.reset()
+
+        @cache
+        async def function1(a, b=1):
+            await asyncio.sleep(0.01)
+            return a + b
+
+        async def main():
+            assert await function1(1) == 2
+            status, data, cache_key = await cache.aread_cache(function1, 1)
+            assert status and data == 2
+
+            await cache.awrite_many_cache([1, "a"], ["key1", "key2"])
+            assert await cache.aread_many_cache(["key1", "key3", "key2"]) == [
+                (True, 1),
+                (False, None),
+                (True, "a"),
+            ]
+            await cache.adelete_many_cache(["key1", "key2"])
+            assert await cache.aread_many_cache(["key1"]) == [(False, None)]
+
+        asyncio.run(main())
+
+
+class TestFileAgent:
+    def test_sharded_layout(self):
+        agent = FileAgent(path=".cache", collection="sharded", shard_depth=2)
+        agent.connect()
+        agent.reset()
+
+        agent.write(b"data", "cache_key")
+        file_name = agent._get_file_name("cache_key")
+        assert file_name.exists()
+        assert file_name.relative_to(agent.filepath).parts[-1] == "cache_key"
+        assert len(file_name.relative_to(agent.filepath).parts) == 3
+
+        assert agent.read("cache_key") == (True, b"data")
+        agent.delete("cache_key")
+        agent.delete("cache_key")
+        assert agent.read("cache_key") == (False, None)
+
+    def test_mmap_read(self):
+        agent = FileAgent(path=".cache", collection="mmap", mmap_threshold=16)
+        cache = Cache(agent)
+        assert cache.connected
+
+        cache.reset()
+
+        agent.write(b"x" * 32, "large")
+        agent.write(b"x" * 8, "small")
+        status, data = agent.read("large")
+        assert status and isinstance(data, memoryview)
+        assert bytes(data) == b"x" * 32
+        assert agent.read("small") == (True, b"x" * 8)
+
+        cache.write_cache(list(range(100)), "cache_key")
+        assert cache.read_many_cache(["cache_key"]) == [(True, list(range(100)))]
+
+    def test_eviction(self):
+        agent = FileAgent(path=".cache", collection="eviction", max_bytes=100)
+        agent.connect()
+        agent.reset()
+
+        for i in range(10):
+            agent.write(b"x" * 20, f"key{i}")
+            sleep(0.01)
+
+        assert agent.read("key0") == (False, None)
+        assert agent.read("key9") == (True, b"x" * 20)
+        assert sum(size for _, size, _ in agent._scan()) <= 100
+
+    def test_eviction_sweeps_tmp_files(self):
+        agent = FileAgent(
+            path=".cache",
+            collection="sweep",
+            max_bytes=100,
+            tmp_max_age=60,
+        )
+        agent.connect()
+        agent.reset()
+
+        # left behind by writers which crashed before the rename
+        old_tmp = agent.filepath.joinpath(f"{TMP_PREFIX}old")
+        old_tmp.write_bytes(b"x" * 20)
+        os.utime(old_tmp, (time() - 120, time() - 120))
+        new_tmp = agent.filepath.joinpath(f"{TMP_PREFIX}new")
+        new_tmp.write_bytes(b"x" * 20)
+
+        for i in range(10):
+            agent.write(b"x" * 20, f"key{i}")
+        assert not old_tmp.exists()
+        # may still be written by another process
+        assert new_tmp.exists()
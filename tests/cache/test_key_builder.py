@@ -0,0 +1,122 @@
+import numpy as np
+
+from nlm_utils.cache import Cache
+from nlm_utils.cache.key_builder import build_cache_key
+from nlm_utils.cache.key_builder import key_memo_scope
+
+
+class DummyObject:
+    uid = 12345
+
+
+class Item:
+    # default repr holds the id of the object
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+
+def test_build_cache_key():
+    assert build_cache_key(("func", "text"), {}) == build_cache_key(
+        ("func", "text"),
+        {},
+    )
+    assert build_cache_key(("func", "text"), {}) != build_cache_key(
+        ("func", "text2"),
+        {},
+    )
+    # kwargs order does not matter, reserved kwargs are ignored
+    assert build_cache_key(("func",), {"a": 1, "b": 2}) == build_cache_key(
+        ("func",),
+        {"b": 2, "a": 1, "overwrite": True},
+    )
+    # numpy arrays are hashed by content
+    a = np.arange(10, dtype=np.float32)
+    assert build_cache_key(("func", a), {}) == build_cache_key(("func", a.copy()), {})
+    assert build_cache_key(("func", a), {}) != build_cache_key(("func", a + 1), {})
+    assert build_cache_key(("func", a), {}) != build_cache_key(
+        ("func", a.astype(np.float64)),
+        {},
+    )
+    # large arguments and lists of sentences
+    document = "word " * 100000
+    assert build_cache_key(("func", document), {}) != build_cache_key(
+        ("func", document + "."),
+        {},
+    )
+    assert build_cache_key(("func", ["ab", "c"]), {}) != build_cache_key(
+        ("func", ["a", "bc"]),
+        {},
+    )
+    # objects are replaced by class name
+    assert build_cache_key((DummyObject(), "func"), {}) == build_cache_key(
+        (DummyObject(), "func"),
+        {},
+    )
+
+    # sets are hashed regardless of iteration order and repr
+    assert build_cache_key(("func", {"a", "b", "c"}), {}) == build_cache_key(
+        ("func", {"c", "b", "a"}),
+        {},
+    )
+    for _ in range(10):
+        assert build_cache_key(
+            ("func", [{Item(i) for i in range(20)}]),
+            {},
+        ) == build_cache_key(("func", [{Item(i) for i in reversed(range(20))}]), {})
+    assert build_cache_key(("func", [{Item(1)}]), {}) != build_cache_key(
+        ("func", [{Item(2)}]),
+        {},
+    )
+
+
+def test_key_memo_scope():
+    document = "word " * 100000
+    key = build_cache_key(("func", document), {})
+    with key_memo_scope():
+        assert build_cache_key(("func", document), {}) == key
+        assert build_cache_key(("func", document), {}) == key
+    assert build_cache_key(("func", document), {}) == key
+
+
+class TestCache:
+    def test_key_fields(self):
+
+        cache = Cache("MemoryAgent")
+        assert cache.connected
+
+        calls = []
+
+        @cache(key_fields=["question"])
+        def function1(question, passages, debug=False):
+            calls.append(question)
+            return question
+
+        cache.reset()
+
+        assert function1("question", ["passage"]) == "question"
+        assert function1("question", ["other passage"], debug=True) == "question"
+        assert function1(question="question2", passages=[]) == "question2"
+        assert calls == ["question", "question2"]
+
+    def test_pickle_key_builder(self):
+
+        cache = Cache("MemoryAgent", key_builder="pickle")
+        assert cache.connected
+
+        @cache
+        def function1(a):
+            return a
+
+        cache.reset()
+
+        assert function1(1) == 1
+        assert function1(1) == 1
+        assert cache.get_cache_key("function1", 1) == "e3d0ff6de27ff4ab"
+        # the original keys are kept by default
+        assert Cache("MemoryAgent").get_cache_key("function1", 1) == "e3d0ff6de27ff4ab"
@@ -1,4 +1,52 @@
+import asyncio
+from threading import Thread
+from time import sleep
+
+import numpy as np
+import pytest
+
 from nlm_utils.cache import Cache
+from nlm_utils.cache import MemoryAgent
+from nlm_utils.cache.base_agent import BaseAgent
+
+
+class DictAgent(BaseAgent):
+    # agent without hot_keys
+    __name__ = "DictAgent"
+
+    def connect(self):
+        self.data = {}
+        self.connected = True
+
+    def read(self, cache_key):
+        if cache_key in self.data:
+            return True, self.data[cache_key]
+        return False, None
+
+    def write(self, serilized_data, cache_key):
+        self.data[cache_key] = serilized_data
+
+    def delete(self, cache_key):
+        self.data.pop(cache_key, None)
+
+    def reset(self):
+        self.data = {}
+
+
+class LeaseAgent(MemoryAgent):
+    # the first lease is held by another process
+    def connect(self):
+        super().connect()
+        self.held = True
+
+    def acquire_lease(self, cache_key, ttl):
+        if self.held:
+            self.held = False
+            return None
+        return "lease"
+
+    def release_lease(self, cache_key, lease):
+        pass
 
 
 class TestCache:
@@ -51,3 +99,487 @@ class TestCache:
         assert function1(2, overwrite=False) == 2
         assert function1(2, overwrite=True) == 2
         assert function1(2) == 2
+
+    def test_batch_cache(self):
+
+        cache = Cache("MemoryAgent")
+        assert cache.connected
+
+        calls = []
+
+        @cache.batch
+        def function1(items, power=1):
+            calls.append(list(items))
+            return [item**power for item in items]
+
+        cache.reset()
+
+        assert function1([1, 2, 3]) == [1, 2, 3]
+        assert function1([2, 3, 4]) == [2, 3, 4]
+        assert calls == [[1, 2, 3], [4]]
+
+        assert function1([2, 3], power=2) == [4, 9]
+        assert calls[-1] == [2, 3]
+
+        assert function1([1, 4], overwrite=True) == [1, 4]
+        assert calls[-1] == [1, 4]
+
+    def test_batch_cache_output_length(self):
+
+        cache = Cache("MemoryAgent")
+        assert cache.connected
+
+        @cache.batch
+        def function1(items):
+            return items[:-1]
+
+        cache.reset()
+
+        with pytest.raises(ValueError):
+            function1([1, 2, 3])
+        # nothing is cached from the failed call
+        assert cache.read_many_cache(
+            [cache.get_cache_key("function1", item) for item in [1, 2]],
+        ) == [(False, None), (False, None)]
+
+    def test_read_write_many(self):
+
+        cache = Cache("MemoryAgent")
+        assert cache.connected
+
+        cache.reset()
+
+        cache.write_many_cache([1, "a"], ["key1", "key2"])
+        assert cache.read_many_cache(["key1", "key3", "key2"]) == [
+            (True, 1),
+            (False, None),
+            (True, "a"),
+        ]
+
+        cache.delete_many_cache(["key1", "key2"])
+        assert cache.read_many_cache(["key1", "key2"]) == [(False, None), (False, None)]
+
+    def test_single_flight(self):
+
+        cache = Cache("MemoryAgent", single_flight=True)
+        assert cache.connected
+
+        calls = []
+
+        @cache
+        def function1(a):
+            calls.append(a)
+            sleep(0.1)
+            return a
+
+        cache.reset()
+
+        threads = [Thread(target=function1, args=(1,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert calls == [1]
+        assert cache.stats["coalesced"] == 7
+
+    def test_async_cache(self):
+
+        cache = Cache("MemoryAgent", single_flight=True)
+        assert cache.connected
+
+        calls = []
+
+        @cache
+        async def function1(a):
+            calls.append(a)
+            await asyncio.sleep(0.1)
+            return a
+
+        async def main():
+            return await asyncio.gather(*[function1(i % 2) for i in range(8)])
+
+        cache.reset()
+
+        assert asyncio.run(main()) == [0, 1] * 4
+        assert sorted(calls) == [0, 1]
+        assert cache.stats["coalesced"] == 6
+
+        # served from cache, function1 is not called again
+        assert asyncio.run(function1(1)) == 1
+        assert sorted(calls) == [0, 1]
+
+        assert asyncio.run(function1(1, overwrite=True)) == 1
+        assert sorted(calls) == [0, 1, 1]
+
+    def test_stale_while_revalidate(self):
+
+        cache = Cache("MemoryAgent", soft_ttl=0.2)
+        assert cache.connected
+
+        calls = []
+
+        @cache
+        def function1(a):
+            calls.append(a)
+            sleep(0.05)
+            return len(calls)
+
+        cache.reset()
+
+        assert function1(1) == 1
+        sleep(0.3)
+
+        # stale value is returned at once and refreshed in the background
+        assert function1(1) == 1
+        assert function1(1) == 1
+        assert cache.stats["stale"] == 1
+        sleep(0.15)
+        assert function1(1) == 2
+        assert len(calls) == 2
+
+    def test_metrics(self):
+
+        cache = Cache("MemoryAgent", verbose=False)
+        assert cache.connected
+
+        @cache
+        def function1(a):
+            return a
+
+        cache.reset()
+
+        function1(1)
+        function1(1)
+        function1(2)
+
+        name = f"{__name__}.TestCache.test_metrics.<locals>.function1"
+        metrics = cache.metrics.to_dict()[name]
+        assert metrics["hits"] == 1
+        assert metrics["misses"] == 2
+        assert metrics["bytes_written"] > 0
+        assert metrics["hit_latency"]["count"] == 1
+        assert metrics["compute"]["count"] == 2
+
+        text = cache.metrics.to_prometheus()
+        assert f'nlm_cache_hits_total{{function="{name}"}} 1' in text
+        assert f'nlm_cache_miss_latency_seconds_count{{function="{name}"}} 2' in text
+        assert f'nlm_cache_read_seconds_bucket{{function="{name}",le="+Inf"}} 3' in text
+
+    def test_metrics_same_name(self):
+
+        cache = Cache("MemoryAgent", verbose=False)
+        assert cache.connected
+
+        class Users:
+            @staticmethod
+            @cache
+            def load(a):
+                return a
+
+        class Documents:
+            @staticmethod
+            @cache
+            def load(a):
+                return a
+
+        cache.reset()
+
+        Users.load(1)
+        Documents.load(2)
+        Documents.load(2)
+
+        metrics = {
+            name.rsplit(".", 2)[-2]: function_metrics
+            for name, function_metrics in cache.metrics.to_dict().items()
+        }
+        assert metrics["Users"]["misses"] == 1
+        assert metrics["Users"]["hits"] == 0
+        assert metrics["Documents"]["misses"] == 1
+        assert metrics["Documents"]["hits"] == 1
+
+    def test_metrics_concurrent(self):
+
+        cache = Cache("MemoryAgent", verbose=False)
+        assert cache.connected
+
+        def add_functions():
+            for i in range(5000):
+                cache.metrics.get(f"function{i}").inc("hits")
+
+        thread = Thread(target=add_functions)
+        thread.start()
+        # functions added while exporting do not break the export
+        while thread.is_alive():
+            cache.metrics.to_dict()
+        thread.join()
+        assert len(cache.metrics.to_dict()) == 5000
+
+    def test_negative_cache(self):
+
+        cache = Cache("MemoryAgent", cache_none=True, negative_ttl=0.1)
+        assert cache.connected
+
+        calls = []
+
+        @cache
+        def function1(a):
+            calls.append(a)
+            return None
+
+        cache.reset()
+
+        assert function1(1) is None
+        assert function1(1) is None
+        assert calls == [1]
+
+        # negative entries expire after negative_ttl
+        sleep(0.2)
+        assert function1(1) is None
+        assert calls == [1, 1]
+
+    def test_negative_cache_lease(self):
+
+        agent = LeaseAgent()
+        cache = Cache(
+            agent,
+            negative_empty=True,
+            negative_ttl=0.1,
+            lease_ttl=1,
+            lease_poll_interval=0.01,
+        )
+        assert cache.connected
+
+        calls = []
+
+        @cache
+        def function1(a):
+            calls.append(a)
+            return []
+
+        cache.reset()
+        agent.held = False
+        assert function1(1) == []
+        sleep(0.2)
+
+        # the waiter does not take the expired negative entry
+        agent.held = True
+        assert function1(1) == []
+        assert calls == [1, 1]
+        assert cache.stats["lease_coalesced"] == 0
+
+    def test_negative_empty(self):
+
+        cache = Cache("MemoryAgent", negative_empty=True, negative_ttl=0.1)
+        assert cache.connected
+
+        calls = []
+
+        @cache
+        def function1(a):
+            calls.append(a)
+            return []
+
+        cache.reset()
+
+        assert function1(1) == []
+        assert function1(1) == []
+        assert calls == [1]
+        sleep(0.2)
+        assert function1(1) == []
+        assert calls == [1, 1]
+
+    def test_snapshot(self, tmp_path):
+
+        cache = Cache("MemoryAgent", max_size=3)
+        assert cache.connected
+
+        cache.write_many_cache([1, 2, 3], ["key1", "key2", "key3"])
+        # key1 is the most recently used
+        cache.read_many_cache(["key1"])
+        assert cache.fs_agent.hot_keys(2) == ["key1", "key3"]
+
+        assert cache.export_snapshot(tmp_path / "snapshot", limit=2) == 2
+
+        cache = Cache("MemoryAgent", max_size=3)
+        assert cache.load_snapshot(tmp_path / "snapshot") == 2
+        assert cache.fs_agent.hot_keys(3) == ["key1", "key3"]
+        assert cache.read_many_cache(["key1", "key2", "key3"]) == [
+            (True, 1),
+            (False, None),
+            (True, 3),
+        ]
+
+    def test_snapshot_without_hot_keys(self, tmp_path):
+
+        cache = Cache(DictAgent())
+        assert cache.connected
+
+        cache.write_cache(1, "key1")
+        with pytest.raises(TypeError):
+            cache.export_snapshot(tmp_path / "snapshot")
+
+    def test_compression(self):
+
+        agent = MemoryAgent()
+        cache = Cache(agent, compression="zlib", compression_threshold=100)
+        assert cache.connected
+
+        @cache
+        def function1(a):
+            return a
+
+        cache.reset()
+
+        long_text = "text " * 1000
+        assert function1(long_text) == long_text
+        assert function1(long_text) == long_text
+        assert function1("short") == "short"
+        assert function1("short") == "short"
+        assert agent.size_in_bytes < len(long_text)
+
+        # entries written without compression are still readable
+        Cache(agent).write_cache(long_text, "uncompressed")
+        assert cache.read_many_cache(["uncompressed"]) == [(True, long_text)]
+
+    def test_compression_header_bytes(self):
+
+        # payloads starting with a codec header byte are not mistaken for
+        # compressed payloads
+        for codec in ["zlib", "zstd", "lz4"]:
+            cache = Cache(
+                "MemoryAgent",
+                protocol="raw",
+                compression=codec,
+                compression_threshold=100,
+            )
+            assert cache.connected
+
+            for header in [0x0E, 0x1E, 0x2E, 0x3E]:
+                for payload in [bytes([header]) + b"hello", bytes([header]) * 200]:
+                    cache.write_cache(payload, "cache_key")
+                    [(status, data)] = cache.read_many_cache(["cache_key"])
+                    assert status
+                    assert bytes(data) == payload
+
+    def test_compression_msgpack_small_ints(self):
+
+        # msgpack packs 14, 30, 46 and 62 as the single codec header bytes
+        for codec in ["zlib", "zstd", "lz4"]:
+            cache = Cache("MemoryAgent", protocol="msgpack", compression=codec)
+            assert cache.connected
+
+            calls = []
+
+            @cache
+            def function1(a):
+                calls.append(a)
+                return a
+
+            for value in [14, 30, 46, 62]:
+                assert function1(value) == value
+                assert function1(value) == value
+            assert calls == [14, 30, 46, 62]
+
+    def test_compression_negative_cache(self):
+
+        cache = Cache(
+            "MemoryAgent",
+            compression="lz4",
+            compression_threshold=0,
+            cache_none=True,
+        )
+        assert cache.connected
+
+        calls = []
+
+        @cache
+        def function1(a):
+            calls.append(a)
+            return None if a < 0 else a
+
+        cache.reset()
+
+        assert function1(-1) is None
+        assert function1(-1) is None
+        assert function1(1) == 1
+        assert function1(1) == 1
+        assert calls == [-1, 1]
+
+    def test_protocols(self):
+
+        embeddings = np.random.rand(3, 8).astype(np.float32)
+        for protocol in ["pickle", "pickle5", "msgpack"]:
+            cache = Cache("MemoryAgent", protocol=protocol)
+            assert cache.connected
+
+            cache.write_cache(
+                {"embeddings": embeddings, "texts": ["a", "b", "c"]},
+                "cache_key",
+            )
+            [(status, data)] = cache.read_many_cache(["cache_key"])
+            assert status
+            assert data["texts"] == ["a", "b", "c"]
+            assert data["embeddings"].dtype == np.float32
+            assert np.array_equal(data["embeddings"], embeddings)
+
+
+class TestMemoryAgent:
+    def test_max_size(self):
+        agent = MemoryAgent(max_size=2)
+        agent.write(b"1", "a")
+        agent.write(b"2", "b")
+        # a is the most recently used
+        assert agent.read("a") == (True, b"1")
+        agent.write(b"3", "c")
+
+        assert agent.read("b") == (False, None)
+        assert agent.read("a") == (True, b"1")
+        assert agent.read("c") == (True, b"3")
+        assert agent.stats["evictions"] == 1
+
+    def test_max_bytes(self):
+        agent = MemoryAgent(max_size=None, max_bytes=10)
+        agent.write(b"12345", "a")
+        agent.write(b"12345", "b")
+        assert agent.size_in_bytes == 10
+
+        agent.write(b"123", "c")
+        assert agent.read("a") == (False, None)
+        assert agent.size_in_bytes == 8
+
+        # larger than the budget, not cached
+        agent.write(b"12345678901", "d")
+        assert agent.read("d") == (False, None)
+        assert agent.size_in_bytes == 8
+
+        # strings are counted in bytes, 4 per character here
+        agent.write("\U0001f600" * 3, "e")
+        assert agent.read("e") == (False, None)
+        assert agent.size_in_bytes == 8
+
+    def test_max_bytes_objects(self):
+        agent = MemoryAgent(max_size=None, max_bytes=10)
+        # objects are counted with the size of their serialized form
+        agent.write([[0] * 1000], "a", size=6)
+        agent.write({"b": "x" * 1000}, "b", size=6)
+        assert agent.size_in_bytes == 6
+        assert agent.read("a") == (False, None)
+        assert agent.read("b") == (True, {"b": "x" * 1000})
+
+        with pytest.raises(ValueError):
+            agent.write([1, 2, 3], "c")
+
+    def test_ttl(self):
+        agent = MemoryAgent(ttl=0.05)
+        agent.write(b"1", "a")
+        agent.write(b"2", "b")
+        sleep(0.06)
+        # overwrite moves b to the end of the LRU with a new access time
+        agent.write(b"3", "b")
+
+        assert agent.read("a") == (False, None)
+        assert agent.read("b") == (True, b"3")
+        assert agent.stats["expirations"] == 1
+        assert agent.stats["hits"] == 1
+        assert agent.stats["misses"] == 1
@@ -29,3 +29,56 @@ class TestCache:
         assert function1(2, overwrite=False) == 2
         assert function1(2, overwrite=True) == 2
         assert function1(2) == 2
+
+    def test_read_write_many(self):
+
+        cache = Cache("MongodbAgent", db="cache", collection="cache")
+        assert cache.connected
+
+        if not cache.connected:
+            return
+
+        cache.reset()
+
+        cache.write_many_cache([1, "a"], ["key1", "key2"])
+        assert cache.read_many_cache(["key1", "key3", "key2"]) == [
+            (True, 1),
+            (False, None),
+            (True, "a"),
+        ]
+
+        cache.delete_many_cache(["key1", "key2"])
+        assert cache.read_many_cache(["key1", "key2"]) == [(False, None), (False, None)]
+
+    def test_snapshot(self, tmp_path):
+
+        cache = Cache("MongodbAgent", db="cache", collection="snapshot")
+        assert cache.connected
+
+        if not cache.connected:
+            return
+
+        cache.reset()
+
+        cache.write_many_cache([1, 2], ["key1", "key2"])
+        cache.write_cache(3, "key3")
+        # the most recently written keys come first
+        assert cache.fs_agent.hot_keys(2)[0] == "key3"
+        assert set(cache.fs_agent.hot_keys(10)) == {"key1", "key2", "key3"}
+
+        assert cache.export_snapshot(tmp_path / "snapshot") == 3
+        cache = Cache("MemoryAgent")
+        assert cache.load_snapshot(tmp_path / "snapshot") == 3
+        assert cache.read_many_cache(["key1", "key2", "key3"]) == [
+            (True, 1),
+            (True, 2),
+            (True, 3),
+        ]
+
+    def test_shared_client(self):
+
+        cache1 = Cache("MongodbAgent", db="cache", collection="cache1")
+        cache2 = Cache("MongodbAgent", db="cache", collection="cache2")
+        assert cache1.connected and cache2.connected
+
+        assert cache1.fs_agent.client is cache2.fs_agent.client
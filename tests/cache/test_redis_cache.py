@@ -1,3 +1,6 @@
+import asyncio
+from unittest import mock
+
 from nlm_utils.cache import Cache
 
 
@@ -57,3 +60,117 @@ class TestCache:
         assert function1(2, overwrite=False) == 2
         assert function1(2, overwrite=True) == 2
         assert function1(2) == 2
+
+    def test_read_write_many(self):
+
+        cache = Cache("RedisAgent")
+        assert cache.connected
+
+        if not cache.connected:
+            return
+
+        cache.reset()
+
+        cache.write_many_cache([1, "a"], ["key1", "key2"])
+        assert cache.read_many_cache(["key1", "key3", "key2"]) == [
+            (True, 1),
+            (False, None),
+            (True, "a"),
+        ]
+
+        cache.delete_many_cache(["key1", "key2"])
+        assert cache.read_many_cache(["key1", "key2"]) == [(False, None), (False, None)]
+
+    def test_versioned_reset(self):
+
+        cache = Cache("RedisAgent", prefix="versioned", versioned=True)
+        assert cache.connected
+
+        if not cache.connected:
+            return
+
+        cache.write_cache(1, "key1")
+        assert cache.read_many_cache(["key1"]) == [(True, 1)]
+
+        # reset moves to a new generation, old keys are not visible anymore
+        cache.reset()
+        assert cache.read_many_cache(["key1"]) == [(False, None)]
+
+        cache.write_cache(2, "key1")
+        assert cache.read_many_cache(["key1"]) == [(True, 2)]
+
+        # scan based reset of the whole prefix, including the generation counter
+        cache = Cache("RedisAgent", prefix="versioned")
+        cache.reset()
+        assert not list(cache.fs_agent.client.scan_iter(match="versioned-*"))
+
+    def test_shared_client(self):
+
+        cache1 = Cache("RedisAgent", prefix="collection1", max_connections=16)
+        cache2 = Cache("RedisAgent", prefix="collection2", max_connections=16)
+        assert cache1.connected and cache2.connected
+
+        assert cache1.fs_agent.client is cache2.fs_agent.client
+
+        cache1.write_cache(1, "key1")
+        assert cache1.read_many_cache(["key1"]) == [(True, 1)]
+        assert cache2.read_many_cache(["key1"]) == [(False, None)]
+
+    def test_snapshot(self, tmp_path):
+
+        cache = Cache("RedisAgent", prefix="snapshot", versioned=True)
+        assert cache.connected
+
+        if not cache.connected:
+            return
+
+        cache.reset()
+
+        cache.write_many_cache([1, 2, 3], ["key1", "key2", "key3"])
+        # generation counter and leases are not cache entries
+        lease = cache.fs_agent.acquire_lease("key4", 10)
+        assert set(cache.fs_agent.hot_keys(10)) == {"key1", "key2", "key3"}
+        assert len(cache.fs_agent.hot_keys(2)) == 2
+        cache.fs_agent.release_lease("key4", lease)
+
+        assert cache.export_snapshot(tmp_path / "snapshot") == 3
+        cache = Cache("MemoryAgent")
+        assert cache.load_snapshot(tmp_path / "snapshot") == 3
+        assert cache.read_many_cache(["key1", "key2", "key3"]) == [
+            (True, 1),
+            (True, 2),
+            (True, 3),
+        ]
+
+    def test_async_versioned(self):
+
+        cache = Cache("AsyncRedisAgent", prefix="async-versioned", versioned=True)
+        assert cache.connected
+
+        if not cache.connected:
+            return
+
+        cache.reset()
+        agent = cache.fs_agent
+
+        async def main():
+            # the generation is read with the asyncio client
+            agent._generation_read_at = None
+            await cache.awrite_many_cache([1, 2], ["key1", "key2"])
+            assert await cache.aread_many_cache(["key1", "key3", "key2"]) == [
+                (True, 1),
+                (False, None),
+                (True, 2),
+            ]
+            await cache.adelete_many_cache(["key1"])
+            assert (await agent.aread("key1"))[0] is False
+            # aclose is new in redis 5.0.1, close before that
+            await getattr(agent.aclient, "aclose", agent.aclient.close)()
+
+        # the blocking client is shared with other agents
+        with mock.patch.object(
+            agent.client,
+            "get",
+            side_effect=AssertionError("blocking client used in a coroutine"),
+        ):
+            asyncio.run(main())
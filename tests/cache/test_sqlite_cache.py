@@ -0,0 +1,80 @@
+from multiprocessing import Pool
+from time import sleep
+
+from nlm_utils.cache import Cache
+from nlm_utils.cache import SqliteAgent
+
+
+def read_in_process(cache_key):
+    agent = SqliteAgent(path=".cache", collection="sqlite")
+    agent.connect()
+    return agent.read(cache_key)
+
+
+class TestCache:
+    def test_cache(self):
+
+        cache = Cache("SqliteAgent", path=".cache", collection="sqlite")
+        assert cache.connected
+
+        @cache
+        def function1(a):
+            return a
+
+        @cache
+        def function2(a):
+            return a
+
+        cache.reset()
+
+        assert function1(1) == 1
+        assert function1(1, overwrite=False) == 1
+        assert function1(1, overwrite=True) == 1
+        assert function1(1) == 1
+
+        assert function1(2) == 2
+        assert function1(2, overwrite=False) == 2
+        assert function1(2, overwrite=True) == 2
+        assert function1(2) == 2
+
+    def test_read_write_many(self):
+
+        cache = Cache("SqliteAgent", path=".cache", collection="sqlite")
+        assert cache.connected
+
+        cache.reset()
+
+        cache_keys = [f"key{i}" for i in range(1200)]
+        cache.write_many_cache(list(range(1200)), cache_keys)
+        results = cache.read_many_cache(cache_keys + ["missing"])
+        assert results[:-1] == [(True, i) for i in range(1200)]
+        assert results[-1] == (False, None)
+
+        cache.delete_many_cache(cache_keys)
+        assert cache.read_many_cache(cache_keys[:2]) == [(False, None), (False, None)]
+
+
+class TestSqliteAgent:
+    def test_ttl_and_compact(self):
+        agent = SqliteAgent(path=".cache", collection="sqlite_ttl", ttl=0.05)
+        agent.connect()
+        agent.reset()
+
+        agent.write(b"data", "cache_key")
+        assert agent.read("cache_key") == (True, b"data")
+        sleep(0.06)
+        assert agent.read("cache_key") == (False, None)
+
+        agent.compact()
+        count = agent.connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        assert count == 0
+
+    def test_concurrent_readers(self):
+        agent = SqliteAgent(path=".cache", collection="sqlite")
+        agent.connect()
+        agent.reset()
+        agent.write(b"data", "cache_key")
+
+        with Pool(4) as pool:
+            results = pool.map(read_in_process, ["cache_key"] * 8)
+        assert results == [(True, b"data")] * 8
@@ -0,0 +1,178 @@
+import os
+from time import sleep
+
+import numpy as np
+
+from nlm_utils.cache import Cache
+from nlm_utils.cache import FileAgent
+from nlm_utils.cache import TieredAgent
+
+
+class TestCache:
+    def test_cache(self):
+
+        cache = Cache("TieredAgent", l2_agent="FileAgent", path=".cache")
+        assert cache.connected
+
+        @cache
+        def function1(a):
+            return a
+
+        @cache
+        def function2(a):
+            return a
+
+        cache.reset()
+
+        assert function1(1) == 1
+        assert function1(1, overwrite=False) == 1
+        assert function1(1, overwrite=True) == 1
+        assert function1(1) == 1
+
+        assert function1(2) == 2
+        assert function1(2, overwrite=False) == 2
+        assert function1(2, overwrite=True) == 2
+        assert function1(2) == 2
+
+    def test_promote_to_l1(self):
+
+        agent = TieredAgent(l2_agent="FileAgent", path=".cache")
+        cache = Cache(agent)
+        assert cache.connected
+
+        cache.reset()
+
+        cache.write_cache([1, 2], "cache_key")
+        agent.l1.reset()
+        assert agent.l1.read("cache_key") == (False, None)
+
+        assert cache.read_many_cache(["cache_key"]) == [(True, [1, 2])]
+        assert agent.l1.read("cache_key")[0]
+
+    def test_l1_deserialized(self):
+
+        cache = Cache(
+            "TieredAgent",
+            l2_agent="FileAgent",
+            l1_deserialized=True,
+            path=".cache",
+        )
+        assert cache.connected
+
+        calls = []
+
+        @cache
+        def function1(a):
+            calls.append(a)
+            return [a]
+
+        cache.reset()
+
+        data = function1(1)
+        assert data == [1]
+        # hot keys are served from L1 as the same object
+        assert function1(1) is data
+
+        cache.fs_agent.l1.reset()
+        assert function1(1) == [1]
+        assert calls == [1]
+
+        assert cache.read_many_cache(["missing"]) == [(False, None)]
+
+    def test_l1_deserialized_stale_while_revalidate(self):
+
+        cache = Cache(
+            "TieredAgent",
+            l2_agent="FileAgent",
+            l1_deserialized=True,
+            soft_ttl=0.2,
+            path=".cache",
+        )
+        assert cache.connected
+
+        calls = []
+
+        @cache
+        def function1(a):
+            calls.append(a)
+            sleep(0.05)
+            return [len(calls)]
+
+        cache.reset()
+
+        assert function1(1) == [1]
+        # served from L1 as the same object
+        assert function1(1) is function1(1)
+        sleep(0.3)
+
+        # stale object is returned at once and refreshed in the background
+        assert function1(1) == [1]
+        assert cache.stats["stale"] == 1
+        sleep(0.15)
+        assert function1(1) == [2]
+        assert len(calls) == 2
+
+    def test_l1_deserialized_max_bytes(self):
+
+        cache = Cache(
+            "TieredAgent",
+            l2_agent="FileAgent",
+            l1_deserialized=True,
+            l1_max_bytes=3000,
+            path=".cache",
+        )
+        assert cache.connected
+
+        @cache
+        def function1(a):
+            return np.zeros(200) + a
+
+        cache.reset()
+
+        for a in range(10):
+            function1(a)
+        # each array is about 1.6 KB serialized, only one fits into L1
+        assert len(cache.fs_agent.l1._data) == 1
+        assert 1600 <= cache.fs_agent.l1.size_in_bytes <= 3000
+        assert function1(3)[0] == 3
+
+    def test_l1_deserialized_snapshot(self, tmp_path):
+
+        cache = Cache("MemoryAgent")
+        cache.write_many_cache([[1], [2]], ["key1", "key2"])
+        assert cache.export_snapshot(tmp_path / "snapshot") == 2
+
+        cache = Cache(
+            "TieredAgent",
+            l2_agent="FileAgent",
+            l1_deserialized=True,
+            path=".cache",
+        )
+        assert cache.connected
+        cache.reset()
+
+        assert cache.load_snapshot(tmp_path / "snapshot") == 2
+        # L1 is warmed up with the objects, L2 with the serialized data
+        assert cache.fs_agent.read_object("key1") == (True, [1])
+        assert cache.fs_agent.read_object("key2") == (True, [2])
+        assert cache.fs_agent.l2.read("key2")[0]
+
+    def test_promote_mmap(self):
+
+        l2_agent = FileAgent(path=".cache", collection="mmap", mmap_threshold=10)
+        agent = TieredAgent(l2_agent=l2_agent)
+        cache = Cache(agent)
+        assert cache.connected
+
+        cache.reset()
+
+        cache_keys = [f"key{i}" for i in range(300)]
+        l2_agent.write_many([b"x" * 32] * len(cache_keys), cache_keys)
+
+        n_fds = len(os.listdir("/proc/self/fd"))
+        for cache_key in cache_keys[:150]:
+            assert agent.read(cache_key) == (True, b"x" * 32)
+        assert agent.read_many(cache_keys[150:]) == [(True, b"x" * 32)] * 150
+        # L1 keeps copies, not the memory mapped files
+        assert len(agent.l1._data) == 300
+        assert len(os.listdir("/proc/self/fd")) < n_fds + 10
@@ -0,0 +1,223 @@
+import asyncio
+import gzip
+import json
+
+import msgpack
+
+from nlm_utils.model_client import AsyncBartClient
+from nlm_utils.model_client import AsyncClassificationClient
+from nlm_utils.model_client import AsyncFlanT5Client
+from nlm_utils.model_client import AsyncNlpClient
+from nlm_utils.model_client import AsyncYoloClient
+from nlm_utils.model_client import NlpClient
+from nlm_utils.model_client.transport import TransportError
+
+URL = "http://model-server"
+
+
+class StubTransport:
+    """
+    Model server stub, answers each url with its response in `responses` and
+    records the decoded requests. Urls without a response fail with a 503.
+    """
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    def request(self, method, urls, body=None, headers=None, retry=None, hedge=None):
+        return self._respond(None, method, urls, body, headers)
+
+    async def arequest(
+        self,
+        session,
+        method,
+        urls,
+        body=None,
+        headers=None,
+        retry=None,
+        hedge=None,
+    ):
+        return self._respond(session, method, urls, body, headers)
+
+    def _respond(self, session, method, urls, body, headers):
+        if headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        if headers.get("Content-Type") == "application/msgpack":
+            req_data = msgpack.unpackb(body)
+        else:
+            req_data = json.loads(body)
+        self.requests.append((session, method, urls, req_data))
+        if urls not in self.responses:
+            raise TransportError(f"{method} {urls} returned 503", status=503)
+        return json.dumps(self.responses[urls]).encode("utf-8")
+
+
+class TestAsyncClients:
+    session = object()
+
+    def test_async_nlp_client(self):
+        transport = StubTransport({f"{URL}/nlp": {"data": ["A test.", "B test."]}})
+        client = AsyncNlpClient(
+            URL,
+            request_encoding="msgpack",
+            request_compression="gzip",
+            transport=transport,
+            session=self.session,
+        )
+
+        results = asyncio.run(client.acall(["a?", "b?"], "convert", domain="biology"))
+        assert results == ["A test.", "B test."]
+        assert transport.requests == [
+            (
+                self.session,
+                "POST",
+                f"{URL}/nlp",
+                {"option": "convert", "texts": ["a?", "b?"], "domain": "biology"},
+            ),
+        ]
+
+        # errors of the server give no results
+        client.url = f"{URL}/down"
+        assert asyncio.run(client.acall(["a?"], "convert")) == []
+
+    def test_blocking_methods(self):
+        # the async clients are still usable as the blocking clients
+        pages = [{"page_idx": 2, "labels": {}}]
+        transport = StubTransport(
+            {
+                f"{URL}/nlp": {"data": ["A test."]},
+                f"{URL}/yolo": pages,
+            },
+        )
+        nlp_client = AsyncNlpClient(URL, transport=transport, session=self.session)
+        assert isinstance(nlp_client, NlpClient)
+        assert nlp_client(["a?"], "convert") == ["A test."]
+
+        yolo_client = AsyncYoloClient(URL, transport=transport, session=self.session)
+        assert yolo_client("doc") == pages
+        assert [session for session, _, _, _ in transport.requests] == [None, None]
+
+    def test_async_flan_t5_client(self):
+        transport = StubTransport(
+            {
+                f"{URL}/flan-t5/infer": {
+                    "outputs": ["yes", "unanswerable"],
+                    "confidences": [0.9, 0.2],
+                },
+                f"{URL}/nlp": {"data": ["It is a test."]},
+            },
+        )
+        client = AsyncFlanT5Client(URL, transport=transport, session=self.session)
+
+        output = asyncio.run(client.aboolq(["is it?", "is it?"], ["yes", "no"]))
+        assert output == {"predictions": ["True", "Neutral"], "probs": [[0.9], [0.2]]}
+        _, _, url, req_data = transport.requests[-1]
+        assert url == f"{URL}/flan-t5/infer"
+        assert req_data == {
+            "prompts": AsyncFlanT5Client.get_boolq_prompts(
+                ["is it?", "is it?"],
+                ["yes", "no"],
+            ),
+            "max_length": 500,
+        }
+
+        answers, _ = asyncio.run(client.aqa(["what?", "who?"], ["a", "b"]))["answers"]
+        assert answers["0"]["text"] == "yes"
+        assert answers["1"]["text"] == ""
+        assert answers["1"]["probability"] == 0.2
+
+        # the hypotheses are asked to the nlp server with the same session
+        prompts = asyncio.run(client.aget_mnli_prompts(["is it?"], ["a test"]))
+        assert prompts[0].startswith("Premise: a test\n\nHypothesis: It is a test.")
+        session, _, url, req_data = transport.requests[-1]
+        assert session is self.session
+        assert url == f"{URL}/nlp"
+        assert req_data == {
+            "option": "convert_question_to_sentence",
+            "texts": ["is it?"],
+        }
+
+    def test_async_classification_flan_t5(self):
+        transport = StubTransport(
+            {
+                f"{URL}/flan-t5/infer": {
+                    "outputs": ["no"],
+                    "confidences": [0.7],
+                },
+            },
+        )
+        client = AsyncClassificationClient(
+            model="flan-t5",
+            task="boolq",
+            url=URL,
+            transport=transport,
+            session=self.session,
+        )
+
+        output = asyncio.run(client(["is it?"], ["no"]))
+        assert output == {"predictions": ["False"], "probs": [[0.7]]}
+        assert transport.requests[0][0] is self.session
+
+    def test_async_bart_client(self):
+        transport = StubTransport(
+            {
+                f"{URL}/bart/infer": {
+                    "outputs": ["a summary", "unanswerable"],
+                    "confidences": [0.8, 0.1],
+                },
+            },
+        )
+        client = AsyncBartClient(
+            URL,
+            request_encoding="msgpack",
+            transport=transport,
+            session=self.session,
+        )
+
+        output = asyncio.run(client.aqa_sum(["what?", "who?"], ["a", "b"]))
+        assert output == {
+            "answers": [
+                {
+                    "0": {
+                        "text": "a summary",
+                        "start_probs": 0.8,
+                        "end_probs": 0.8,
+                        "probability": 0.8,
+                    },
+                    "1": {
+                        "text": "",
+                        "start_probs": 0.1,
+                        "end_probs": 0.1,
+                        "probability": 0.1,
+                    },
+                },
+                {},
+            ],
+        }
+        assert transport.requests == [
+            (
+                self.session,
+                "POST",
+                f"{URL}/bart/infer",
+                {
+                    "prompts": AsyncBartClient.get_qa_sum_prompts(
+                        ["what?", "who?"],
+                        ["a", "b"],
+                    ),
+                    "max_length": 1024,
+                },
+            ),
+        ]
+
+    def test_async_yolo_client(self):
+        pages = [{"page_idx": 2, "labels": {"table": [[1, 2, 3, 4]]}}]
+        transport = StubTransport({f"{URL}/yolo": pages})
+        client = AsyncYoloClient(URL, transport=transport, session=self.session)
+
+        assert asyncio.run(client.acall("doc", page_idxs=[2])) == pages
+        assert asyncio.run(client.acall("doc")) == pages
+        assert [req_data for _, _, _, req_data in transport.requests] == [
+            {"doc_id": "doc", "page_idxs": [2]},
+            {"doc_id": "doc"},
+        ]
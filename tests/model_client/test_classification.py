@@ -1,7 +1,9 @@
+import asyncio
 import os
 
+from nlm_utils.model_client import AsyncClassificationClient
 from nlm_utils.model_client import ClassificationClient
-
+from nlm_utils.model_client.session_pool import close_session
 
 URL = os.getenv("MODEL_SERVER_URL")
 
@@ -45,3 +47,34 @@ class TestClassification:
             client = ClassificationClient(model, task, URL)
             response = client(text_a, text_b)
             print(model, task, response)
+
+    def test_classification_micro_batch(self):
+        text_a = [
+            "what is the project name?",
+        ]
+        text_b = [
+            "Among these projects was New York City’s 7.5 million square foot World Financial Center.",
+        ]
+        task = "qnli"
+        response = ClassificationClient("roberta", task, URL)(text_a, text_b)
+        client = ClassificationClient("roberta", task, URL, micro_batch=True)
+        assert client(text_a, text_b)["predictions"] == response["predictions"]
+
+    def test_async_classification_client(self):
+        text_a = [
+            "what is the project name?",
+        ]
+        text_b = [
+            "Among these projects was New York City’s 7.5 million square foot World Financial Center.",
+        ]
+        task = "qnli"
+        response = ClassificationClient("roberta", task, URL)(text_a, text_b)
+
+        async def classify():
+            client = AsyncClassificationClient("roberta", task, URL)
+            try:
+                return await client(text_a, text_b)
+            finally:
+                await close_session()
+
+        assert asyncio.run(classify())["predictions"] == response["predictions"]
@@ -0,0 +1,65 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+
+from nlm_utils.model_client.connection_pool import configure_pool
+from nlm_utils.model_client.connection_pool import get_pool
+from nlm_utils.model_client.connection_pool import pool_stats
+from nlm_utils.model_client.transport import Transport
+from nlm_utils.model_client.transport import TransportError
+
+
+class Handler(BaseHTTPRequestHandler):
+    # answers the Connection header of the request
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = (self.headers["Connection"] or "").encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestConnectionPool:
+    def test_configure_pool(self):
+        pool = configure_pool("http://127.0.0.1:1", maxsize=4, block=True)
+        assert get_pool("http://127.0.0.1:1/sif/encoder") is pool
+        assert get_pool("http://127.0.0.1:2/sif/encoder") is get_pool()
+
+        transport = Transport(retry=2, backoff=0.001, connect_timeout=1)
+        try:
+            transport.request("POST", "http://127.0.0.1:1/sif/encoder", b"{}")
+        except TransportError:
+            pass
+        stats = pool_stats()["http://127.0.0.1:1"]
+        assert stats["requests"] == 2
+        assert stats["in_flight"] == 0
+        assert stats["maxsize"] == 4
+
+    def test_connection_close(self):
+        server = HTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}"
+        try:
+            configure_pool(url, keep_alive=False)
+            content = Transport().request(
+                "POST",
+                f"{url}/sif/encoder",
+                b"{}",
+                headers={"Content-Type": "application/json"},
+            )
+            assert content == b"close"
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_socket_options(self):
+        reuseaddr = (socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        pool = configure_pool("http://127.0.0.1:3", socket_options=[reuseaddr])
+        socket_options = pool.pool.connection_pool_kw["socket_options"]
+        assert reuseaddr in socket_options
+        assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in socket_options
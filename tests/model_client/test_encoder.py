@@ -1,7 +1,17 @@
+import asyncio
+import json
 import os
+import threading
+from time import sleep
 
-from nlm_utils.model_client import EncoderClient
+import msgpack
+import numpy as np
 
+from nlm_utils.cache import Cache
+from nlm_utils.model_client import AsyncEncoderClient
+from nlm_utils.model_client import EncoderClient
+from nlm_utils.model_client.session_pool import close_session
+from nlm_utils.model_client.transport import TransportError
 
 URL = os.getenv("MODEL_SERVER_URL")
 
@@ -18,3 +28,193 @@ class TestEncoder:
         client = EncoderClient(encoder, URL)
         embs = client([])["embeddings"]
         assert embs == []
+
+    def test_encoder_client_sif_cache(self):
+        encoder = "sif"
+        client = EncoderClient(encoder, URL, cache=Cache("MemoryAgent"))
+        embs = client(["test", "cache"])["embeddings"]
+        cached_embs = client(["cache", "new", "test"])["embeddings"]
+        assert np.allclose(cached_embs[0], embs[1])
+        assert np.allclose(cached_embs[2], embs[0])
+
+    def test_encoder_client_sif_sharding(self):
+        encoder = "sif"
+        sentences = ["test", "sharding", "of", "sentences", "into", "requests"]
+        embs = EncoderClient(encoder, URL)(sentences)["embeddings"]
+
+        client = EncoderClient(encoder, urls=[URL, URL], shard_size=4)
+        assert np.allclose(client(sentences)["embeddings"], embs)
+        assert np.allclose(
+            asyncio.run(client.aencode(sentences))["embeddings"],
+            embs,
+        )
+
+    def test_encoder_client_sif_return_numpy(self):
+        encoder = "sif"
+        embs = EncoderClient(encoder, URL)(["test", "numpy"])["embeddings"]
+
+        client = EncoderClient(encoder, URL, return_numpy=True)
+        np_embs = client(["test", "numpy"])["embeddings"]
+        assert isinstance(np_embs, np.ndarray)
+        assert np_embs.dtype == np.float32
+        assert np.allclose(np_embs, embs, atol=1e-6)
+
+        client = EncoderClient(encoder, URL, return_numpy=True, output_dtype="int8")
+        assert client(["test", "numpy"])["embeddings"].dtype == np.int8
+
+    def test_encoder_client_sif_msgpack_request(self):
+        encoder = "sif"
+        embs = EncoderClient(encoder, URL)(["test", "msgpack"])["embeddings"]
+
+        client = EncoderClient(
+            encoder,
+            URL,
+            request_encoding="msgpack",
+            request_compression="zstd",
+        )
+        assert np.allclose(client(["test", "msgpack"])["embeddings"], embs)
+
+    def test_async_encoder_client_sif(self):
+        encoder = "sif"
+        embs = EncoderClient(encoder, URL)(["test", "async"])["embeddings"]
+
+        async def encode():
+            client = AsyncEncoderClient(encoder, URL)
+            try:
+                return await client(["test", "async"])
+            finally:
+                await close_session()
+
+        assert np.allclose(asyncio.run(encode())["embeddings"], embs)
+
+
+class StubTransport:
+    """
+    Encoder server stub, the embedding of a sentence is [its length, the code
+    of its first character]. Shards starting with a sentence of `slow` answer
+    last, shards starting with a sentence of `failing` fail.
+    """
+
+    def __init__(self, slow=(), failing=()):
+        self.slow = set(slow)
+        self.failing = set(failing)
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def _respond(self, urls, body):
+        sentences = json.loads(body)["sentences"]
+        with self._lock:
+            self.requests.append((urls[0], sentences))
+        if sentences[0] in self.failing:
+            raise TransportError(f"POST {urls[0]} returned 503", status=503)
+        embeddings = np.array(
+            [[len(sentence), ord(sentence[0])] for sentence in sentences],
+            dtype=np.float32,
+        )
+        return msgpack.packb({"embeddings": embeddings.tobytes()})
+
+    def request(self, method, urls, body=None, headers=None, retry=None, hedge=None):
+        if json.loads(body)["sentences"][0] in self.slow:
+            sleep(0.1)
+        return self._respond(urls, body)
+
+    async def arequest(
+        self,
+        session,
+        method,
+        urls,
+        body=None,
+        headers=None,
+        retry=None,
+        hedge=None,
+    ):
+        if json.loads(body)["sentences"][0] in self.slow:
+            await asyncio.sleep(0.1)
+        return self._respond(urls, body)
+
+
+def expected_embeddings(sentences):
+    return np.array(
+        [[len(sentence), ord(sentence[0])] for sentence in sentences],
+        dtype=np.float32,
+    )
+
+
+class TestEncoderShards:
+    sentences = ["a", "bb", "ccc", "dddd", "eeeee"]
+
+    def test_shard_order(self):
+        # the first shard answers last
+        transport = StubTransport(slow=["a"])
+        client = EncoderClient(
+            "sif",
+            urls=["http://encoder-1", "http://encoder-2"],
+            shard_size=2,
+            normalization=False,
+            return_numpy=True,
+            transport=transport,
+        )
+
+        embs = client(self.sentences)["embeddings"]
+        assert np.array_equal(embs, expected_embeddings(self.sentences))
+        assert sorted(sentences for _, sentences in transport.requests) == [
+            ["a", "bb"],
+            ["ccc", "dddd"],
+            ["eeeee"],
+        ]
+        # shards are sent round-robin to the replicas
+        assert {url for url, _ in transport.requests} == {
+            "http://encoder-1/sif/encoder",
+            "http://encoder-2/sif/encoder",
+        }
+
+        async def encode():
+            client = EncoderClient(
+                "sif",
+                urls=["http://encoder-1", "http://encoder-2"],
+                shard_size=2,
+                normalization=False,
+                return_numpy=True,
+                transport=transport,
+                session=object(),
+            )
+            return await client.aencode(self.sentences)
+
+        embs = asyncio.run(encode())["embeddings"]
+        assert np.array_equal(embs, expected_embeddings(self.sentences))
+
+    def test_shard_failure(self):
+        client = EncoderClient(
+            "sif",
+            "http://encoder",
+            shard_size=2,
+            transport=StubTransport(failing=["ccc"]),
+        )
+        assert client(self.sentences) is None
+
+    def test_partial_cache_hits(self):
+        transport = StubTransport()
+        client = EncoderClient(
+            "sif",
+            "http://encoder",
+            shard_size=2,
+            normalization=False,
+            return_numpy=True,
+            transport=transport,
+            cache=Cache("MemoryAgent"),
+        )
+        client.cache.reset()
+
+        client(["a", "bb"])
+        sentences = ["bb", "ccc", "a", "dddd", "ccc", "eeeee"]
+        embs = client(sentences)["embeddings"]
+        assert np.array_equal(embs, expected_embeddings(sentences))
+        # only the unique sentences missing from cache are sent, in shards
+        assert sorted(sentences for _, sentences in transport.requests[1:]) == [
+            ["ccc", "dddd"],
+            ["eeeee"],
+        ]
+
+        embs = client(["eeeee", "a"])["embeddings"]
+        assert np.array_equal(embs, expected_embeddings(["eeeee", "a"]))
+        assert len(transport.requests) == 3
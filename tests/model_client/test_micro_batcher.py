@@ -0,0 +1,91 @@
+import threading
+import time
+
+import numpy as np
+
+from nlm_utils.model_client.micro_batcher import get_batcher
+from nlm_utils.model_client.micro_batcher import merge_requests
+from nlm_utils.model_client.micro_batcher import MicroBatcher
+from nlm_utils.model_client.micro_batcher import split_response
+
+
+class TestMicroBatcher:
+    def test_micro_batcher(self):
+        batcher = MicroBatcher(max_batch_size=100, max_wait=0.05)
+        batches = []
+
+        def send(items):
+            batches.append(items)
+            return [item * 2 for item in items]
+
+        results = {}
+
+        def call(i):
+            results[i] = batcher.submit("key", i, 1, send)
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == {i: i * 2 for i in range(10)}
+        assert len(batches) < 10
+        assert batcher.n_calls == 10
+
+    def test_merge_and_split(self):
+        req_data = merge_requests(
+            [
+                {"left_sentences": ["a"], "return_probs": True},
+                {"left_sentences": ["b", "c"], "return_probs": True},
+            ],
+            ["left_sentences", "right_sentences"],
+        )
+        assert req_data == {"left_sentences": ["a", "b", "c"], "return_probs": True}
+
+        first, second = split_response(
+            {
+                "predictions": ["A", "B", "C"],
+                "logits": np.arange(6),
+                "answers": [{"0": "a", "1": "b", "2": "c"}, {}],
+                "model": "roberta",
+                "labels_names": ["x", "y", "z"],
+            },
+            [1, 2],
+            ["predictions", "logits", "answers"],
+        )
+        assert first["predictions"] == ["A"]
+        assert second["predictions"] == ["B", "C"]
+        assert second["logits"].tolist() == [2, 3, 4, 5]
+        assert first["answers"] == [{"0": "a"}, {}]
+        assert second["answers"] == [{"0": "b", "1": "c"}, {}]
+        assert second["model"] == "roberta"
+        # a list of len(items) which is not declared per item is not split
+        assert second["labels_names"] == ["x", "y", "z"]
+
+    def test_oversized_call(self):
+        batcher = MicroBatcher(max_batch_size=4, max_wait=0.2)
+        batches = []
+
+        def send(items):
+            batches.append(items)
+            return list(items)
+
+        small = threading.Thread(target=batcher.submit, args=("key", "a", 2, send))
+        small.start()
+        while not batcher.n_calls:
+            time.sleep(0.001)
+        # the open batch is not joined by a call of max_batch_size items
+        assert batcher.submit("key", "b", 4, send) == "b"
+        assert batches == [["b"]]
+        # nor by a call which would overflow it
+        assert batcher.submit("key", "c", 3, send) == "c"
+        small.join()
+        assert sorted(batches) == [["a"], ["b"], ["c"]]
+        assert batcher.n_batches == 3
+
+    def test_get_batcher(self):
+        batcher = get_batcher("http://classifier", 8, 0.01)
+        assert get_batcher("http://classifier", 8, 0.01) is batcher
+        assert get_batcher("http://classifier", 16, 0.01).max_batch_size == 16
+        assert get_batcher("http://classifier", 8, 0.02).max_wait == 0.02
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from unittest import mock
+
+import aiohttp
+import pytest
+
+from nlm_utils.model_client.transport import CircuitBreaker
+from nlm_utils.model_client.transport import CircuitOpenError
+from nlm_utils.model_client.transport import LatencyWindow
+from nlm_utils.model_client.transport import Transport
+from nlm_utils.model_client.transport import TransportError
+
+# nothing listens on port 1
+DEAD_URL = "http://127.0.0.1:1/encoder"
+
+
+class Response:
+    def __init__(self, status, data):
+        self.status = status
+        self.data = data
+
+
+class SlowConnection:
+    # answers every request with 200 after delay seconds
+    def __init__(self, delay):
+        self.delay = delay
+        self.urls = []
+
+    def request(self, method, url, **kwargs):
+        self.urls.append(url)
+        time.sleep(self.delay)
+        return Response(200, b"ok")
+
+
+class TestTransport:
+    def test_circuit_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        assert breaker.state == "closed" and breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == "open" and not breaker.allow()
+
+        time.sleep(0.06)
+        assert breaker.state == "half-open"
+        # a single probe is let through
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+    def test_latency_window(self):
+        latency = LatencyWindow(size=100)
+        assert latency.quantile(0.95) is None
+        for i in range(200):
+            latency.add(i)
+        assert len(latency) == 100
+        assert latency.quantile(0.95) == 195
+
+    def test_retry_and_circuit(self):
+        transport = Transport(
+            retry=3,
+            backoff=0.001,
+            connect_timeout=1,
+            failure_threshold=3,
+        )
+        with pytest.raises(TransportError):
+            transport.request("POST", DEAD_URL, body=b"{}")
+        assert transport.stats()[DEAD_URL]["state"] == "open"
+        # open circuits fail fast
+        with pytest.raises(CircuitOpenError):
+            transport.request("POST", DEAD_URL, body=b"{}")
+
+    def test_async_retry(self):
+        transport = Transport(retry=2, backoff=0.001, connect_timeout=1)
+
+        async def request():
+            async with aiohttp.ClientSession() as session:
+                return await transport.arequest(session, "POST", DEAD_URL, b"{}")
+
+        with pytest.raises(TransportError):
+            asyncio.run(request())
+        assert transport.stats()[DEAD_URL]["failures"] == 2
+
+    def test_no_hedge_without_replica(self):
+        connection = SlowConnection(0.001)
+        transport = Transport(hedge=True, hedge_min_samples=1, connection=connection)
+        url = "http://encoder-1/encoder"
+        assert transport.request("POST", url, body=b"{}") == b"ok"
+
+        # slower than the observed latency, but there is no other replica
+        connection.delay = 0.05
+        assert transport.request("POST", url, body=b"{}") == b"ok"
+        assert transport.n_hedged == 0
+        assert connection.urls == [url, url]
+
+        # the request is hedged to the other replica
+        connection.delay = 0.2
+        urls = [url, "http://encoder-2/encoder"]
+        assert transport.request("POST", urls, body=b"{}") == b"ok"
+        assert transport.n_hedged == 1
+        assert connection.urls[2:] == urls
+
+    def test_half_open_probing(self):
+        connection = SlowConnection(0)
+        transport = Transport(backoff=10, reset_timeout=0, connection=connection)
+        url = "http://encoder-1/encoder"
+        breaker = transport.breaker(url)
+        breaker.opened_at = time.monotonic()
+        # another request is probing the endpoint
+        assert breaker.allow()
+        with mock.patch.object(transport, "_send", wraps=transport._send) as send:
+            with pytest.raises(CircuitOpenError):
+                transport.request("POST", url, body=b"{}")
+        # no retries spent in a loop on the probed endpoint
+        assert send.call_count == 1
+        assert connection.urls == []
+
+        # the next replica is used
+        urls = [url, "http://encoder-2/encoder"]
+        assert transport.request("POST", urls, body=b"{}") == b"ok"
+        assert connection.urls == [urls[1]]
+
+    def test_retry_zero(self):
+        transport = Transport(retry=5, backoff=0.001, connect_timeout=1)
+        with pytest.raises(TransportError):
+            transport.request("POST", DEAD_URL, body=b"{}", retry=0)
+        assert transport.stats()[DEAD_URL]["failures"] == 1
@@ -1,6 +1,8 @@
 import numpy as np
 
 from nlm_utils.utils import normalize_embeddings
+from nlm_utils.utils import normalize_embeddings_array
+from nlm_utils.utils import quantize_embeddings
 
 
 def test_normalize_embeddings():
@@ -30,3 +32,40 @@ def test_correct_normalization():
 
 test_normalize_embeddings()
 test_correct_normalization()
+
+
+def test_normalize_embeddings_array():
+    X = np.random.rand(4, 10).astype(np.float32)
+    expected = normalize_embeddings(X.copy())
+
+    Y = normalize_embeddings_array(X)
+    assert Y is X
+    assert Y.dtype == np.float32
+    assert np.allclose(Y, expected, atol=1e-6)
+    assert np.allclose(normalize_embeddings_array(np.zeros(3)), [0.0, 0.0, 0.0])
+
+
+def test_quantize_embeddings():
+    X = normalize_embeddings_array(np.random.rand(4, 10).astype(np.float32))
+    assert quantize_embeddings(X, "float16").dtype == np.float16
+    Q = quantize_embeddings(X, "int8")
+    assert Q.dtype == np.int8
+    assert np.allclose(Q / 127, X, atol=1 / 127)
+
+
+def test_normalize_embeddings_array_out_dtype_chunks():
+    X = np.random.rand(10, 8)
+    expected = normalize_embeddings(X.copy())
+
+    # chunks, and out buffer of another dtype, X is left untouched
+    original = X.copy()
+    out = np.empty((10, 8), dtype=np.float32)
+    assert normalize_embeddings_array(X, out=out, chunk_size=3) is out
+    assert np.array_equal(X, original)
+    assert np.allclose(out, expected, atol=1e-6)
+
+    # float16 keeps its dtype, lists are converted to the requested dtype
+    assert normalize_embeddings_array(X.astype(np.float16)).dtype == np.float16
+    Y = normalize_embeddings_array(X.tolist(), dtype=np.float64)
+    assert Y.dtype == np.float64
+    assert np.allclose(Y, expected)